@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of pandangas on synthetic large networks (see benchmarks.run)."""
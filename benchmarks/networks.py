@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic network generators for the benchmarks."""
+
+import numpy as np
+
+import pandangas as pg
+
+DIAMETERS = np.array([0.05, 0.08, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0])  # m
+V_DESIGN = 5.0  # m/s, design velocity used to size the pipes
+RHO = {"HP": 4.2, "MP": 1.6, "BP+": 0.85, "BP": 0.8}  # kg/m3, approximate natural gas densities
+
+
+def _size(m_dot, level):
+    """
+    Smallest catalog diameter keeping the velocity of a mass flow (in [kg/s]) under V_DESIGN
+    """
+    d = np.sqrt(4 * np.abs(m_dot) / (RHO[level] * V_DESIGN * np.pi))
+    return DIAMETERS[np.minimum(np.searchsorted(DIAMETERS, d), len(DIAMETERS) - 1)]
+
+
+def _random_tree(nbr_nodes, rng, span=50):
+    """
+    Parents of a random tree (node 0 is the root, each node is attached to one of the span previous nodes)
+    """
+    children = np.arange(1, nbr_nodes)
+    low = np.maximum(0, children - span)
+    return np.concatenate(([-1], low + (rng.random_sample(nbr_nodes - 1) * (children - low)).astype(int)))
+
+
+def _subtree_sums(parents, values):
+    """
+    Sum of the values of each subtree of a tree whose parents have lower numbers than their children
+    """
+    sums = np.array(values, dtype=float)
+    for i in range(len(parents) - 1, 0, -1):
+        sums[parents[i]] += sums[i]
+    return sums
+
+
+def _add_radial(net, nbr_pipes, level, prefix, rng, p_kw=5.0, load_ratio=0.5, feeder=True):
+    """
+    Add a random radial district of nbr_pipes pipes, sized from its loads, with a feeder at its root bus if feeder is
+    True. Return the root bus (to connect it, ex: with a station) and the total load of the district
+    """
+    nbr_nodes = nbr_pipes + 1
+    names = np.array(["{}BUS{}".format(prefix, i) for i in range(nbr_nodes)], dtype=object)
+    parents = _random_tree(nbr_nodes, rng)
+
+    loaded = rng.random_sample(nbr_nodes) < load_ratio
+    loaded[0] = False
+    demand = np.where(loaded, p_kw / net.LHV, 0.0)
+    flows = _subtree_sums(parents, demand)[1:]
+
+    pg.create_buses(net, level, names)
+    pg.create_pipes(
+        net,
+        names[parents[1:]],
+        names[1:],
+        length_m=rng.uniform(20, 200, nbr_pipes),
+        diameter_m=_size(flows, level),
+        name=["{}PIPE{}".format(prefix, i) for i in range(nbr_pipes)],
+    )
+    pg.create_loads(net, names[loaded], p_kW=p_kw, name=["{}LOAD{}".format(prefix, i) for i in range(loaded.sum())])
+    if feeder:
+        pg.create_feeder(net, names[0], p_lim_kW=2 * p_kw * loaded.sum(), p_Pa=net.LEVELS[level], name=prefix + "FEED")
+    return names[0], p_kw * loaded.sum()
+
+
+def create_radial(nbr_pipes, level="MP", seed=0):
+    """
+    Radial (tree) network of one pressure level, fed at its root
+
+    :param nbr_pipes: number of pipes
+    :param level: pressure level (default: "MP")
+    :param seed: seed of the random generator (default: 0)
+    :return: the network
+    """
+    net = pg.create_empty_network()
+    _add_radial(net, nbr_pipes, level, "R", np.random.RandomState(seed))
+    return net
+
+
+def create_meshed(nbr_pipes, level="MP", seed=0, p_kw=2.0, nodes_per_feeder=2500):
+    """
+    Meshed (grid) network of one pressure level, with regularly spread feeders
+
+    :param nbr_pipes: approximate number of pipes (a square grid has about 2 pipes per bus)
+    :param level: pressure level (default: "MP")
+    :param seed: seed of the random generator (default: 0)
+    :param p_kw: load of each bus (in [kW], default: 2.0)
+    :param nodes_per_feeder: number of buses per feeder (default: 2500)
+    :return: the network
+    """
+    rng = np.random.RandomState(seed)
+    net = pg.create_empty_network()
+
+    side = max(2, int(round(np.sqrt(nbr_pipes / 2.0))))
+    ids = np.arange(side * side).reshape(side, side)
+    names = np.array(["MBUS{}".format(i) for i in range(side * side)], dtype=object)
+
+    from_bus = np.concatenate((ids[:, :-1].ravel(), ids[:-1, :].ravel()))
+    to_bus = np.concatenate((ids[:, 1:].ravel(), ids[1:, :].ravel()))
+
+    nbr_feeders = max(1, (side * side) // nodes_per_feeder)
+    feeders = np.unique(np.linspace(0, side * side - 1, nbr_feeders + 2).astype(int)[1:-1])
+    loaded = np.ones(side * side, dtype=bool)
+    loaded[feeders] = False
+    total = p_kw * loaded.sum() / net.LHV
+
+    pg.create_buses(net, level, names)
+    pg.create_pipes(
+        net,
+        names[from_bus],
+        names[to_bus],
+        length_m=rng.uniform(50, 150, len(from_bus)),
+        diameter_m=_size(total / len(feeders) / 4, level),
+        name=["MPIPE{}".format(i) for i in range(len(from_bus))],
+    )
+    pg.create_loads(net, names[loaded], p_kW=p_kw, name=["MLOAD{}".format(i) for i in range(loaded.sum())])
+    for i, bus in enumerate(names[feeders]):
+        p_lim = 4 * p_kw * nodes_per_feeder
+        pg.create_feeder(net, bus, p_lim_kW=p_lim, p_Pa=net.LEVELS[level], name="MFEED{}".format(i))
+    return net
+
+
+def create_multilevel(nbr_pipes, nbr_districts=10, seed=0):
+    """
+    Multi-level network: a radial MP backbone fed by one feeder, with stations feeding radial BP districts
+
+    :param nbr_pipes: approximate number of pipes (split between the districts, the backbone has nbr_districts pipes)
+    :param nbr_districts: number of BP districts (default: 10)
+    :param seed: seed of the random generator (default: 0)
+    :return: the network
+    """
+    rng = np.random.RandomState(seed)
+    net = pg.create_empty_network()
+
+    per_district = max(1, (nbr_pipes - nbr_districts) // nbr_districts)
+    roots, powers = [], []
+    for d in range(nbr_districts):
+        root, p_kw = _add_radial(net, per_district, "BP", "D{}".format(d), rng, feeder=False)
+        roots.append(root)
+        powers.append(p_kw)
+
+    backbone = np.array(["HBUS{}".format(i) for i in range(nbr_districts + 1)], dtype=object)
+    parents = _random_tree(nbr_districts + 1, rng, span=3)
+    flows = _subtree_sums(parents, np.concatenate(([0.0], powers)) / net.LHV)[1:]
+    pg.create_buses(net, "MP", backbone)
+    pg.create_pipes(
+        net,
+        backbone[parents[1:]],
+        backbone[1:],
+        length_m=rng.uniform(500, 2000, nbr_districts),
+        diameter_m=_size(flows, "MP"),
+        name=["HPIPE{}".format(i) for i in range(nbr_districts)],
+    )
+    pg.create_feeder(net, backbone[0], p_lim_kW=2 * sum(powers), p_Pa=net.LEVELS["MP"], name="HFEED")
+    for d, (root, p_kw) in enumerate(zip(roots, powers)):
+        pg.create_station(net, backbone[d + 1], root, p_lim_kW=2 * p_kw, p_Pa=1.022e5, name="STATION{}".format(d))
+    return net
+
+
+GENERATORS = {"radial": create_radial, "meshed": create_meshed, "multilevel": create_multilevel}
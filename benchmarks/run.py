@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+    Benchmarks of the network construction and of the simulation phases.
+
+    Usage:
+
+    $ python -m benchmarks.run --kinds radial meshed --sizes 1000 10000 --output bench.json
+
+    $ python -m benchmarks.run --sizes 1000 --compare bench.json
+
+"""
+
+import argparse
+import datetime
+import json
+import operator
+import platform
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+import scipy
+
+import pandangas as pg
+from pandangas.profiling import Stats
+from pandangas.results import runpp
+
+from benchmarks.networks import GENERATORS
+
+PHASES = ["build", "topology", "fluid", "reduction", "assembly", "solve", "results"]
+
+
+def _commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL)
+        return commit.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_phases(net, method):
+    """
+    Run the simulation of a network with runpp, return the times of its phases (see profiling.Stats), the total time,
+    the maximum number of iterations and the convergence of the levels
+    """
+    stats = Stats()
+    start = time.perf_counter()
+    runpp(net, method=method, stats=stats)
+    total = time.perf_counter() - start
+    infos = [info for info in net.solver_info.values() if info is not None]
+    iterations = max([info["iterations"] for info in infos], default=0)
+    converged = all(info["converged"] for info in infos)
+    return stats.by_phase(), total, iterations, converged
+
+
+def run(kinds, sizes, methods, repeat=1):
+    """
+    Run the benchmarks: the phases are those recorded by runpp (see profiling.Stats), plus the construction of the
+    network ("build") and the total time of runpp ("runpp")
+
+    :param kinds: kinds of networks (keys of benchmarks.networks.GENERATORS)
+    :param sizes: numbers of pipes
+    :param methods: simulation methods ("LINEAR", "NON-LINEAR")
+    :param repeat: number of repetitions, the best time of each phase is kept (default: 1)
+    :return: a list of results (dicts)
+    """
+    results = []
+    for kind in kinds:
+        for size in sizes:
+            for method in methods:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    net = GENERATORS[kind](size)
+                    build = time.perf_counter() - start
+                    phases, total, iterations, converged = _run_phases(net, method)
+                    times = OrderedDict((phase, phases.get(phase, 0.0)) for phase in PHASES)
+                    times.update(build=build, runpp=total)
+                    best = times if best is None else OrderedDict((k, min(v, best[k])) for k, v in times.items())
+                results.append(
+                    OrderedDict(
+                        [
+                            ("kind", kind),
+                            ("size", size),
+                            ("method", method),
+                            ("buses", len(net.bus)),
+                            ("pipes", len(net.pipe)),
+                            ("iterations", iterations),
+                            ("converged", converged),
+                            ("times", best),
+                        ]
+                    )
+                )
+                print(
+                    "{:<11}{:>8} pipes {:<11}".format(kind, len(net.pipe), method)
+                    + " ".join("{}={:.3f}s".format(k, v) for k, v in best.items()),
+                    file=sys.stderr,
+                )
+    return results
+
+
+def compare(new, old):
+    """
+    Print the ratio new/old of the times of the benchmarks present in both results
+    """
+    key = operator.itemgetter("kind", "size", "method")
+    old = {key(r): r for r in old["results"]}
+    for r in new["results"]:
+        if key(r) in old:
+            ref = old[key(r)]["times"]
+            ratios = ["{}={:.2f}".format(k, v / ref[k]) for k, v in r["times"].items() if ref.get(k)]
+            print("{:<11}{:>8} {:<11}".format(*key(r)) + " ".join(ratios))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of pandangas")
+    parser.add_argument("--kinds", nargs="+", default=sorted(GENERATORS), choices=sorted(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--methods", nargs="+", default=["LINEAR", "NON-LINEAR"], choices=["LINEAR", "NON-LINEAR"])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results to a previous JSON file")
+    args = parser.parse_args(argv)
+
+    res = {
+        "meta": {
+            "commit": _commit(),
+            "date": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "pandangas": pg.__version__,
+            "machine": platform.platform(),
+        },
+        "results": run(args.kinds, args.sizes, args.methods, args.repeat),
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(res, f, indent=2)
+    else:
+        json.dump(res, sys.stdout, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(res, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
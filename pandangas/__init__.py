@@ -8,3 +8,8 @@ __version__ = "__version__ = '0.1.1'"
 
 from pandangas.pandangas import *
 from pandangas.results import runpp
+from pandangas.timeseries import run_timeseries
+from pandangas.contingency import run_contingencies
+from pandangas.scenarios import run_scenarios
+from pandangas.persistence import to_file, from_file, load_arrays
+from pandangas.importer import import_network
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""Compiled array model of a network: typed, contiguous arrays built once from its DataFrames for the solvers."""
+
+import operator
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import fluids
+
+BUS_TYPES = ["NODE", "SINK", "SRCE"]  # bus type codes are the positions in this list
+NODE, SINK, SRCE = range(len(BUS_TYPES))
+
+
+def codes(values, categories):
+    """
+    Integer codes (int8) of values among categories, -1 for unknown values
+    """
+    return pd.Index(categories).get_indexer(values).astype(np.int8)
+
+
+@lru_cache(maxsize=None)
+def roughness_of(material):
+    """
+    Absolute roughness (in [m]) of a pipe material, from the fuzzy search of fluids done once per material and then
+    cached
+    """
+    return fluids.material_roughness(material)
+
+
+def material_roughness(materials):
+    """
+    Absolute roughness (in [m]) of an array of pipe materials, looked up once per distinct material
+    """
+    unique, inverse = np.unique(np.asarray(materials, dtype=str), return_inverse=True)
+    return np.array([roughness_of(m) for m in unique], dtype=float)[inverse]
+
+
+class NetworkArrays:
+    """
+    Typed and contiguous arrays of a network, in the order of its tables
+
+    - buses: names, index, level codes (position in levels, from lower to higher pressure), type codes (BUS_TYPES)
+      and zones
+    - pipes: names, index, int32 from/to bus positions, float64 lengths, diameters and roughness, materials and
+      in service flags
+    - stations: names, index and int32 high/low bus positions
+
+    :param net: the given network
+    """
+
+    def __init__(self, net):
+        self.levels = [level for level, _ in sorted(net.LEVELS.items(), key=operator.itemgetter(1))]
+
+        bus = net.bus
+        self.bus_names = bus["name"].values.astype(object)
+        self.bus_index = bus.index.values.astype(np.int64)
+        self.bus_level = codes(bus["level"], self.levels)
+        self.bus_type = codes(bus["type"], BUS_TYPES)
+        self.bus_zone = bus["zone"].values.astype(object)
+
+        # Buses are referenced by name: first bus of each name (as net.lookup)
+        labels = pd.Series(net.lookup("bus"), dtype=object)
+        bus_rows = pd.Index(bus.index)
+
+        def positions(names):
+            return bus_rows.get_indexer(labels.reindex(names).values).astype(np.int32)
+
+        pipe = net.pipe
+        self.pipe_names = pipe["name"].values.astype(object)
+        self.pipe_index = pipe.index.values.astype(np.int64)
+        self.pipe_from = positions(pipe["from_bus"])
+        self.pipe_to = positions(pipe["to_bus"])
+        self.pipe_length = pipe["length_m"].values.astype(np.float64)
+        self.pipe_diameter = pipe["diameter_m"].values.astype(np.float64)
+        self.pipe_material = pipe["material"].values.astype(object)
+        self.pipe_roughness = material_roughness(self.pipe_material)
+        self.pipe_in_service = (pipe["in_service"] != False).values
+
+        station = net.station
+        self.station_names = station["name"].values.astype(object)
+        self.station_index = station.index.values.astype(np.int64)
+        self.station_high = positions(station["bus_high"])
+        self.station_low = positions(station["bus_low"])
+
+    @property
+    def nbr_buses(self):
+        return len(self.bus_names)
+
+    @property
+    def nbr_pipes(self):
+        return len(self.pipe_names)
+
+    def level_buses(self, level):
+        """
+        Positions of the buses of a pressure level
+        """
+        return np.flatnonzero(self.bus_level == self.levels.index(level))
+
+    def level_pipes(self, level):
+        """
+        Positions of the in service pipes of a pressure level (both ends on the level), grouped by from bus in the
+        order of the buses
+        """
+        code = self.levels.index(level)
+        ends = (self.pipe_from >= 0) & (self.pipe_to >= 0)
+        on_level = ends & (self.bus_level[self.pipe_from] == code) & (self.bus_level[self.pipe_to] == code)
+        pipes = np.flatnonzero(self.pipe_in_service & on_level)
+        return pipes[np.argsort(self.pipe_from[pipes], kind="stable")]
+
+
+def compile_network(net):
+    """
+    Build the array model of a given network
+
+    :param net: the given network
+    :return: a NetworkArrays
+    """
+    return NetworkArrays(net)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Contingency analysis: re-solve a solved network for pipe outages.
+
+    Usage:
+
+    >>> import pandangas as pg
+
+    >>> pg.runpp(net)
+    >>> violations = pg.run_contingencies(net, ["PIPE1", "PIPE2", ["PIPE3", "PIPE4"]])
+
+"""
+
+import operator
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import pandangas.topology as top
+import pandangas.simu_linear as sim_ln
+import pandangas.simu_nonlinear as sim_nl
+from pandangas.fluid import level_fluid
+from pandangas.results import _pipe_density, _v_from_m_dot
+
+COLUMNS = ["contingency", "element", "name", "violation", "value", "limit"]
+
+
+class _Component:
+    """
+    Base data of one independent component of a level, shared by all the contingencies touching it: its topology,
+    the fluid and (LINEAR) the factorization and the solution of the base case
+    """
+
+    def __init__(self, net, level, tp, method):
+        self.level = level
+        self.tp = tp
+        self.fluid = level_fluid(net, level)
+        self.pipe_pos = {name: i for i, name in enumerate(tp.pipes)}
+        self.method = method
+        self._solve = None
+
+    def base(self, loads, p_ops):
+        """
+        Factorize the A matrix of the component and solve the base case (LINEAR), once
+        """
+        if self._solve is None:
+            a = sim_ln.create_a(self.tp, self.fluid)
+            self._a = a.tocsr()
+            self._solve = sim_ln.factorize(a)
+            self._x = self._solve(sim_ln.create_b(self.tp, loads, p_ops))
+        return self._a, self._solve, self._x
+
+
+def _base_components(net, method):
+    """
+    Map each in service pipe name to the base component (of its level) containing it
+    """
+    components = {}
+    topology = top.create_topology(net)
+    for level, _ in sorted(net.LEVELS.items(), key=operator.itemgetter(1)):
+        if level not in topology:
+            continue
+        for tp in topology[level].components():
+            comp = _Component(net, level, tp, method)
+            components.update((name, comp) for name in tp.pipes)
+    return components
+
+
+def _split_outage(comp, pipes):
+    """
+    Remove the given pipes from a component, return the topologies of the parts still supplied by a source, the
+    names of the sink buses of the islanded parts and whether the component is still in one piece (no bus cut off,
+    even a passive one)
+    """
+    parts = comp.tp.components(without=[comp.pipe_pos[name] for name in pipes])
+    supplied = [part for part in parts if part.is_srce.any()]
+    islanded = [
+        n for part in parts if not part.is_srce.any() for n, is_sink in zip(part.nodes, part.is_sink) if is_sink
+    ]
+    return supplied, islanded, len(parts) == 1
+
+
+def _woodbury(comp, pipes, loads, p_ops):
+    """
+    LINEAR solution of a component without the given pipes, from the factorization of its base case: the pressure
+    loss equation of each pipe out is replaced by m_ij = 0, a rank-k update of A (Sherman-Morrison-Woodbury)
+    """
+    a, solve, x = comp.base(loads, p_ops)
+    tp = comp.tp
+    rows = np.array([comp.pipe_pos[name] for name in pipes])
+
+    u = np.zeros((a.shape[0], len(rows)))
+    u[rows, np.arange(len(rows))] = 1.0
+    vt = -a[rows].toarray()
+    vt[np.arange(len(rows)), tp.nbr_nodes + rows] += 1.0
+
+    z = solve(u)
+    x = x - z.dot(np.linalg.solve(np.eye(len(rows)) + vt.dot(z), vt.dot(x)))
+    return sim_ln.split(x, tp)
+
+
+def _solve_part(net, comp, part, loads, p_ops, kwargs):
+    """
+    Solve one supplied part of a component after an outage, from scratch (LINEAR) or warm-started from the base
+    solution (NON-LINEAR)
+    """
+    if comp.method == "LINEAR":
+        x = sim_ln.solve(sim_ln.create_a(part, comp.fluid), sim_ln.create_b(part, loads, p_ops))
+        return sim_ln.split(x, part)
+
+    eps = part.roughness
+    x0 = sim_nl.initial_guess(part, comp.fluid, eps, loads, p_ops, init="previous", previous=net.last_solution)
+    res, info = sim_nl.solve_level(part, comp.fluid, eps, loads, p_ops, x0, **kwargs)
+    if not info["converged"]:
+        msg = "The solver did not converge on a contingency of level {} (residual: {:.3g}) !".format(
+            comp.level, info["residual"]
+        )
+        warnings.warn(msg, RuntimeWarning)
+    return sim_nl.unscale(res, part, comp.fluid)
+
+
+def _violations(net, name, tp, p_nodes, m_dot_pipes, fluid, eos="constant"):
+    """
+    Pressure (at the loads) and velocity violations of a solved part (velocities with the density of the equation of
+    state eos of the solve)
+    """
+    rows = []
+    p = pd.Series(p_nodes, index=tp.nodes)
+    loads = net.load.loc[net.load["bus"].isin(tp.nodes)]
+    p_loads = p.reindex(loads["bus"]).values
+    for bus, value, limit in zip(loads["bus"], p_loads, loads["min_p_Pa"].values.astype(float)):
+        if value < limit:
+            rows.append((name, "bus", bus, "p_min", value, limit))
+
+    v = _v_from_m_dot(tp.diameters, m_dot_pipes, fluid, _pipe_density(tp, p_nodes, fluid, eos))
+    for pipe in np.flatnonzero(np.abs(v) > net.V_MAX):
+        rows.append((name, "pipe", tp.pipes[pipe], "v_max", v[pipe], net.V_MAX))
+    return rows
+
+
+def run_contingencies(net, outages, method="NON-LINEAR", **kwargs):
+    """
+    Run a contingency analysis (ex: N-1) on a network solved by runpp
+
+    For each outage, only the components containing the pipes out are re-solved: LINEAR outages update the base
+    factorization of the component (low-rank update), NON-LINEAR outages are warm-started from the base solution.
+    The flows through the stations are those of the base case (buses islanded by an outage are reported, the loss of
+    their loads is not propagated to higher pressure levels).
+
+    :param net: the given network, solved by runpp (the base case)
+    :param outages: list of contingencies, each one a pipe name or a list of pipe names out of service together
+    :param method: "NON-LINEAR" or "LINEAR" (default: "NON-LINEAR")
+    :param kwargs: extra arguments passed to the non-linear solver (solver, tol, max_iter, friction, eos)
+    :return: a DataFrame of the violations of the contingencies (contingency, element, name, violation, value,
+    limit): pressures under the min_p_Pa of the loads ("p_min"), velocities over net.V_MAX ("v_max") and sink buses
+    islanded from any source ("islanded")
+    """
+    try:
+        assert len(net.res_bus) > 0
+    except AssertionError:
+        msg = "The network has no base solution, run runpp first !"
+        raise ValueError(msg)
+
+    outages = [[outage] if isinstance(outage, str) else list(outage) for outage in outages]
+    pipes = net.lookup("pipe")
+    missing = sorted({name for outage in outages for name in outage if name not in pipes})
+    try:
+        assert not missing
+    except AssertionError:
+        msg = "The pipes {} do not exist !".format(missing)
+        raise ValueError(msg)
+
+    loads = sim_ln._scaled_loads_as_dict(net)
+    p_ops = sim_ln._operating_pressures_as_dict(net)
+    eos = kwargs.get("eos", "constant") if method != "LINEAR" else "constant"
+    components = _base_components(net, method)
+
+    rows = []
+    for outage in outages:
+        name = "+".join(outage)
+        affected = {}
+        for pipe in outage:
+            if pipe in components:  # pipes already out of service in the base case change nothing
+                affected.setdefault(id(components[pipe]), (components[pipe], []))[1].append(pipe)
+
+        for comp, out in affected.values():
+            supplied, islanded, whole = _split_outage(comp, out)
+            rows.extend((name, "bus", bus, "islanded", np.nan, np.nan) for bus in islanded)
+
+            # The low-rank update needs every pressure still determined: a cut off bus (even without load) has none
+            if method == "LINEAR" and whole and supplied:
+                solutions = [(comp.tp, _woodbury(comp, out, loads, p_ops))]
+            else:
+                solutions = [
+                    (part, _solve_part(net, comp, part, loads, p_ops, kwargs)) for part in supplied if part.nbr_pipes
+                ]
+            for tp, (p_nodes, m_dot_pipes, _) in solutions:
+                rows.extend(_violations(net, name, tp, p_nodes, m_dot_pipes, comp.fluid, eos))
+
+    return pd.DataFrame(rows, columns=COLUMNS)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Coupled solve of the pressure levels of a network, with the stations flows exchanged in memory.
+
+    Usage:
+
+    >>> import pandangas as pg
+
+    >>> pg.runpp(net, coupling="arrays")  # levels in sequence, stations flows passed as arrays
+    >>> pg.runpp(net, coupling="block")  # all the levels as one system
+
+"""
+
+import copy
+import warnings
+
+import numpy as np
+import scipy.sparse as sp
+
+import pandangas.simu_linear as sim_ln
+import pandangas.simu_nonlinear as sim_nl
+import pandangas.simu_nodal as sim_nd
+from pandangas.fluid import level_fluid
+from pandangas.profiling import NULL_STATS
+from pandangas.reduction import reduce_topology
+
+# Solver of each method, with its extra arguments
+SOLVERS = {
+    "LINEAR": (sim_ln.run_one_level, {}),
+    "NON-LINEAR": (sim_nl.run_one_level, {}),
+    "NODAL": (sim_nd.run_one_level, {}),
+    "NODAL-LINEAR": (sim_nd.run_one_level, {"linear": True}),
+}
+COUPLINGS = ["tables", "arrays", "block"]
+
+
+class _Part:
+    """
+    One independent component of a level, set up once: topology solved (reduced if asked), fluid, positions of the
+    loads and stations among its sinks and nodes, and operating pressures of its sources
+
+    :param net: the given network
+    :param level: the pressure level
+    :param tp: the LevelTopology of the component
+    :param p_ops: dict mapping sources to their operating pressure (in [Pa])
+    :param reduce: if True, solve the reduced component (see reduction.Reduction) (default: False)
+    """
+
+    def __init__(self, net, level, tp, p_ops, reduce=False):
+        self.level = level
+        self.original = tp
+        self.reduction = reduce_topology(tp) if reduce else None
+        self.tp = tp if self.reduction is None else self.reduction.topology
+        self.fluid = level_fluid(net, level)
+
+        # Sinks and sources are never reduced: their positions in the solved topology and in the original one
+        self.load_sink = self.tp.positions(net.load["bus"], self.tp.is_sink)
+        self.stat_sink = self.tp.positions(net.station["bus_high"], self.tp.is_sink)
+        self.stat_srce = self.tp.positions(net.station["bus_low"])
+        self.stat_node = tp.positions(net.station["bus_low"])
+        self.p_srce = sim_ln._srce_pressures(self.tp, p_ops)
+
+    def sinks(self, loads, stations):
+        """
+        Vector of the sinks loads (in [kg/s]) from the loads and the stations flows of lower levels (arrays in the
+        order of net.load and net.station)
+        """
+        sinks = np.zeros(int(self.tp.is_sink.sum()))
+        found = self.load_sink >= 0
+        np.add.at(sinks, self.load_sink[found], loads[found])
+        found = self.stat_sink >= 0
+        np.add.at(sinks, self.stat_sink[found], stations[found])
+        return sinks
+
+    def expand(self, p_nodes, m_dot_pipes, m_dot_nodes):
+        """
+        Solution of the original component from the solution of the solved topology
+        """
+        if self.reduction is None:
+            return p_nodes, m_dot_pipes, m_dot_nodes
+        return self.reduction.expand(p_nodes, m_dot_pipes, m_dot_nodes)
+
+    def station_flows(self, stations, m_dot_nodes):
+        """
+        Update the stations flows (in [kg/s]) from the nodes mass flows of the component (original order)
+        """
+        found = self.stat_node >= 0
+        stations[found] = -m_dot_nodes[self.stat_node[found]]
+
+
+def _loads(net):
+    """
+    Scaled loads (in [kg/s]) in the order of net.load
+    """
+    return net.load["p_kW"].values.astype(float) * net.load["scaling"].values.astype(float) / net.LHV
+
+
+def _solve_sequential(net, parts, method, stats, kwargs):
+    """
+    Solve the parts from lower to higher pressure, passing the stations flows as arrays to the sinks of the next parts
+    """
+    run_one_level, extra = SOLVERS[method]
+    loads = _loads(net)
+    stations = np.zeros(len(net.station))
+    solutions = []
+    for part in parts:
+        local = copy.copy(net)
+        local.solver_info = {}
+        p_nodes, m_dot_pipes, m_dot_nodes, fluid = run_one_level(
+            local,
+            part.level,
+            topology=part.tp,
+            loads=part.sinks(loads, stations),
+            p_ops=part.p_srce,
+            stats=stats,
+            **extra,
+            **kwargs
+        )
+        p_nodes, m_dot_pipes, m_dot_nodes = part.expand(p_nodes, m_dot_pipes, m_dot_nodes)
+        part.station_flows(stations, m_dot_nodes)
+        solutions.append((p_nodes, m_dot_pipes, m_dot_nodes, fluid, local.solver_info.get(part.level)))
+    return solutions
+
+
+def _coupling_matrix(parts, sizes, sink_rows):
+    """
+    Sparse coupling of the block system: in the sink equation of the high pressure bus of each station, + the mass
+    flow of its low pressure bus (the load of the station is the flow injected into the lower level)
+    """
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    rows, cols = [], []
+    for i, high in enumerate(parts):
+        for s in np.flatnonzero(high.stat_sink >= 0):
+            for j, low in enumerate(parts):
+                if low.stat_srce[s] >= 0:
+                    rows.append(offsets[i] + sink_rows[i] + high.stat_sink[s])
+                    cols.append(offsets[j] + low.tp.nbr_nodes + low.tp.nbr_pipes + low.stat_srce[s])
+    return sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(offsets[-1], offsets[-1])), offsets
+
+
+def _solve_block(net, parts, method, stats, tol=1e-9, max_iter=50, init="linear", seed=None, perturbation=0.0,
+                 friction="colebrook", eos="constant", solver="newton", check=False, iterative=False):
+    """
+    Solve all the parts as one system: block diagonal matrix (LINEAR) or Jacobian (NON-LINEAR) of the parts, coupled
+    by the stations flows (check, iterative and tol apply to the LINEAR system, see simu_linear.solve)
+    """
+    try:
+        assert method in ["LINEAR", "NON-LINEAR"] and solver == "newton"
+    except AssertionError:
+        msg = "The block coupling supports the LINEAR and NON-LINEAR (newton) methods only !"
+        raise ValueError(msg)
+
+    loads = _loads(net)
+    no_station = np.zeros(len(net.station))
+    sizes = [2 * part.tp.nbr_nodes + part.tp.nbr_pipes for part in parts]
+
+    if method == "LINEAR":
+        with stats.timer("assembly"):
+            sink_rows = [part.tp.nbr_pipes + part.tp.nbr_nodes + int(part.tp.is_pass.sum()) for part in parts]
+            c, offsets = _coupling_matrix(parts, sizes, sink_rows)
+            a = (sp.block_diag([sim_ln.create_a(part.tp, part.fluid) for part in parts]) + c).tocsr()
+            b = np.concatenate(
+                [sim_ln._b_from_arrays(part.tp, part.sinks(loads, no_station), part.p_srce) for part in parts]
+            )
+        stats.matrix("A", a)
+        with stats.timer("solve"):
+            x = sim_ln.solve(a, b, check=check, iterative=iterative, tol=tol)
+        stats.count("factorizations")
+        info = None
+        split = [sim_ln.split(x[offsets[i] : offsets[i + 1]], part.tp) for i, part in enumerate(parts)]
+    else:
+        with stats.timer("assembly"):
+            sink_rows = [part.tp.nbr_nodes + part.tp.nbr_pipes for part in parts]
+            c, offsets = _coupling_matrix(parts, sizes, sink_rows)
+            models = [
+                sim_nl.Model(
+                    part.tp, part.tp.roughness, part.fluid, part.sinks(loads, no_station), part.p_srce,
+                    part.fluid.P, friction, eos,
+                )
+                for part in parts
+            ]
+
+            # Initial guess of each part with the stations flows of the levels solved in sequence with the linear model
+            stations = np.zeros(len(net.station))
+            x0 = []
+            for part, (_, _, m_dot_nodes, _, _) in zip(parts, _solve_sequential(net, parts, "LINEAR", NULL_STATS, {})):
+                x0.append(
+                    sim_nl.initial_guess(
+                        part.tp, part.fluid, part.tp.roughness, part.sinks(loads, stations), part.p_srce, init=init,
+                        previous=net.last_solution, seed=seed, perturbation=perturbation,
+                    )
+                )
+                part.station_flows(stations, m_dot_nodes)
+
+        def fun(x):
+            r = np.concatenate([m.residual(x[offsets[i] : offsets[i + 1]]) for i, m in enumerate(models)])
+            return r + c.dot(x)
+
+        def jac(x):
+            blocks = [m.jacobian(x[offsets[i] : offsets[i + 1]]) for i, m in enumerate(models)]
+            return (sp.block_diag(blocks) + c).tocsr()
+
+        with stats.timer("solve"):
+            x, nit, converged, residual = sim_nl.newton(fun, jac, np.concatenate(x0), tol=tol, max_iter=max_iter)
+        info = {"solver": "newton", "iterations": nit, "converged": converged, "residual": residual}
+        if stats.enabled:
+            stats.count("iterations", None, nit)
+            stats.matrix("jacobian", jac(x))
+        if not converged:
+            msg = "The Newton-Raphson solver did not converge on the block system (residual: {:.3g}) !".format(residual)
+            warnings.warn(msg, RuntimeWarning)
+        split = [sim_nl.unscale(x[offsets[i] : offsets[i + 1]], part.tp, part.fluid) for i, part in enumerate(parts)]
+
+    return [part.expand(*sol) + (part.fluid, info) for part, sol in zip(parts, split)]
+
+
+def solve_coupled(net, topology, method="NON-LINEAR", coupling="arrays", reduce=False, stats=NULL_STATS, **kwargs):
+    """
+    Solve all the pressure levels of a network with the stations flows exchanged in memory (no results tables)
+
+    "arrays": the components are solved from lower to higher pressure, the flows of the stations (at their low
+    pressure bus) going straight into the sinks vector of the higher level. "block": all the components are solved as
+    one system (block diagonal matrix or Jacobian of the levels, plus the stations coupling: the load of the high
+    pressure bus of a station is the flow of its low pressure bus).
+
+    :param net: the given network
+    :param topology: dict mapping each pressure level to its LevelTopology (see topology.create_topology)
+    :param method: see results.runpp; "LINEAR" or "NON-LINEAR" for the block coupling (default: "NON-LINEAR")
+    :param coupling: "arrays" or "block" (default: "arrays")
+    :param reduce: if True, solve the reduced components (see reduction.Reduction) (default: False)
+    :param stats: profiling.Stats (default: disabled)
+    :param kwargs: extra arguments passed to the solver of the method
+    :return: list of (level, component LevelTopology, nodes pressures, pipes mass flows, nodes mass flows, fluid,
+    convergence information), from lower to higher pressure
+    """
+    p_ops = sim_ln._operating_pressures_as_dict(net)
+    parts = [
+        _Part(net, level, tp, p_ops, reduce)
+        for level in sorted(topology, key=lambda level: net.LEVELS[level])
+        for tp in topology[level].components()
+    ]
+    if coupling == "block":
+        solutions = _solve_block(net, parts, method, stats, **kwargs)
+    else:
+        solutions = _solve_sequential(net, parts, method, stats, kwargs)
+    return [(part.level, part.original) + solution for part, solution in zip(parts, solutions)]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""Fluid properties module."""
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from thermo.chemical import Chemical
+
+CACHE_SIZE = 256  # maximum number of (composition, temperature, pressure) states kept in cache
+EOS = ["constant", "ideal", "table"]
+TABLE_RANGE = (0.5, 1.5)  # pressures of the properties tables, relative to the nominal pressure of the level
+TABLE_SIZE = 41
+P_MIN = 1e3  # pressure (in [Pa]) below which the properties are not evaluated (Newton steps may overshoot)
+
+Fluid = namedtuple("Fluid", ["name", "T", "P", "rho", "mu"])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def get_fluid(composition, T, P):
+    """
+    Return the properties of a fluid at a given state, evaluated once with thermo and then cached (LRU)
+
+    :param composition: the name of the fluid (ex: "natural gas")
+    :param T: temperature (in [K])
+    :param P: pressure (in [Pa])
+    :return: a Fluid (name, T, P, rho, mu)
+    """
+    chem = Chemical(composition, T=T, P=P)
+    return Fluid(composition, T, P, chem.rho, chem.mu)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def get_fluid_table(composition, T, P):
+    """
+    Return the density and viscosity of a fluid sampled with thermo over pressures around P (see TABLE_RANGE),
+    evaluated once and then cached (LRU)
+
+    :param composition: the name of the fluid (ex: "natural gas")
+    :param T: temperature (in [K])
+    :param P: nominal pressure (in [Pa])
+    :return: the (read-only) arrays of pressures, densities and viscosities
+    """
+    p = np.linspace(TABLE_RANGE[0] * P, TABLE_RANGE[1] * P, TABLE_SIZE)
+    chems = [Chemical(composition, T=T, P=x) for x in p]
+    table = p, np.array([chem.rho for chem in chems]), np.array([chem.mu for chem in chems])
+    for values in table:
+        values.setflags(write=False)
+    return table
+
+
+def check_eos(eos):
+    try:
+        assert eos in EOS
+    except AssertionError:
+        msg = "The equation of state {} is not supported (choose among {}) !".format(eos, EOS)
+        raise ValueError(msg)
+
+
+def fluid_properties(fluid, p, eos="constant"):
+    """
+    Density and viscosity of a fluid at given pressures, and their derivatives with respect to the pressure
+
+    "constant": the properties of the fluid at its nominal pressure. "ideal": density proportional to the pressure
+    (ideal gas with the compressibility factor of the nominal state), constant viscosity. "table": density and
+    viscosity interpolated linearly in a table precomputed with thermo (see get_fluid_table), extrapolated linearly
+    outside of it.
+
+    :param fluid: the Fluid at the nominal state
+    :param p: pressures (in [Pa])
+    :param eos: "constant", "ideal" or "table" (default: "constant")
+    :return: densities, their derivatives, viscosities and their derivatives
+    """
+    check_eos(eos)
+    p = np.asarray(p, dtype=float)
+    clipped = p < P_MIN
+    p = np.maximum(p, P_MIN)
+    if eos == "table":
+        p_tab, rho_tab, mu_tab = get_fluid_table(fluid.name, fluid.T, fluid.P)
+        i = np.clip(np.searchsorted(p_tab, p) - 1, 0, len(p_tab) - 2)
+        step = p_tab[i + 1] - p_tab[i]
+        drho = (rho_tab[i + 1] - rho_tab[i]) / step
+        dmu = (mu_tab[i + 1] - mu_tab[i]) / step
+        rho = rho_tab[i] + drho * (p - p_tab[i])
+        mu = mu_tab[i] + dmu * (p - p_tab[i])
+    elif eos == "ideal":
+        rho = fluid.rho * p / fluid.P
+        drho = np.full(p.shape, fluid.rho / fluid.P)
+        mu, dmu = np.full(p.shape, fluid.mu), np.zeros(p.shape)
+    else:
+        rho, drho = np.full(p.shape, fluid.rho), np.zeros(p.shape)
+        mu, dmu = np.full(p.shape, fluid.mu), np.zeros(p.shape)
+    drho[clipped] = 0
+    dmu[clipped] = 0
+    return rho, drho, mu, dmu
+
+
+def clear_cache():
+    """
+    Empty the fluid properties caches
+    """
+    get_fluid.cache_clear()
+    get_fluid_table.cache_clear()
+
+
+def create_fluid_table(net):
+    """
+    Precompute the fluid properties of every pressure level of a given network and store them in net.fluid_table
+
+    :param net: the given network
+    :return: a dict mapping each pressure level to its Fluid
+    """
+    net.fluid_table = {level: get_fluid(net.GAS, net.T_GRND, p) for level, p in net.LEVELS.items()}
+    return net.fluid_table
+
+
+def level_fluid(net, level):
+    """
+    Return the fluid of a pressure level of a given network, from net.fluid_table if precomputed or from the cache
+
+    :param net: the given network
+    :param level: the pressure level
+    :return: a Fluid
+    """
+    if level in net.fluid_table:
+        return net.fluid_table[level]
+    return get_fluid(net.GAS, net.T_GRND, net.LEVELS[level])
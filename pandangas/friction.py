@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pressure drop kernel of the pipes: Darcy friction factor models and their derivatives, in plain numpy.
+
+Usage:
+
+>>> from pandangas.friction import pressure_drop
+
+>>> dp, ddp = pressure_drop(m_dot, l, d, e, rho, mu, model="swamee-jain")
+
+"""
+
+from math import log
+
+import numpy as np
+
+RE_LAMINAR = 2040  # Reynolds number of the end of the laminar regime (same as fluids.friction_factor)
+RE_TURBULENT = 4000  # Reynolds number of the start of the fully turbulent regime
+MODELS = ["colebrook", "swamee-jain", "haaland", "laminar"]
+COLEBROOK_TOL = 1e-13  # relative tolerance of the fixed-point iterations of the Colebrook equation
+COLEBROOK_MAX_ITER = 50
+LN10 = log(10)
+
+
+def _swamee_jain(re, ed):
+    """
+    Swamee-Jain explicit approximation of the Colebrook equation: friction factor and dln(f)/dln(Re)
+    """
+    u = ed / 3.7 + 5.74 * re ** -0.9
+    lg = np.log10(u)
+    return 0.25 / lg ** 2, 2 * 0.9 * 5.74 * re ** -0.9 / (lg * u * LN10)
+
+
+def _haaland(re, ed):
+    """
+    Haaland explicit approximation of the Colebrook equation: friction factor and dln(f)/dln(Re)
+    """
+    u = (ed / 3.7) ** 1.11 + 6.9 / re
+    lg = np.log10(u)
+    return 1 / (1.8 * lg) ** 2, 2 * 6.9 / (re * lg * u * LN10)
+
+
+def _colebrook(re, ed):
+    """
+    Colebrook equation solved by fixed-point iterations on x = 1/sqrt(f) (from Swamee-Jain): friction factor and
+    dln(f)/dln(Re) by implicit differentiation
+    """
+    b = 2.51 / re
+    a = ed / 3.7
+    x = 1 / np.sqrt(_swamee_jain(re, ed)[0])
+    for _ in range(COLEBROOK_MAX_ITER):
+        x_new = -2 * np.log10(a + b * x)
+        done = np.all(np.abs(x_new - x) <= COLEBROOK_TOL * x_new)
+        x = x_new
+        if done:
+            break
+
+    # x = -2*log10(a + b*x) => dln(f)/dln(Re)
+    c = a + b * x
+    return 1 / x ** 2, -4 * b / (LN10 * c + 2 * b)
+
+
+_TURBULENT = {"colebrook": _colebrook, "swamee-jain": _swamee_jain, "haaland": _haaland}
+
+
+def _check_model(model):
+    try:
+        assert model in MODELS
+    except AssertionError:
+        msg = "The friction model {} is not supported (choose among {}) !".format(model, MODELS)
+        raise ValueError(msg)
+
+
+def _blend(re, f_lam, f_turb, dlnf_turb):
+    """
+    Friction factor and dln(f)/dln(Re) in the transition regime: the laminar and turbulent laws weighted by a
+    smoothstep of Re between RE_LAMINAR and RE_TURBULENT (continuous, with a continuous derivative)
+    """
+    s = (re - RE_LAMINAR) / (RE_TURBULENT - RE_LAMINAR)
+    w = s * s * (3 - 2 * s)
+    dw = 6 * s * (1 - s) / (RE_TURBULENT - RE_LAMINAR)
+    f = (1 - w) * f_lam + w * f_turb
+    return f, (-(1 - w) * f_lam + w * f_turb * dlnf_turb + re * dw * (f_turb - f_lam)) / f
+
+
+def friction_factor(re, ed, model="colebrook"):
+    """
+    Darcy friction factor and its logarithmic derivative dln(f)/dln(Re): 64/Re in laminar regime (Re < RE_LAMINAR),
+    the given model in turbulent regime (Re >= RE_TURBULENT) and a smooth blend of both in between (no jump of the
+    friction factor or of its derivative for the Newton-Raphson solver)
+
+    :param re: Reynolds numbers (> 0)
+    :param ed: relative roughness of the pipes
+    :param model: "colebrook", "swamee-jain", "haaland" or "laminar" (64/Re in all regimes) (default: "colebrook")
+    :return: the friction factors and their logarithmic derivatives
+    """
+    _check_model(model)
+    re = np.asarray(re, dtype=float)
+    ed = np.broadcast_to(np.asarray(ed, dtype=float), re.shape)
+    f = 64 / re
+    dlnf = np.full(re.shape, -1.0)
+
+    turb = re >= RE_LAMINAR
+    if model != "laminar" and np.any(turb):
+        f[turb], dlnf[turb] = _TURBULENT[model](re[turb], ed[turb])
+        trans = turb & (re < RE_TURBULENT)
+        if np.any(trans):
+            f[trans], dlnf[trans] = _blend(re[trans], 64 / re[trans], f[trans], dlnf[trans])
+    return f, dlnf
+
+
+def _pressure_drop(m_dot, l, d, e, rho, mu, model="colebrook"):
+    """
+    Pressure drops, their derivatives with respect to the mass flow and the logarithmic derivatives of the friction
+    factors (see pressure_drop)
+    """
+    _check_model(model)
+    m_dot = np.asarray(m_dot, dtype=float)
+    l, d, e, rho, mu = (np.broadcast_to(np.asarray(v, dtype=float), m_dot.shape) for v in (l, d, e, rho, mu))
+    a = np.pi * (d / 2) ** 2
+    re = np.abs(m_dot) * d / (a * mu)
+
+    k_lam = 2 ** 7 * l * mu / (d ** 4 * np.pi * rho)
+    dp = k_lam * m_dot
+    ddp = np.array(k_lam, dtype=float)
+    dlnf = np.full(m_dot.shape, -1.0)
+
+    turb = re >= RE_LAMINAR
+    if model != "laminar" and np.any(turb):
+        f, dlnf[turb] = friction_factor(re[turb], e[turb] / d[turb], model)
+        mt = m_dot[turb]
+        dpt = f * l[turb] / d[turb] * mt * np.abs(mt) / (2 * rho[turb] * a[turb] ** 2)
+        dp[turb] = dpt
+        ddp[turb] = np.abs(dpt / mt) * (2 + dlnf[turb])
+    return dp, ddp, dlnf
+
+
+def pressure_drop(m_dot, l, d, e, rho, mu, model="colebrook"):
+    """
+    Pressure drop along pipes (in [Pa]) and its derivative with respect to the mass flow (in [Pa.s/kg])
+
+    The pressure drop is odd in m_dot (reverse flows give negative pressure drops): dP = f*L/D*m*|m|/(2*rho*A²)
+    (transition and turbulent regimes), and dP = 2⁷*L*mu*m/(D⁴*pi*rho) (Hagen-Poiseuille) in laminar regime.
+
+    :param m_dot: mass flows (in [kg/s])
+    :param l: lengths (in [m])
+    :param d: diameters (in [m])
+    :param e: absolute roughness (in [m])
+    :param rho: density of the fluid (in [kg/m³]), one value or one per pipe
+    :param mu: dynamic viscosity of the fluid (in [Pa.s]), one value or one per pipe
+    :param model: friction model in turbulent regime (see friction_factor) (default: "colebrook")
+    :return: the pressure drops and their derivatives
+    """
+    dp, ddp, _ = _pressure_drop(m_dot, l, d, e, rho, mu, model)
+    return dp, ddp
+
+
+def fluid_sensitivity(dp, dlnf, rho, mu, drho, dmu):
+    """
+    Derivative of the pressure drops with respect to the pressure of the fluid (no unit), through its density and
+    viscosity: dP is proportional to 1/rho, and to mu (laminar) or f(Re) with Re proportional to 1/mu (turbulent)
+
+    :param dp: the pressure drops (in [Pa])
+    :param dlnf: the logarithmic derivatives dln(f)/dln(Re) of the friction factors (-1 in laminar regime)
+    :param rho: densities of the fluid (in [kg/m³])
+    :param mu: dynamic viscosities of the fluid (in [Pa.s])
+    :param drho: derivatives of the densities with respect to the pressure (in [kg/m³/Pa])
+    :param dmu: derivatives of the viscosities with respect to the pressure (in [Pa.s/Pa])
+    :return: the derivatives of the pressure drops
+    """
+    return -dp * (drho / rho + dlnf * dmu / mu)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Import of large bus and pipe datasets (CSV files, DataFrames or GeoJSON-like records), read in chunks.
+
+    Usage:
+
+    >>> import pandangas as pg
+
+    >>> net = pg.create_empty_network()
+    >>> pg.import_network(net, buses="nodes.csv", pipes="segments.csv", pipe_columns={"length_m": "SHAPE_Length"})
+
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from pandangas.pandangas import create_buses, create_pipes
+
+BUS_COLUMNS = ["name", "level", "zone"]
+PIPE_COLUMNS = ["name", "from_bus", "to_bus", "length_m", "diameter_m", "material", "in_service"]
+DEFAULTS = {"zone": None, "material": "steel", "in_service": True}
+TRUE_VALUES = {True, 1, "1", "true", "True", "TRUE", "yes", "y"}
+FALSE_VALUES = {False, 0, "0", "false", "False", "FALSE", "no", "n"}
+
+
+class InvalidRowsError(ValueError):
+    """
+    Raised when rows of an imported dataset are invalid, with all of them in rows (DataFrame: table, row, name,
+    reason)
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        msg = "{} invalid rows, nothing was imported:\n{}".format(len(rows), rows.to_string(index=False))
+        super().__init__(msg)
+
+
+def _chunks(source, chunksize, read_csv):
+    """
+    Yield DataFrame chunks of a source: a CSV file (path or buffer), a DataFrame or records (dicts, GeoJSON-like
+    features with "properties" or a FeatureCollection)
+    """
+    if source is None:
+        return
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start : start + chunksize].reset_index(drop=True)
+    elif isinstance(source, str) or hasattr(source, "read"):
+        for chunk in pd.read_csv(source, chunksize=chunksize, **read_csv):
+            yield chunk.reset_index(drop=True)
+    else:
+        if isinstance(source, dict):
+            source = source["features"]
+        records = iter(source)
+        while True:
+            batch = list(itertools.islice(records, chunksize))
+            if not batch:
+                return
+            yield pd.DataFrame([r.get("properties", r) for r in batch])
+
+
+def _mapped(chunk, columns, schema, required):
+    """
+    Rename the columns of a chunk to the schema (columns maps schema columns to source columns), add the defaults of
+    the missing optional columns
+    """
+    chunk = chunk.rename(columns={src: dst for dst, src in (columns or {}).items()})
+    missing = [col for col in required if col not in chunk.columns]
+    if missing:
+        msg = "The columns {} are missing (map them with the columns argument) !".format(missing)
+        raise ValueError(msg)
+    for col in schema:
+        if col not in chunk.columns:
+            chunk[col] = DEFAULTS[col]
+    return chunk[schema].copy()
+
+
+def _errors(table, offset, chunk, bad, reason):
+    """
+    Rows of errors for the rows of a chunk selected by bad
+    """
+    bad = np.asarray(bad, dtype=bool)
+    return pd.DataFrame(
+        {"table": table, "row": offset + np.flatnonzero(bad), "name": chunk["name"].values[bad], "reason": reason}
+    )
+
+
+def _check_names(table, offset, chunk, seen):
+    """
+    Missing and duplicated names (in the chunk, the previous chunks or the network)
+    """
+    names = chunk["name"]
+    missing = names.isnull().values
+    duplicated = ~missing & (names.duplicated().values | names.isin(seen).values)
+    seen.update(names[~missing])
+    return [
+        _errors(table, offset, chunk, missing, "missing name"),
+        _errors(table, offset, chunk, duplicated, "duplicated name"),
+    ]
+
+
+def _parse_bool(values):
+    """
+    Parse in service flags, NaN for unknown values
+    """
+    return values.map(lambda v: True if v in TRUE_VALUES else (False if v in FALSE_VALUES else np.nan))
+
+
+def _rollback(net, sizes):
+    """
+    Remove the rows appended to the tables of a given network since they had the given sizes
+    """
+    for table, size in sizes.items():
+        setattr(net, table, getattr(net, table).iloc[:size].copy())
+
+
+def import_network(net, buses=None, pipes=None, bus_columns=None, pipe_columns=None, chunksize=100000, **read_csv):
+    """
+    Import buses and pipes into a given network from large datasets, read in chunks
+
+    Each chunk is mapped onto the bus or pipe schema, validated in bulk (bus names and levels, pipe names, existence
+    of their buses in the network or the imported buses, pressure levels of their ends, lengths and diameters) and
+    created with one call of create_buses or create_pipes, so that only one chunk of rows is held in memory at a
+    time (plus the names and levels of the buses, to validate the pipes). All the invalid rows are reported at once
+    (InvalidRowsError): the reading goes on to find them, and the rows already created are removed (nothing is
+    imported), as on any other error (ex: a missing column).
+
+    :param net: the given network
+    :param buses: the buses: a CSV file (path or buffer), a DataFrame or records (dicts or GeoJSON-like features)
+    (default: None)
+    :param pipes: the pipes, same formats as the buses (default: None)
+    :param bus_columns: dict mapping the bus columns (name, level, zone) to the columns of the dataset (default: None,
+    same names)
+    :param pipe_columns: dict mapping the pipe columns (name, from_bus, to_bus, length_m, diameter_m, material,
+    in_service) to the columns of the dataset (default: None, same names)
+    :param chunksize: number of rows read at once (default: 100000)
+    :param read_csv: extra arguments passed to pandas.read_csv (ex: sep=";")
+    :return: the numbers of imported buses and pipes
+    """
+    sizes = {"bus": len(net.bus), "pipe": len(net.pipe)}
+    errors = []
+
+    try:
+        # Buses --------------------------------------------------------------------------------------------------------
+        levels = dict(zip(net.bus["name"], net.bus["level"]))
+        seen = set(net.bus["name"])
+        offset = 0
+        for chunk in _chunks(buses, chunksize, read_csv):
+            chunk = _mapped(chunk, bus_columns, BUS_COLUMNS, ["name", "level"])
+            errors += _check_names("bus", offset, chunk, seen)
+            errors.append(_errors("bus", offset, chunk, ~chunk["level"].isin(list(net.LEVELS)), "unknown level"))
+            valid = chunk["name"].notnull().values
+            levels.update(zip(chunk["name"].values[valid], chunk["level"].values[valid]))
+            errors = [e for e in errors if len(e)]
+            if not errors:
+                zones = chunk["zone"].where(chunk["zone"].notnull(), None)
+                create_buses(net, chunk["level"].values, chunk["name"].values, zones.values)
+            offset += len(chunk)
+
+        # Pipes --------------------------------------------------------------------------------------------------------
+        levels = pd.Series(levels, dtype=object)
+        seen = set(net.pipe["name"])
+        offset = 0
+        for chunk in _chunks(pipes, chunksize, read_csv):
+            chunk = _mapped(chunk, pipe_columns, PIPE_COLUMNS, ["name", "from_bus", "to_bus", "length_m", "diameter_m"])
+            errors += _check_names("pipe", offset, chunk, seen)
+
+            lev_from = chunk["from_bus"].map(levels)
+            lev_to = chunk["to_bus"].map(levels)
+            errors.append(_errors("pipe", offset, chunk, lev_from.isnull(), "unknown from_bus"))
+            errors.append(_errors("pipe", offset, chunk, lev_to.isnull(), "unknown to_bus"))
+            different = lev_from.notnull() & lev_to.notnull() & (lev_from != lev_to)
+            errors.append(_errors("pipe", offset, chunk, different, "different pressure levels"))
+
+            for col in ["length_m", "diameter_m"]:
+                chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+                errors.append(_errors("pipe", offset, chunk, ~(chunk[col] > 0), "invalid " + col))
+            chunk["in_service"] = _parse_bool(chunk["in_service"])
+            errors.append(_errors("pipe", offset, chunk, chunk["in_service"].isnull(), "invalid in_service"))
+
+            errors = [e for e in errors if len(e)]
+            if not errors:
+                create_pipes(
+                    net,
+                    chunk["from_bus"].values,
+                    chunk["to_bus"].values,
+                    chunk["length_m"].values,
+                    chunk["diameter_m"].values,
+                    chunk["name"].values,
+                    chunk["material"].values,
+                    chunk["in_service"].values.astype(bool),
+                )
+            offset += len(chunk)
+    except Exception:  # ex: a missing column in a chunk of pipes, after the buses were created
+        _rollback(net, sizes)
+        raise
+
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame()
+    if len(errors):
+        _rollback(net, sizes)
+        raise InvalidRowsError(errors.sort_values(["table", "row"], kind="mergesort").reset_index(drop=True))
+    return len(net.bus) - sizes["bus"], len(net.pipe) - sizes["pipe"]
@@ -2,12 +2,14 @@
 
 """Main module."""
 
+import numpy as np
 import pandas as pd
 
 
 class _Network:
 
     # TODO: add H2/CH4 composition
+    GAS = "natural gas"
     LEVELS = {"HP": 5.5e5, "MP": 2.0e5, "BP+": 1.1e5, "BP": 1.025e5}  # Pa
     LHV = 38.1e3  # kJ/kg
     V_MAX = 2.0  # m/s
@@ -28,6 +30,12 @@ class _Network:
         self.res_feeder = pd.DataFrame(columns=["name", "m_dot_kg/s", "p_kW", "loading_%"])
         self.res_station = pd.DataFrame(columns=["name", "m_dot_kg/s", "p_kW", "loading_%"])
 
+        self.fluid_table = {}  # precomputed fluid properties, by pressure level (see fluid.create_fluid_table)
+        self.solver_info = {}  # convergence information of the last simulation, by pressure level
+        self.last_solution = {}  # last non-linear solution, by bus and pipe name (for warm starts)
+        self.stats = None  # profiling.Stats of the last simulation if run with stats enabled
+        self._indexes = {}  # (table, column) -> (table, number of rows, {value: row index})
+
         self.keys = {"bus", "pipe", "load", "feeder", "station", "res_bus", "res_pipe", "res_feeder", "res_station"}
 
     def __repr__(self):
@@ -51,6 +59,61 @@ class _Network:
 
         return r
 
+    def to_file(self, path):
+        """
+        Save the network in a directory (see persistence.to_file)
+
+        :param path: the directory
+        :return:
+        """
+        from pandangas.persistence import to_file
+
+        to_file(self, path)
+
+    def lookup(self, table, col="name"):
+        """
+        Return the mapping value -> row index of a column of a table (first occurrence of each value)
+
+        The mapping is maintained incrementally when elements are created and rebuilt when the table is replaced
+        or its number of rows changes (elements added or removed directly in the DataFrame).
+
+        :param table: the name of the table (ex: "bus")
+        :param col: the name of the column (default: "name")
+        :return: a dict
+        """
+        df = getattr(self, table)
+        cached = self._indexes.get((table, col))
+        if cached is None or cached[0] is not df or cached[1] != len(df):
+            mapping = dict(zip(reversed(df[col].values.tolist()), reversed(df.index.tolist())))
+            cached = (df, len(df), mapping)
+            self._indexes[(table, col)] = cached
+        return cached[2]
+
+    def get_index(self, table, value, col="name"):
+        """
+        Return the index of an element in a table given a value and the name of the column to search for.
+        Return a new index if the element doesn't exist yet
+
+        :param table: the name of the table (ex: "bus")
+        :param value: the value to look for
+        :param col: the name of the column (default: "name")
+        :return: the index
+        """
+        return self.lookup(table, col).get(value, len(getattr(self, table)))
+
+    def _register(self, table, idx):
+        """
+        Update the maintained indexes of a table after a row was appended to it
+        """
+        df = getattr(self, table)
+        for (tb, col), (ref, length, mapping) in list(self._indexes.items()):
+            if tb == table:
+                if ref is df and length + 1 == len(df):
+                    mapping.setdefault(df.at[idx, col], idx)
+                    self._indexes[(tb, col)] = (ref, len(df), mapping)
+                else:
+                    del self._indexes[(tb, col)]
+
 
 def _try_existing_bus(net, bus):
     """
@@ -61,7 +124,7 @@ def _try_existing_bus(net, bus):
     :return:
     """
     try:
-        assert bus in net.bus.name.unique()
+        assert bus in net.lookup("bus")
     except AssertionError:
         msg = "The bus {} does not exist !".format(bus)
         raise ValueError(msg)
@@ -79,8 +142,9 @@ def _check_level(net, bus_a, bus_b, same=True):
     if False, the method will check if the node have different pressure levels (default: True)
     :return:
     """
-    lev_a = net.bus.loc[net.bus.name == bus_a, "level"].all()
-    lev_b = net.bus.loc[net.bus.name == bus_b, "level"].all()
+    buses = net.lookup("bus")
+    lev_a = net.bus.at[buses[bus_a], "level"]
+    lev_b = net.bus.at[buses[bus_b], "level"]
 
     if same:
         try:
@@ -97,7 +161,7 @@ def _check_level(net, bus_a, bus_b, same=True):
 
 
 def _change_bus_type(net, bus, bus_type):
-    idx = net.bus.index[net.bus["name"] == bus].tolist()[0]
+    idx = net.lookup("bus")[bus]
     old_type = net.bus.at[idx, "type"]
     try:
         assert old_type == "NODE"
@@ -108,6 +172,51 @@ def _change_bus_type(net, bus, bus_type):
     net.bus.at[idx, "type"] = bus_type
 
 
+def _bulk_frame(columns, values):
+    """
+    Build a DataFrame from array-likes and scalars (broadcast to the length of the array-likes)
+
+    :param columns: the columns of the DataFrame
+    :param values: the values of each column, in the same order
+    :return: a DataFrame
+    """
+    arrays = [np.asarray(v, dtype=object) if np.ndim(v) else v for v in values]
+    length = max([len(a) for a in arrays if np.ndim(a)] + [1])
+    data = {col: (a if np.ndim(a) else np.full(length, a, dtype=object)) for col, a in zip(columns, arrays)}
+    return pd.DataFrame(data, columns=columns)
+
+
+def _bus_rows(net, buses):
+    """
+    Vectorized bus lookup: return the bus table indexes of the given bus names, raise ValueError if some do not exist
+
+    :param net: the given network
+    :param buses: array-like of bus names
+    :return: array of indexes in net.bus
+    """
+    rows = pd.Series(np.asarray(buses, dtype=object)).map(net.lookup("bus"))
+    if rows.isnull().any():
+        missing = pd.unique(np.asarray(buses, dtype=object)[rows.isnull().values])
+        msg = "The buses {} do not exist !".format(list(missing))
+        raise ValueError(msg)
+    return rows.values.astype(int)
+
+
+def _append(net, table, df):
+    """
+    Append the rows of a DataFrame to a table of a given network in one step
+
+    :param net: the given network
+    :param table: the name of the table (ex: "pipe")
+    :param df: the DataFrame to append, with the same columns as the table
+    :return:
+    """
+    old = getattr(net, table)
+    df = df[old.columns]
+    df.index = pd.RangeIndex(len(old.index), len(old.index) + len(df))
+    setattr(net, table, pd.concat([old, df]) if len(old) else df)
+
+
 def create_empty_network():
     """
     Create an empty network
@@ -135,9 +244,31 @@ def create_bus(net, level, name, zone=None):
 
     idx = len(net.bus.index)
     net.bus.loc[idx] = [name, level, zone, "NODE"]
+    net._register("bus", idx)
     return name
 
 
+def create_buses(net, level, name, zone=None):
+    """
+    Create several buses at once on a given network
+
+    :param net: the given network
+    :param level: nominal pressure level of the buses (array-like or scalar)
+    :param name: names of the buses (array-like)
+    :param zone: zone of the buses (array-like or scalar, default: None)
+    :return: names of the buses
+    """
+    df = _bulk_frame(["name", "level", "zone", "type"], [name, level, zone, "NODE"])
+
+    bad = ~df["level"].isin(list(net.LEVELS))
+    if bad.any():
+        msg = "The pressure level of the buses {} is not in {}".format(df.loc[bad, "name"].tolist(), net.LEVELS)
+        raise ValueError(msg)
+
+    _append(net, "bus", df)
+    return df["name"].values
+
+
 # TODO: add pipe material into pipe creation and simulation
 def create_pipe(net, from_bus, to_bus, length_m, diameter_m, name, material="steel", in_service=True):
     """
@@ -159,9 +290,43 @@ def create_pipe(net, from_bus, to_bus, length_m, diameter_m, name, material="ste
 
     idx = len(net.pipe.index)
     net.pipe.loc[idx] = [name, from_bus, to_bus, length_m, diameter_m, material, in_service]
+    net._register("pipe", idx)
     return name
 
 
+def create_pipes(net, from_bus, to_bus, length_m, diameter_m, name, material="steel", in_service=True):
+    """
+    Create several pipes at once between existing buses on a given network
+
+    Bus existence and pressure levels are validated with a single vectorized lookup for all the pipes.
+
+    :param net: the given network
+    :param from_bus: names of the already existing buses where the pipes start (array-like)
+    :param to_bus: names of the already existing buses where the pipes end (array-like)
+    :param length_m: lengths of the pipes (in [m], array-like or scalar)
+    :param diameter_m: inner diameters of the pipes (in [m], array-like or scalar)
+    :param name: names of the pipes (array-like)
+    :param material: materials of the pipes (array-like or scalar, default: "steel")
+    :param in_service: if False, the simulation will not take the pipe into account (default: True)
+    :return: names of the pipes
+    """
+    df = _bulk_frame(
+        ["name", "from_bus", "to_bus", "length_m", "diameter_m", "material", "in_service"],
+        [name, from_bus, to_bus, length_m, diameter_m, material, in_service],
+    )
+
+    levels = net.bus["level"]
+    lev_from = levels.loc[_bus_rows(net, df["from_bus"])].values
+    lev_to = levels.loc[_bus_rows(net, df["to_bus"])].values
+    bad = lev_from != lev_to
+    if np.any(bad):
+        msg = "The pipes {} connect buses with a different pressure level !".format(df.loc[bad, "name"].tolist())
+        raise ValueError(msg)
+
+    _append(net, "pipe", df)
+    return df["name"].values
+
+
 def create_load(net, bus, p_kW, name, min_p_Pa=1.018e5, scaling=1.0):
     """
     Create a load attached to an existing bus in a given network
@@ -178,11 +343,42 @@ def create_load(net, bus, p_kW, name, min_p_Pa=1.018e5, scaling=1.0):
 
     idx = len(net.load.index)
     net.load.loc[idx] = [name, bus, p_kW, min_p_Pa, scaling]
+    net._register("load", idx)
 
     _change_bus_type(net, bus, "SINK")
     return name
 
 
+def create_loads(net, bus, p_kW, name, min_p_Pa=1.018e5, scaling=1.0):
+    """
+    Create several loads at once attached to existing buses in a given network
+
+    :param net: the given network
+    :param bus: names of the existing buses (array-like)
+    :param p_kW: power consumed by the loads (in [kW], array-like or scalar)
+    :param name: names of the loads (array-like)
+    :param min_p_Pa: minimum acceptable pressure (array-like or scalar)
+    :param scaling: scaling factor for the loads (array-like or scalar, default: 1.0)
+    :return: names of the loads
+    """
+    df = _bulk_frame(["name", "bus", "p_kW", "min_p_Pa", "scaling"], [name, bus, p_kW, min_p_Pa, scaling])
+
+    rows = _bus_rows(net, df["bus"])
+    duplicated = pd.Index(rows).duplicated(keep=False)
+    if np.any(duplicated):
+        msg = "The buses {} have several loads in this batch !".format(pd.unique(df.loc[duplicated, "bus"]).tolist())
+        raise ValueError(msg)
+
+    bad = net.bus.loc[rows, "type"].values != "NODE"
+    if np.any(bad):
+        msg = "The buses {} are already a SINK or a SRCE !".format(pd.unique(df.loc[bad, "bus"]).tolist())
+        raise ValueError(msg)
+
+    _append(net, "load", df)
+    net.bus.loc[rows, "type"] = "SINK"
+    return df["name"].values
+
+
 def create_feeder(net, bus, p_lim_kW, p_Pa, name):
     """
     Create a feeder attached to an existing bus in a given network
@@ -198,6 +394,7 @@ def create_feeder(net, bus, p_lim_kW, p_Pa, name):
 
     idx = len(net.feeder.index)
     net.feeder.loc[idx] = [name, bus, p_lim_kW, p_Pa]
+    net._register("feeder", idx)
 
     _change_bus_type(net, bus, "SRCE")
     return name
@@ -221,6 +418,7 @@ def create_station(net, bus_high, bus_low, p_lim_kW, p_Pa, name):
 
     idx = len(net.station.index)
     net.station.loc[idx] = [name, bus_high, bus_low, p_lim_kW, p_Pa]
+    net._register("station", idx)
 
     _change_bus_type(net, bus_high, "SINK")
     _change_bus_type(net, bus_low, "SRCE")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Save and load networks as a directory of .npy column files and a JSON description.
+
+    Usage:
+
+    >>> import pandangas as pg
+
+    >>> pg.to_file(net, "network")
+    >>> net = pg.from_file("network")
+    >>> arrays = pg.load_arrays("network")  # memory-mapped, read-only
+
+    Layout of the directory: meta.json, one sub-directory per table (bus, pipe, ..., res_bus, ...) with one .npy file
+    per column and one for the index, arrays/ (the compiled array model of the network, see arrays.NetworkArrays) and
+    last_solution/ (the last non-linear solution, for warm starts). Numbers and strings are stored as plain (non
+    pickled) numpy arrays, which can be memory-mapped on load.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pandangas.arrays import NetworkArrays, compile_network
+from pandangas.pandangas import create_empty_network
+
+FORMAT_VERSION = 1
+TABLES = ["bus", "pipe", "load", "feeder", "station", "res_bus", "res_pipe", "res_feeder", "res_station"]
+CONSTANTS = ["GAS", "LEVELS", "LHV", "V_MAX", "T_GRND"]
+
+
+def _save_column(directory, name, values):
+    """
+    Save a column as .npy file(s), return its kind: "number", "bool", "str" (with a mask of missing values if any) or
+    "none" (only missing values)
+    """
+    values = np.asarray(values)
+    mask = os.path.join(directory, name + ".missing.npy")
+    if os.path.exists(mask):  # from an earlier save in the same directory
+        os.remove(mask)
+    if values.dtype != object:
+        kind = "bool" if values.dtype == bool else "number"
+    else:
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        if inferred == "empty":
+            return "none"
+        if inferred == "boolean":
+            kind, values = "bool", values.astype(bool)
+        elif inferred in ["integer", "floating", "mixed-integer-float", "decimal"]:
+            kind, values = "number", pd.to_numeric(values)
+        else:
+            missing = pd.isnull(values)
+            kind, values = "str", np.where(missing, "", values).astype(str)
+            if missing.any():
+                np.save(mask, missing)
+    np.save(os.path.join(directory, name + ".npy"), values)
+    return kind
+
+
+def _load_column(directory, name, kind, length, mmap_mode=None):
+    """
+    Load a column saved by _save_column
+    """
+    if kind == "none":
+        return np.full(length, None, dtype=object)
+    values = np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+    if kind != "str":
+        return values
+    values = values.astype(object)
+    missing = os.path.join(directory, name + ".missing.npy")
+    if os.path.exists(missing):
+        values[np.load(missing)] = None
+    return values
+
+
+def _save_table(directory, df):
+    os.makedirs(directory, exist_ok=True)
+    np.save(os.path.join(directory, "__index__.npy"), df.index.values.astype(np.int64))
+    columns = [[col, _save_column(directory, "col{}".format(i), df[col].values)] for i, col in enumerate(df.columns)]
+    return {"columns": columns, "length": len(df)}
+
+
+def _load_table(directory, desc):
+    index = np.load(os.path.join(directory, "__index__.npy"))
+    data = {
+        col: _load_column(directory, "col{}".format(i), kind, desc["length"])
+        for i, (col, kind) in enumerate(desc["columns"])
+    }
+    return pd.DataFrame(data, index=index, columns=[col for col, _ in desc["columns"]])
+
+
+def _json_value(value):
+    """
+    Convert numpy scalars to JSON compatible values
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def to_file(net, path):
+    """
+    Save a network (element and results tables, compiled array model, convergence information and last non-linear
+    solution) in a directory
+
+    :param net: the given network
+    :param path: the directory (created if it doesn't exist, existing files are overwritten)
+    :return:
+    """
+    os.makedirs(path, exist_ok=True)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "constants": {name: getattr(net, name) for name in CONSTANTS},
+        "solver_info": {
+            level: {k: _json_value(v) for k, v in info.items()} for level, info in net.solver_info.items()
+        },
+        "tables": {table: _save_table(os.path.join(path, table), getattr(net, table)) for table in TABLES},
+    }
+
+    arrays = compile_network(net)
+    directory = os.path.join(path, "arrays")
+    os.makedirs(directory, exist_ok=True)
+    meta["arrays"] = {"levels": arrays.levels, "columns": {}}
+    for name, values in vars(arrays).items():
+        if isinstance(values, np.ndarray):
+            meta["arrays"]["columns"][name] = [_save_column(directory, name, values), len(values)]
+
+    directory = os.path.join(path, "last_solution")
+    os.makedirs(directory, exist_ok=True)
+    meta["last_solution"] = {}
+    for key, values in net.last_solution.items():
+        kind = _save_column(directory, key + ".names", np.array(list(values), dtype=object))
+        np.save(os.path.join(directory, key + ".values.npy"), np.array(list(values.values()), dtype=float))
+        meta["last_solution"][key] = [kind, len(values)]
+
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    try:
+        assert meta.get("format_version") == FORMAT_VERSION
+    except AssertionError:
+        msg = "The format version of {} is not supported (expected {}) !".format(path, FORMAT_VERSION)
+        raise ValueError(msg)
+    return meta
+
+
+def load_arrays(path, mmap_mode="r"):
+    """
+    Load the compiled array model of a network saved by to_file, memory-mapped by default (read-only analysis,
+    ex: topology.create_topology(net, arrays=...))
+
+    :param path: the directory
+    :param mmap_mode: memory-map mode of numpy.load, None to read the arrays in memory (default: "r")
+    :return: a NetworkArrays
+    """
+    meta = _read_meta(path)
+    arrays = NetworkArrays.__new__(NetworkArrays)
+    arrays.levels = meta["arrays"]["levels"]
+    directory = os.path.join(path, "arrays")
+    for name, (kind, length) in meta["arrays"]["columns"].items():
+        setattr(arrays, name, _load_column(directory, name, kind, length, mmap_mode))
+    return arrays
+
+
+def from_file(path):
+    """
+    Load a network saved by to_file (see load_arrays to memory-map its array model instead)
+
+    :param path: the directory
+    :return: the network
+    """
+    meta = _read_meta(path)
+    net = create_empty_network()
+    for name, value in meta["constants"].items():
+        if value != getattr(net, name):
+            setattr(net, name, value)
+
+    for table, desc in meta["tables"].items():
+        setattr(net, table, _load_table(os.path.join(path, table), desc))
+    net.solver_info = meta["solver_info"]
+
+    directory = os.path.join(path, "last_solution")
+    for key, (kind, length) in meta["last_solution"].items():
+        names = _load_column(directory, key + ".names", kind, length)
+        values = np.load(os.path.join(directory, key + ".values.npy"))
+        net.last_solution[key] = dict(zip(names, values.tolist()))
+    return net
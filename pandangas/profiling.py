@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""Simulation profiling module: per phase and per level timers, counters and matrix statistics."""
+
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class _Timer:
+    """
+    Context manager adding the elapsed wall-clock time to a key of a Stats
+    """
+
+    def __init__(self, stats, key):
+        self.stats = stats
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.times[self.key] = self.stats.times.get(self.key, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Stats:
+    """
+    Statistics of a simulation: times by (phase, level), counts by (name, level) (ex: residual evaluations, Jacobian
+    factorizations) and sizes and sparsity of the matrices
+
+    Phases: "topology", "fluid", "assembly", "solve" and "results".
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.times = OrderedDict()
+        self.counts = OrderedDict()
+        self.matrices = []
+
+    def timer(self, phase, level=None):
+        """
+        Return a context manager timing a phase (of a level)
+        """
+        return _Timer(self, (phase, level))
+
+    def count(self, name, level=None, n=1):
+        """
+        Increment a counter (of a level)
+        """
+        self.counts[(name, level)] = self.counts.get((name, level), 0) + n
+
+    def matrix(self, name, a, level=None):
+        """
+        Record the size and the sparsity of a matrix (of a level)
+        """
+        nnz = a.nnz if hasattr(a, "nnz") else int((a != 0).sum())
+        size = a.shape[0] * a.shape[1]
+        self.matrices.append(
+            {"name": name, "level": level, "shape": a.shape, "nnz": nnz, "density": nnz / size if size else 0.0}
+        )
+
+    def merge(self, other):
+        """
+        Add the statistics of another Stats (ex: of a component solved in a worker)
+        """
+        if other is None or not other.enabled:
+            return
+        for key, value in other.times.items():
+            self.times[key] = self.times.get(key, 0.0) + value
+        for key, value in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        self.matrices.extend(other.matrices)
+
+    def by_phase(self):
+        """
+        Total time by phase (all levels)
+        """
+        res = OrderedDict()
+        for (phase, _), value in self.times.items():
+            res[phase] = res.get(phase, 0.0) + value
+        return res
+
+    def as_dataframe(self):
+        """
+        Times and counts as a DataFrame indexed by (phase or counter, level)
+        """
+        rows = [(phase, level, "time_s", value) for (phase, level), value in self.times.items()]
+        rows += [(name, level, "count", value) for (name, level), value in self.counts.items()]
+        return pd.DataFrame(rows, columns=["name", "level", "kind", "value"])
+
+    def __repr__(self):
+        r = "Simulation statistics:"
+        for phase, value in self.by_phase().items():
+            r += "\n   - %s: %.4f s" % (phase, value)
+        for (name, level), value in self.counts.items():
+            r += "\n   - %s%s: %s" % (name, "" if level is None else " (%s)" % level, value)
+        return r
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _NullStats:
+    """
+    Disabled statistics: every method is a no-op
+    """
+
+    enabled = False
+    _timer = _NullTimer()
+
+    def timer(self, phase, level=None):
+        return self._timer
+
+    def count(self, name, level=None, n=1):
+        pass
+
+    def matrix(self, name, a, level=None):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+NULL_STATS = _NullStats()
+
+
+def as_stats(stats):
+    """
+    Return a Stats from a flag: a Stats is returned unchanged, True gives a new Stats and None or False the disabled
+    (no-op) statistics
+    """
+    if stats is None or stats is False:
+        return NULL_STATS
+    if stats is True:
+        return Stats()
+    return stats
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+"""Network reduction: pruning of load-free dead ends and merging of series pipes before the solve."""
+
+import numpy as np
+
+from pandangas.topology import LevelTopology
+
+
+class Reduction:
+    """
+    Reduced topology of a level, and the mapping to expand its solution back to the original level
+
+    Passive leaves (load-free dead ends) are pruned repeatedly: their pipes carry no flow and their pressure is the
+    pressure of the bus they hang from. Then each passive bus joining exactly two pipes of the same diameter and
+    roughness is removed and its pipes merged into one equivalent pipe (sum of the lengths): both pipes carry the same
+    flow and, the pressure loss being proportional to the length, the pressure of the bus is interpolated between
+    the ends of the equivalent pipe.
+
+    :param tp: the LevelTopology of the level
+    """
+
+    def __init__(self, tp):
+        self.original = tp
+        n = tp.nbr_nodes
+        incident = [set() for _ in range(n)]
+        for i, (u, v) in enumerate(zip(tp.from_pos, tp.to_pos)):
+            if u != v:
+                incident[u].add(i)
+                incident[v].add(i)
+
+        # Pruning of the passive leaves --------------------------------------------------------------------------------
+        removed = np.zeros(n, dtype=bool)
+        pruned = []  # (node, node it hangs from)
+        leaves = [i for i in range(n) if tp.is_pass[i] and len(incident[i]) == 1]
+        while leaves:
+            node = leaves.pop()
+            if removed[node] or len(incident[node]) != 1:
+                continue
+            pipe = incident[node].pop()
+            other = tp.to_pos[pipe] if tp.from_pos[pipe] == node else tp.from_pos[pipe]
+            incident[other].discard(pipe)
+            removed[node] = True
+            pruned.append((node, other))
+            if tp.is_pass[other] and len(incident[other]) == 1:
+                leaves.append(other)
+
+        # Merging of the series pipes ----------------------------------------------------------------------------------
+        # Each pipe of the reduced level is a chain: from and to nodes, (original pipe, sign) segments and
+        # (interior node, distance from the from node) in the order of the chain
+        eps = tp.roughness
+        chains = {
+            i: [tp.from_pos[i], tp.to_pos[i], [(i, 1.0)], [], tp.lengths[i]]
+            for i in range(tp.nbr_pipes)
+            if tp.from_pos[i] != tp.to_pos[i] and not (removed[tp.from_pos[i]] or removed[tp.to_pos[i]])
+        }
+        for node in range(n):
+            if removed[node] or not tp.is_pass[node] or len(incident[node]) != 2:
+                continue
+            a, b = sorted(incident[node])
+            if tp.diameters[a] != tp.diameters[b] or eps[a] != eps[b]:
+                continue
+            first, second = self._ending_at(chains[a], node), self._starting_at(chains[b], node)
+            if first[0] == second[1]:
+                continue  # the merged pipe would be a loop
+            length = first[4] + second[4]
+            interior = first[3] + [(node, first[4])] + [(x, first[4] + d) for x, d in second[3]]
+            chains[a] = [first[0], second[1], first[2] + second[2], interior, length]
+            del chains[b]
+            incident[second[1]].discard(b)
+            incident[second[1]].add(a)
+            removed[node] = True
+
+        self._build(tp, removed, pruned, chains)
+
+    @staticmethod
+    def _reversed(chain):
+        u, v, segments, interior, length = chain
+        segments = [(i, -s) for i, s in reversed(segments)]
+        return [v, u, segments, [(x, length - d) for x, d in reversed(interior)], length]
+
+    def _ending_at(self, chain, node):
+        return chain if chain[1] == node else self._reversed(chain)
+
+    def _starting_at(self, chain, node):
+        return chain if chain[0] == node else self._reversed(chain)
+
+    def _build(self, tp, removed, pruned, chains):
+        kept = np.flatnonzero(~removed)
+        position = np.full(tp.nbr_nodes, -1, dtype=int)
+        position[kept] = np.arange(len(kept))
+        # Each reduced pipe is named after (and oriented as) its first original pipe
+        pipes = sorted(chains)
+        chains = {i: chains[i] if dict(chains[i][2])[i] > 0 else self._reversed(chains[i]) for i in pipes}
+
+        self.topology = LevelTopology.__new__(LevelTopology)
+        self.topology._set(
+            nodes=[tp.nodes[i] for i in kept],
+            node_index=tp.node_index[kept],
+            types=tp.types[kept],
+            zones=[tp._zones[i] for i in kept],
+            levels=[tp._levels[i] for i in kept],
+            pipes=[tp.pipes[i] for i in pipes],
+            pipe_index=tp.pipe_index[pipes],
+            from_pos=position[[chains[i][0] for i in pipes]],
+            to_pos=position[[chains[i][1] for i in pipes]],
+            lengths=[chains[i][4] for i in pipes],
+            diameters=tp.diameters[pipes],
+            materials=[tp.materials[i] for i in pipes],
+            roughness=tp.roughness[pipes],
+        )
+        self.topology._graph = None
+
+        # Expansion arrays
+        self.kept = kept
+        segments = [(k, j, s) for k, i in enumerate(pipes) for j, s in chains[i][2]]
+        self.segment_chain = np.array([k for k, _, _ in segments], dtype=int)
+        self.segment_pipe = np.array([j for _, j, _ in segments], dtype=int)
+        self.segment_sign = np.array([s for _, _, s in segments], dtype=float)
+        interior = [(k, x, d / chains[i][4]) for k, i in enumerate(pipes) for x, d in chains[i][3]]
+        self.interior_chain = np.array([k for k, _, _ in interior], dtype=int)
+        self.interior_node = np.array([x for _, x, _ in interior], dtype=int)
+        self.interior_frac = np.array([f for _, _, f in interior], dtype=float)
+
+        # Pruned nodes take the pressure of the first kept or interior node they hang from (in reverse pruning order)
+        root = np.arange(tp.nbr_nodes)
+        for node, other in reversed(pruned):
+            root[node] = root[other]
+        self.pruned_node = np.array([node for node, _ in pruned], dtype=int)
+        self.pruned_root = root[self.pruned_node]
+
+    @property
+    def ratio(self):
+        """
+        Size of the reduced system relative to the original one
+        """
+        tp, red = self.original, self.topology
+        return (2 * red.nbr_nodes + red.nbr_pipes) / max(1, 2 * tp.nbr_nodes + tp.nbr_pipes)
+
+    def expand(self, p_nodes, m_dot_pipes, m_dot_nodes):
+        """
+        Expand a solution of the reduced level to the original level
+
+        :return: nodes pressures, pipes mass flows and nodes mass flows of the original level
+        """
+        tp, red = self.original, self.topology
+        p = np.zeros(tp.nbr_nodes)
+        m_pipes = np.zeros(tp.nbr_pipes)
+        m_nodes = np.zeros(tp.nbr_nodes)
+
+        p[self.kept] = p_nodes
+        m_nodes[self.kept] = m_dot_nodes
+        m_pipes[self.segment_pipe] = self.segment_sign * m_dot_pipes[self.segment_chain]
+
+        p_from = p_nodes[red.from_pos[self.interior_chain]]
+        p_to = p_nodes[red.to_pos[self.interior_chain]]
+        p[self.interior_node] = p_from + (p_to - p_from) * self.interior_frac
+        p[self.pruned_node] = p[self.pruned_root]
+        return p, m_pipes, m_nodes
+
+
+def reduce_topology(tp):
+    """
+    Reduce the topology of a level (see Reduction)
+
+    :param tp: the LevelTopology of the level
+    :return: a Reduction (reduced topology in Reduction.topology, Reduction.expand to expand its solution)
+    """
+    return Reduction(tp)
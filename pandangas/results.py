@@ -15,81 +15,278 @@
 # TODO: proper usage of node VS bus
 
 from math import pi
+import copy
 import operator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
 
 import pandangas.topology as top
 import pandangas.simu_linear as sim_ln
 import pandangas.simu_nonlinear as sim_nl
-from pandangas.utilities import get_index
+from pandangas.fluid import fluid_properties
+from pandangas.profiling import Stats, as_stats
+from pandangas.reduction import reduce_topology
+from pandangas.coupling import SOLVERS, COUPLINGS, solve_coupled
 
 
-def _v_from_m_dot(diam, m_dot, fluid):
-    q = m_dot / fluid.rho
+def _v_from_m_dot(diam, m_dot, fluid, rho=None):
+    q = m_dot / (fluid.rho if rho is None else rho)
     a = pi * diam ** 2 / 4
     return q / a
 
 
-def runpp(net, t_grnd=10 + 273.15, method="NON-LINEAR"):
+def _pipe_density(tp, p_nodes, fluid, eos="constant"):
+    """
+    Density of the gas in the pipes of a level (in [kg/m3]), at the mean pressure of their ends as in the non-linear
+    Model (simu_nonlinear.Model), or the density of the fluid with the constant equation of state; given a (scenarios
+    x nodes) array of pressures, one row of densities per scenario
+    """
+    if eos == "constant":
+        return fluid.rho
+    p_mean = (p_nodes[..., tp.from_pos] + p_nodes[..., tp.to_pos]) / 2
+    return fluid_properties(fluid, p_mean, eos)[0]
+
+
+def _write_results(net, table, data, index):
+    """
+    Append whole columns of results to a results table of a given network in one step
+
+    :param net: the given network
+    :param table: the name of the results table (ex: "res_bus")
+    :param data: dict mapping the columns of the table to arrays of values
+    :param index: the index of the new rows
+    :return:
+    """
+    old = getattr(net, table)
+    df = pd.DataFrame(data, index=index, columns=old.columns)
+    setattr(net, table, pd.concat([old, df]) if len(old) else df)
+
+
+def _write_level_results(net, solutions, eos="constant"):
+    """
+    Write the results of one pressure level (buses, pipes, stations and feeders) from the solver arrays of its
+    components, given as (LevelTopology, nodes pressures, pipes mass flows, nodes mass flows, fluid), with one append
+    per results table; the velocities use the density of the equation of state eos of the solve
+    """
+    tps = [solution[0] for solution in solutions]
+    p_nodes, m_dot_pipes, m_dot_nodes = (np.concatenate([solution[i] for solution in solutions]) for i in (1, 2, 3))
+    fluid = solutions[0][4]
+    nodes = [node for tp in tps for node in tp.nodes]
+
+    _write_results(
+        net, "res_bus", {"name": nodes, "p_Pa": np.round(p_nodes), "p_bar": np.round(p_nodes * 1e-5, 2)},
+        np.concatenate([tp.node_index for tp in tps]),
+    )
+
+    rho = [np.broadcast_to(_pipe_density(tp, p, fluid, eos), tp.nbr_pipes) for tp, p, _, _, _ in solutions]
+    v = _v_from_m_dot(np.concatenate([tp.diameters for tp in tps]), m_dot_pipes, fluid, np.concatenate(rho))
+    _write_results(
+        net,
+        "res_pipe",
+        {
+            "name": [pipe for tp in tps for pipe in tp.pipes],
+            "m_dot_kg/s": m_dot_pipes,
+            "v_m/s": np.round(v, 2),
+            "p_kW": np.round(m_dot_pipes * net.LHV, 1),
+            "loading_%": np.round(np.abs(100 * v / net.V_MAX), 1),
+        },
+        np.concatenate([tp.pipe_index for tp in tps]),
+    )
+
+    # Stations (at their low pressure bus) and feeders are the sources of the level
+    nodes = pd.Index(nodes)
+    for table, col, sign in [("station", "bus_low", -1), ("feeder", "bus", 1)]:
+        elements = getattr(net, table)
+        pos = nodes.get_indexer(elements[col])
+        found = pos >= 0
+        if not found.any():
+            continue
+        m_dot = sign * m_dot_nodes[pos[found]]
+        p_kw = m_dot * net.LHV
+        p_lim = elements.loc[found, "p_lim_kW"].values.astype(float)
+        start = len(getattr(net, "res_" + table))
+        _write_results(
+            net,
+            "res_" + table,
+            {
+                "name": elements.loc[found, "name"].values,
+                "m_dot_kg/s": m_dot,
+                "p_kW": p_kw,
+                "loading_%": np.round(np.abs(100 * p_kw / p_lim), 1),
+            },
+            pd.RangeIndex(start, start + int(found.sum())),
+        )
+
+
+def _run_component(method, net, level, topology, loads, p_ops, kwargs, profile=False, reduce=False):
+    """
+    Solve one independent component of a level (run in a worker) with the loads and operating pressures of the level,
+    return its solution, its statistics (if profile is True) and convergence information; if reduce is True, solve
+    the reduced component and expand its solution
+    """
+    net = copy.copy(net)
+    net.solver_info = {}
+    stats = as_stats(profile)
+    reduction = None
+    if reduce:
+        with stats.timer("reduction", level):
+            reduction = reduce_topology(topology)
+        topology = reduction.topology
+    run_one_level, extra = SOLVERS[method]
+    p_nodes, m_dot_pipes, m_dot_nodes, fluid = run_one_level(
+        net, level, topology=topology, loads=loads, p_ops=p_ops, stats=stats, **extra, **kwargs
+    )
+    if reduction is not None:
+        with stats.timer("reduction", level):
+            p_nodes, m_dot_pipes, m_dot_nodes = reduction.expand(p_nodes, m_dot_pipes, m_dot_nodes)
+        stats.count("reduced_nodes", level, reduction.original.nbr_nodes - topology.nbr_nodes)
+        stats.count("reduced_pipes", level, reduction.original.nbr_pipes - topology.nbr_pipes)
+    return p_nodes, m_dot_pipes, m_dot_nodes, fluid, stats, net.solver_info.get(level)
+
+
+def _merge_info(infos):
+    """
+    Merge the convergence information of the components of a level
+    """
+    infos = [info for info in infos if info is not None]
+    if not infos:
+        return None
+    return {
+        "solver": infos[0]["solver"],
+        "iterations": max(info["iterations"] for info in infos),
+        "converged": all(info["converged"] for info in infos),
+        "residual": max(info["residual"] for info in infos),
+        "components": len(infos),
+    }
+
 
-    # Reset results data-frames
-    net.res_bus.drop(net.res_bus.index, inplace=True)
-    net.res_pipe.drop(net.res_pipe.index, inplace=True)
-    net.res_feeder.drop(net.res_feeder.index, inplace=True)
-    net.res_station.drop(net.res_station.index, inplace=True)
+def _run_coupled(net, topology, method, coupling, reduce, stats, kwargs):
+    """
+    Solve all the levels with the stations flows exchanged in memory (see coupling.solve_coupled), write the results
+    """
+    levels = {}
+    for solution in solve_coupled(net, topology, method, coupling, reduce, stats, **kwargs):
+        levels.setdefault(solution[0], []).append(solution[1:])
+    for level, solutions in levels.items():
+        with stats.timer("results", level):
+            _write_level_results(net, [solution[:5] for solution in solutions], kwargs.get("eos", "constant"))
+            if method != "LINEAR":
+                for tp, p_nodes, m_dot_pipes, m_dot_nodes, _, _ in solutions:
+                    sim_nl.store_solution(net, tp, p_nodes, m_dot_pipes, m_dot_nodes)
+        info = _merge_info([solution[-1] for solution in solutions])
+        if info is not None:
+            net.solver_info[level] = info
+
+
+def runpp(net, t_grnd=10 + 273.15, method="NON-LINEAR", workers=1, executor="process", stats=False, reduce=False,
+          coupling="tables", **kwargs):
+    """
+    Run a power flow on a given network, level by level (from lower to higher pressure)
+
+    Each level is split into its weakly connected components, which are independent systems; with workers > 1 they
+    are solved concurrently in a pool of processes or threads.
+
+    :param net: the given network
+    :param t_grnd: ground temperature (in [K])
+    :param method: "NON-LINEAR" or "LINEAR" (full formulations), "NODAL" or "NODAL-LINEAR" (reduced nodal
+    formulations of the same models, see simu_nodal) (default: "NON-LINEAR")
+    :param workers: number of workers solving the components of a level concurrently (default: 1)
+    :param executor: "process" or "thread" pool (default: "process")
+    :param stats: if True (or a profiling.Stats), record the times of the phases (topology, fluid, assembly, solve,
+    results) by level, the solver counts and the matrices sizes in net.stats; if a function, also call it with the
+    Stats at the end of the simulation (default: False, no overhead)
+    :param reduce: if True, prune the load-free dead ends and merge the series pipes of each component before the
+    solve, then expand the solution to all the buses and pipes (see reduction.Reduction) (default: False)
+    :param coupling: how the flows of the stations reach the higher levels: "tables" (through net.res_station, each
+    level solved on its own), "arrays" (levels in sequence, flows passed in memory) or "block" (all the levels as one
+    system, LINEAR or NON-LINEAR with newton only), see coupling.solve_coupled; workers only apply to "tables"
+    (default: "tables")
+    :param kwargs: extra arguments passed to simu_nonlinear.run_one_level (solver, tol, max_iter, init, seed, ...),
+    simu_nodal.run_one_level (tol, max_iter, init, seed, ...) or simu_linear.run_one_level (check, iterative, tol)
+    :return:
+    """
+
+    try:
+        assert method in SOLVERS
+    except AssertionError:
+        msg = "The method {} is not supported (choose among {}) !".format(method, list(SOLVERS))
+        raise ValueError(msg)
+    try:
+        assert coupling in COUPLINGS
+    except AssertionError:
+        msg = "The coupling {} is not supported (choose among {}) !".format(coupling, COUPLINGS)
+        raise ValueError(msg)
+
+    callback = stats if callable(stats) and not isinstance(stats, Stats) else None
+    stats = as_stats(True if callback is not None else stats)
+
+    # Reset results data-frames, convergence information and statistics of a previous simulation
+    net.solver_info = {}
+    net.stats = None
+    for table in ["res_bus", "res_pipe", "res_feeder", "res_station"]:
+        setattr(net, table, pd.DataFrame(columns=getattr(net, table).columns))
 
     # Set results for pipes not in service
-    for pipe in net.pipe.loc[net.pipe["in_service"] == False, "name"].values:
-        idx = get_index(pipe, net.pipe)
-        net.res_pipe.loc[idx] = [pipe, 0.0, 0.0, 0.0, 0]
+    out = net.pipe.loc[net.pipe["in_service"] == False]
+    zeros = np.zeros(len(out))
+    data = {"name": out["name"].values, "m_dot_kg/s": zeros, "v_m/s": zeros, "p_kW": zeros, "loading_%": zeros}
+    _write_results(net, "res_pipe", data, out.index)
+
+    # Build the topology of all pressure levels once
+    with stats.timer("topology"):
+        topology = top.create_topology(net)
+
+    if coupling != "tables":
+        _run_coupled(net, topology, method, coupling, reduce, stats, kwargs)
+
+    pool = None
+    if workers > 1 and coupling == "tables":
+        pool = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}[executor](max_workers=workers)
 
     # Run simulation by pressure level (from lower to higher)
     sorted_levels = sorted(net.LEVELS.items(), key=operator.itemgetter(1))
-    for level, value in sorted_levels:
-        # Check if level exists
-        # TODO: Why not looping over net.bus["level"].unique() ???
-        if level in net.bus["level"].unique():
-            g = top.graphs_by_level_as_dict(net)
-            graph = g[level]
-            p_nodes, m_dot_pipes, m_dot_nodes, fluid = {"NON-LINEAR": sim_nl, "LINEAR": sim_ln}[method].run_one_level(
-                net, level
-            )
-
-            # Set p_node value in results
-            for (node, data), p in zip(graph.nodes(data=True), p_nodes):
-                net.res_bus.loc[data["index"]] = [node, round(p), round(p * 1e-5, 2)]
-
-            # Set m_dot_pip value in results
-            data_pipes = [data for u, v, data in graph.edges(data=True) if data["type"] == "PIPE"]
-            for data, m_dot in zip(data_pipes, m_dot_pipes):
-                v = _v_from_m_dot(data["D_m"], m_dot, fluid)
-                net.res_pipe.loc[data["index"]] = [
-                    data["name"],
-                    m_dot,
-                    round(v, 2),
-                    round(m_dot * net.LHV, 1),
-                    round(abs(100 * v / net.V_MAX), 1),
-                ]
-
-            # Set m_dot_pip value in results
-            for node, m_dot in zip(graph.nodes, m_dot_nodes):
-                if node in net.station["bus_low"].unique():
-                    idx_stat = get_index(node, net.station, col="bus_low")
-                    stat = net.station.at[idx_stat, "name"]
-                    idx = get_index(stat, net.res_station)
-                    net.res_station.loc[idx] = [
-                        stat,
-                        -m_dot,
-                        -m_dot * net.LHV,
-                        round(abs(-100 * m_dot * net.LHV / net.station.at[idx_stat, "p_lim_kW"]), 1),
-                    ]
+    try:
+        for level, value in sorted_levels:
+            # Check if level exists
+            if level in topology and coupling == "tables":
+                components = topology[level].components()
 
-                if node in net.feeder["bus"].unique():
-                    idx_feed = get_index(node, net.feeder, col="bus")
-                    feed = net.feeder.at[idx_feed, "name"]
-                    idx = get_index(feed, net.res_feeder)
-                    net.res_feeder.loc[idx] = [
-                        feed,
-                        m_dot,
-                        m_dot * net.LHV,
-                        round(abs(100 * m_dot * net.LHV / net.feeder.at[idx_feed, "p_lim_kW"]), 1),
+                # Loads (with the stations flows of the lower levels) and operating pressures, shared by the components
+                with stats.timer("assembly", level):
+                    loads = sim_ln._scaled_loads_as_dict(net)
+                    p_ops = sim_ln._operating_pressures_as_dict(net)
+                args = (method, net, level)
+                if pool is not None and len(components) > 1:
+                    futures = [
+                        pool.submit(_run_component, *args, tp, loads, p_ops, kwargs, stats.enabled, reduce)
+                        for tp in components
                     ]
+                    solutions = [f.result() for f in futures]
+                else:
+                    solutions = [
+                        _run_component(*args, tp, loads, p_ops, kwargs, stats.enabled, reduce) for tp in components
+                    ]
+
+                for solution in solutions:
+                    stats.merge(solution[4])
+                with stats.timer("results", level):
+                    _write_level_results(
+                        net, [(tp,) + solution[:4] for tp, solution in zip(components, solutions)],
+                        kwargs.get("eos", "constant"),
+                    )
+                    if method != "LINEAR":
+                        for tp, (p_nodes, m_dot_pipes, m_dot_nodes, _, _, _) in zip(components, solutions):
+                            sim_nl.store_solution(net, tp, p_nodes, m_dot_pipes, m_dot_nodes)
+                info = _merge_info([solution[-1] for solution in solutions])
+                if info is not None:
+                    net.solver_info[level] = info
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if stats.enabled:
+        net.stats = stats
+        if callback is not None:
+            callback(stats)
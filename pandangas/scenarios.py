@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Batch simulation of load scenarios on the same network.
+
+    Usage:
+
+    >>> import pandangas as pg
+
+    >>> res = pg.run_scenarios(net, load_matrix, method="LINEAR")
+    >>> res["res_bus"][:, :, 0]  # pressures (in [Pa]) of the buses, one row per scenario
+
+"""
+
+import operator
+import warnings
+
+import numpy as np
+
+import pandangas.topology as top
+import pandangas.simu_linear as sim_ln
+import pandangas.simu_nonlinear as sim_nl
+from pandangas.results import _pipe_density, _v_from_m_dot
+from pandangas.timeseries import METHODS, _LevelStep, _profiles_as_array
+
+COLUMNS = {
+    "res_bus": ["p_Pa", "p_bar"],
+    "res_pipe": ["m_dot_kg/s", "v_m/s", "p_kW", "loading_%"],
+    "res_station": ["m_dot_kg/s", "p_kW", "loading_%"],
+    "res_feeder": ["m_dot_kg/s", "p_kW", "loading_%"],
+}
+
+
+def _solve_nonlinear(step, sinks, kwargs):
+    """
+    Solve all the scenarios of a level as one system of disconnected copies of the level, return (scenarios x
+    elements) nodes pressures, pipes mass flows and nodes mass flows
+    """
+    nbr = len(sinks)
+    tp = step.tp.replicate(nbr)
+    loads = np.ravel(sinks)
+    p_ops = np.tile(step.p_srce, nbr)
+    eps = np.tile(step.tp.roughness, nbr)
+
+    x0 = sim_nl.initial_guess(tp, step.fluid, eps, loads, p_ops)
+    x, step.info = sim_nl.solve_level(tp, step.fluid, eps, loads, p_ops, x0, **kwargs)
+    if not step.info["converged"]:
+        msg = "The solver did not converge on the scenarios of level {} (residual: {:.3g}) !".format(
+            step.level, step.info["residual"]
+        )
+        warnings.warn(msg, RuntimeWarning)
+    p_nodes, m_dot_pipes, m_dot_nodes = sim_nl.unscale(x, tp, step.fluid)
+    return p_nodes.reshape(nbr, -1), m_dot_pipes.reshape(nbr, -1), m_dot_nodes.reshape(nbr, -1)
+
+
+def _power_results(out, found, m_dot, p_lim, lhv):
+    """
+    Fill the (mass flow, power, loading) results of stations or feeders
+    """
+    p_kw = m_dot * lhv
+    out[:, found, 0] = m_dot
+    out[:, found, 1] = p_kw
+    out[:, found, 2] = np.abs(100 * p_kw / p_lim[found])
+
+
+def run_scenarios(net, load_matrix, method="LINEAR", **kwargs):
+    """
+    Run a power flow for many load scenarios on the same network at once
+
+    Each level is set up once and solved from lower to higher pressure for all the scenarios together: LINEAR levels
+    with one factorization and a right-hand side of one column per scenario, NON-LINEAR levels as one system made of
+    one copy of the level per scenario (the residuals of all the scenarios are evaluated in one vectorized call).
+
+    :param net: the given network
+    :param load_matrix: powers of the loads (in [kW], scaled by net.load["scaling"]), as a DataFrame (scenarios x
+    load names, loads without a column keep their p_kW) or an array (scenarios x loads)
+    :param method: "LINEAR" or "NON-LINEAR" (default: "LINEAR")
+    :param kwargs: extra arguments passed to the non-linear solver (solver, tol, max_iter, friction, eos)
+    :return: dict mapping the results tables ("res_bus", "res_pipe", "res_station" and "res_feeder") to 3-D arrays
+    (scenarios x rows of the element table x columns, see COLUMNS), in the order of the element tables, and (NON-LINEAR
+    only) "solver_info" to the convergence information of the solve of each level (a RuntimeWarning is emitted if one
+    did not converge)
+    """
+    try:
+        assert method in METHODS
+    except AssertionError:
+        msg = "The method {} is not supported (choose among {}) !".format(method, METHODS)
+        raise ValueError(msg)
+
+    eos = kwargs.get("eos", "constant") if method != "LINEAR" else "constant"
+    p_kw = _profiles_as_array(net, load_matrix, "p_kW")
+    nbr = p_kw.shape[0]
+    loads = p_kw * net.load["scaling"].values.astype(float) / net.LHV  # kW to kg/s
+
+    out = {
+        "res_bus": np.zeros((nbr, len(net.bus), len(COLUMNS["res_bus"]))),
+        "res_pipe": np.zeros((nbr, len(net.pipe), len(COLUMNS["res_pipe"]))),
+        "res_station": np.zeros((nbr, len(net.station), len(COLUMNS["res_station"]))),
+        "res_feeder": np.zeros((nbr, len(net.feeder), len(COLUMNS["res_feeder"]))),
+    }
+    p_lim_station = net.station["p_lim_kW"].values.astype(float)
+    p_lim_feeder = net.feeder["p_lim_kW"].values.astype(float)
+
+    if method == "NON-LINEAR":
+        out["solver_info"] = {}
+
+    topology = top.create_topology(net)
+    stations = np.zeros((nbr, len(net.station)))
+    for level, _ in sorted(net.LEVELS.items(), key=operator.itemgetter(1)):
+        if level not in topology:
+            continue
+        step = _LevelStep(net, level, topology[level], method)
+        sinks = step.sinks(loads, stations)
+        if method == "LINEAR":
+            x = step.solve(sim_ln._b_from_arrays(step.tp, sinks.T, step.p_srce))
+            p_nodes, m_dot_pipes, m_dot_nodes = [arr.T for arr in sim_ln.split(x, step.tp)]
+        else:
+            p_nodes, m_dot_pipes, m_dot_nodes = _solve_nonlinear(step, sinks, kwargs)
+            out["solver_info"][level] = step.info
+
+        out["res_bus"][:, step.bus_rows, 0] = p_nodes
+        out["res_bus"][:, step.bus_rows, 1] = p_nodes * 1e-5
+
+        rho = _pipe_density(step.tp, p_nodes, step.fluid, eos)
+        v = _v_from_m_dot(step.tp.diameters, m_dot_pipes, step.fluid, rho)
+        out["res_pipe"][:, step.pipe_rows, 0] = m_dot_pipes
+        out["res_pipe"][:, step.pipe_rows, 1] = v
+        out["res_pipe"][:, step.pipe_rows, 2] = m_dot_pipes * net.LHV
+        out["res_pipe"][:, step.pipe_rows, 3] = np.abs(100 * v / net.V_MAX)
+
+        found = step.stat_node >= 0
+        stations[:, found] = -m_dot_nodes[:, step.stat_node[found]]
+        _power_results(out["res_station"], found, stations[:, found], p_lim_station, net.LHV)
+        found = step.feed_node >= 0
+        _power_results(out["res_feeder"], found, m_dot_nodes[:, step.feed_node[found]], p_lim_feeder, net.LHV)
+
+    return out
@@ -2,27 +2,34 @@
 
 """Linear simulation module."""
 
-from math import pi
-import numpy as np
-import networkx as nx
+import inspect
 
-import fluids
-from thermo.chemical import Chemical
+import numpy as np
+import scipy.linalg as la
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
 
 import pandangas.topology as top
-from pandangas.utilities import get_index
+from pandangas.fluid import level_fluid
+from pandangas.profiling import NULL_STATS
+
+SPARSE_THRESHOLD = 500  # system size above which the sparse solver is used
+ILU_DROP_TOL = 1e-6  # drop tolerance of the incomplete LU preconditioner of the iterative solver
+ILU_FILL_FACTOR = 20
+# Keyword of the relative tolerance of scipy.sparse.linalg.gmres ("tol" before scipy 1.12)
+GMRES_RTOL = "rtol" if "rtol" in inspect.signature(spla.gmres).parameters else "tol"
 
 # TODO: MOVE TO SPECIFIC FILE (utilities.py ?) ++++++++++
 def _scaled_loads_as_dict(net):
     """
     Maps sinks (loads and lower pressure stations) name to scaled load
     """
-    loads = {row[1]: round(row[2] * row[4] / net.LHV, 6) for _, row in net.load.iterrows()}  # kW to kg/s
-    stations = {}
-    for _, row in net.res_station.iterrows():
-        idx_stat = get_index(row[0], net.station)
-        stations[net.station.at[idx_stat, "bus_high"]] = round(row[1], 6)
-    loads.update(stations)
+    m_dot = (net.load["p_kW"].values * net.load["scaling"].values / net.LHV).tolist()  # kW to kg/s
+    loads = dict(zip(net.load["bus"].values.tolist(), [round(v, 6) for v in m_dot]))
+    lookup = net.lookup("station")
+    rows = [lookup[name] for name in net.res_station["name"].values]
+    stations = net.station.loc[rows, "bus_high"].values.tolist()
+    loads.update(zip(stations, [round(v, 6) for v in net.res_station["m_dot_kg/s"].values.tolist()]))
     return loads
 
 
@@ -30,17 +37,16 @@ def _operating_pressures_as_dict(net):
     """
     Map sources (feeders and higher pressure stations) name to operating pressure
     """
-    feed = {row[1]: row[3] for _, row in net.feeder.iterrows()}
-    stat = {row[2]: row[4] for _, row in net.station.iterrows()}
-    feed.update(stat)
+    feed = dict(zip(net.feeder["bus"].values.tolist(), net.feeder["p_Pa"].values.tolist()))
+    feed.update(zip(net.station["bus_low"].values.tolist(), net.station["p_Pa"].values.tolist()))
     return feed
 
 
 def create_incidence(graph):
     """
-    Create oriented incidence matrix of the given graph
+    Create oriented (sparse) incidence matrix of the given graph
     """
-    return nx.incidence_matrix(graph, oriented=True).toarray()
+    return top.as_level_topology(graph).incidence
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
@@ -49,16 +55,11 @@ def create_k(graph, fluid):
     """
     Create factor for mass flow in pressure losses equation
     in P_j - P_i + k * m_ij = 0 -> with k = 2⁷*L*mu/(D⁴*pi*rho)
-    """
-    mu = fluid.mu
-    rho = fluid.rho
-
-    L = np.array([d["L_m"] for u, v, d in graph.edges(data=True)])
-    D = np.array([d["D_m"] for u, v, d in graph.edges(data=True)])
 
-    k = 2 ** 7 * L * D * mu / (D ** 4 * pi * rho)
-
-    return k
+    :return: 1-D array of k, one per pipe (sp.diags(k) gives the diagonal matrix)
+    """
+    tp = top.as_level_topology(graph)
+    return tp.laminar_factor * (fluid.mu / fluid.rho)
 
 
 def weird(m):
@@ -76,117 +77,202 @@ def weird(m):
     return np.array(r)
 
 
-def create_a(graph, fluid):
+def _selection(m):
     """
-    Create the A matrix (for solving A.X = B)
+    Sparse equivalent of weird(m): one row per non-zero element of m, selecting it
     """
+    m = np.asarray(m, dtype=bool)
+    cols = np.flatnonzero(m)
+    return sp.csr_matrix((np.ones(len(cols)), (np.arange(len(cols)), cols)), shape=(len(cols), len(m)))
 
-    nbr_pipes = len(graph.edges)
-    nbr_nodes = len(graph.nodes)
-
-    # P_j - P_i + k * m_ij = 0 for (i, j) in pipes ---------------------------------------------------------------------
-    a00 = create_incidence(graph).T
-    a01 = create_k(graph, fluid) * np.eye(nbr_pipes)
-    a02 = np.zeros((nbr_pipes, nbr_nodes))
-
-    a0 = np.concatenate((a00, a01, a02), axis=1)
 
-    # sum(m_ki) - sum(m_ik) - m_i = 0 for i in nodes -------------------------------------------------------------------
-    a10 = np.zeros((nbr_nodes, nbr_nodes))
-    a11 = create_incidence(graph)
-    a12 = -1 * np.eye(nbr_nodes)
-
-    a1 = np.concatenate((a10, a11, a12), axis=1)
-
-    # m_i = 0 for i in nodes (passive) & m_i = -c for i in nodes (sink) ------------------------------------------------
-    idx_nodes_pass = np.array([1 if d["type"] == "NODE" else 0 for n, d in graph.nodes(data=True)])
-    idx_nodes_sink = np.array([1 if d["type"] == "SINK" else 0 for n, d in graph.nodes(data=True)])
-
-    nbr_nodes_pass = sum(idx_nodes_pass)
-    nbr_nodes_sink = sum(idx_nodes_sink)
+def create_a(graph, fluid):
+    """
+    Create the A matrix (for solving A.X = B) as a sparse CSR matrix
+    """
+    tp = top.as_level_topology(graph)
+
+    nbr_pipes = tp.nbr_pipes
+    nbr_nodes = tp.nbr_nodes
+
+    i_mat = tp.incidence
+
+    a = sp.bmat(
+        [
+            # P_j - P_i + k * m_ij = 0 for (i, j) in pipes -------------------------------------------------------------
+            [i_mat.T, sp.diags(create_k(tp, fluid)), sp.csr_matrix((nbr_pipes, nbr_nodes))],
+            # sum(m_ki) - sum(m_ik) - m_i = 0 for i in nodes -----------------------------------------------------------
+            [None, i_mat, -sp.identity(nbr_nodes)],
+            # m_i = 0 for i in nodes (passive) & m_i = -c for i in nodes (sink) ----------------------------------------
+            [None, None, _selection(tp.is_pass)],
+            [None, None, _selection(tp.is_sink)],
+            # P_i = P_nom for i in nodes (source) ----------------------------------------------------------------------
+            [_selection(tp.is_srce), None, None],
+        ],
+        format="csr",
+    )
+    return a
 
-    a20 = np.zeros((nbr_nodes_pass + nbr_nodes_sink, nbr_nodes))
-    a21 = np.zeros((nbr_nodes_pass + nbr_nodes_sink, nbr_pipes))
-    try:
-        a22 = np.concatenate((weird(idx_nodes_pass), weird(idx_nodes_sink)), axis=0)
-    except ValueError as e:
-        a22 = weird(idx_nodes_sink)
 
-    a2 = np.concatenate((a20, a21, a22), axis=1)
+def _sink_loads(tp, loads):
+    """
+    Loads (in [kg/s]) of the sinks of a level in the order of its nodes, from a dict mapping sinks to their load or
+    an array already in this order
+    """
+    if isinstance(loads, dict):
+        return np.array([loads[n] for n, is_sink in zip(tp.nodes, tp.is_sink) if is_sink], dtype=float)
+    return np.asarray(loads, dtype=float)
 
-    # P_i = P_nom for i in nodes (source) ------------------------------------------------------------------------------
-    idx_nodes_srce = np.array([1 if d["type"] == "SRCE" else 0 for n, d in graph.nodes(data=True)])
-    nbr_nodes_srce = sum(idx_nodes_srce)
 
-    a30 = weird(idx_nodes_srce)
-    a31 = np.zeros((nbr_nodes_srce, nbr_pipes))
-    a32 = np.zeros((nbr_nodes_srce, nbr_nodes))
+def _srce_pressures(tp, op_pressures):
+    """
+    Operating pressures (in [Pa]) of the sources of a level in the order of its nodes, from a dict mapping sources to
+    their pressure or an array already in this order
+    """
+    if isinstance(op_pressures, dict):
+        return np.array([op_pressures[n] for n, is_srce in zip(tp.nodes, tp.is_srce) if is_srce], dtype=float)
+    return np.asarray(op_pressures, dtype=float)
 
-    a3 = np.concatenate((a30, a31, a32), axis=1)
 
-    # Complete A -------------------------------------------------------------------------------------------------------
-    a = np.concatenate((a0, a1, a2, a3))
-    return a
+def create_b(graph, scaled_loads, op_pressures):
+    """
+    Create the B matrix (for solving A.X = B), from dicts mapping sinks to their load and sources to their operating
+    pressure (or arrays in the order of the nodes)
+    """
+    tp = top.as_level_topology(graph)
+    return _b_from_arrays(tp, _sink_loads(tp, scaled_loads), _srce_pressures(tp, op_pressures))
 
 
-def create_b(graph, scaled_loads, op_pressures):
+def _b_from_arrays(tp, sinks, p_srce):
     """
-    Create the B matrix (for solving A.X = B)
+    Create the B matrix from the loads of the sinks and the operating pressures of the sources (in the order of the
+    nodes of the level). Given a (sinks x scenarios) array of loads, B has one column per scenario.
     """
-    nbr_pipes = len(graph.edges)
-    nbr_nodes = len(graph.nodes)
+    b21 = np.asarray(sinks, dtype=float)
+    columns = b21.shape[1:]
 
     # P_j - P_i + k * m_ij = 0 -----------------------------------------------------------------------------------------
-    b0 = np.zeros(nbr_pipes)
+    b0 = np.zeros((tp.nbr_pipes,) + columns)
 
     # sum(m_ki) - sum(m_ik) - m_i = 0 for i in nodes -------------------------------------------------------------------
-    b1 = np.zeros(nbr_nodes)
+    b1 = np.zeros((tp.nbr_nodes,) + columns)
 
     # m_i = 0 for i in nodes (passive) & m_i = -c for i in nodes (sink) ------------------------------------------------
-    idx_nodes_pass = np.array([1 if d["type"] == "NODE" else 0 for n, d in graph.nodes(data=True)])
-    idx_nodes_sink = np.array([1 if d["type"] == "SINK" else 0 for n, d in graph.nodes(data=True)])
-
-    nbr_nodes_pass = sum(idx_nodes_pass)
-    nbr_nodes_sink = sum(idx_nodes_sink)
-
-    b20 = np.zeros(nbr_nodes_pass)
-    b21 = np.array([scaled_loads[n] for n, d in graph.nodes(data=True) if d["type"] == "SINK"])
+    b20 = np.zeros((int(tp.is_pass.sum()),) + columns)
 
     # P_i = P_nom for i in nodes (source) ------------------------------------------------------------------------------
-    b3 = np.array([op_pressures[n] for n, d in graph.nodes(data=True) if d["type"] == "SRCE"])
+    b3 = np.asarray(p_srce, dtype=float)
+    b3 = np.broadcast_to(b3.reshape(b3.shape + (1,) * len(columns)), b3.shape + columns)
 
     # Complete B -------------------------------------------------------------------------------------------------------
     b = np.concatenate([b0, b1, b20, b21, b3])
     return b
 
 
-def solve(a, b):
+def solve(a, b, check=False, iterative=False, tol=1e-10):
     """
-    Solve A.X = B using numpy.linalg.solve and check that the solution is correct
-    https://docs.scipy.org/doc/numpy-1.15.0/reference/generated/numpy.linalg.solve.html
+    Solve A.X = B
+
+    Small systems are solved with numpy.linalg.solve, systems larger than SPARSE_THRESHOLD with a sparse direct
+    (scipy.sparse.linalg.spsolve) or, if iterative is True, an ILU-preconditioned iterative (GMRES) solver. The
+    pressure block of A has a zero diagonal: the ILU pivots by rows (threshold 1), with a complete (COLAMD reordered)
+    LU as preconditioner if it still meets a zero pivot.
+
+    :param a: the A matrix (dense array or scipy sparse matrix)
+    :param b: the B vector
+    :param check: if True, check that the solution is correct (default: False)
+    :param iterative: if True, use an iterative solver for large systems (default: False)
+    :param tol: relative tolerance of the iterative solver (default: 1e-10)
+    :return: the solution X
     """
-    x = np.linalg.solve(a, b)
-    assert np.allclose(np.dot(a, x), b)
+    if sp.issparse(a) and a.shape[0] <= SPARSE_THRESHOLD:
+        a = a.toarray()
+
+    if not sp.issparse(a):
+        x = np.linalg.solve(a, b)
+    elif iterative:
+        a = a.tocsc()
+        try:
+            lu = spla.spilu(a, drop_tol=ILU_DROP_TOL, fill_factor=ILU_FILL_FACTOR, diag_pivot_thresh=1.0)
+        except RuntimeError:  # exactly singular incomplete factor
+            lu = spla.splu(a)
+        m = spla.LinearOperator(a.shape, lu.solve)
+        x, info = spla.gmres(a, b, M=m, atol=0.0, **{GMRES_RTOL: tol})
+        if info != 0:
+            msg = "The iterative solver did not converge (info={}) !".format(info)
+            raise ValueError(msg)
+    else:
+        x = spla.spsolve(a.tocsc(), b)
+
+    if check:
+        try:
+            assert np.allclose(a.dot(x), b)
+        except AssertionError:
+            msg = "The solution of the linear system is not correct !"
+            raise ValueError(msg)
     return x
 
 
-def run_one_level(net, level):
+def factorize(a):
+    """
+    Factorize A once and return a function solving A.X = B for any B (LU decomposition, sparse above
+    SPARSE_THRESHOLD)
+
+    :param a: the A matrix (dense array or scipy sparse matrix)
+    :return: a function of B returning X
+    """
+    if sp.issparse(a) and a.shape[0] > SPARSE_THRESHOLD:
+        return spla.splu(a.tocsc()).solve
+    lu = la.lu_factor(a.toarray() if sp.issparse(a) else a)
+    return lambda b: la.lu_solve(lu, b)
+
+
+def split(x, tp):
+    """
+    Split a solution X of a level into nodes pressures, pipes mass flows and nodes mass flows
     """
+    return x[: tp.nbr_nodes], x[tp.nbr_nodes : tp.nbr_nodes + tp.nbr_pipes], x[tp.nbr_nodes + tp.nbr_pipes :]
+
 
+def run_one_level(net, level, topology=None, check=False, iterative=False, tol=1e-10, loads=None, p_ops=None,
+                  stats=NULL_STATS):
     """
-    g = top.graphs_by_level_as_dict(net)[level]
+    Solve the linear pressure drop / mass balance system of one pressure level
+
+    :param net: the given network
+    :param level: the pressure level to solve
+    :param topology: the LevelTopology of the level, built from the network if None (default: None)
+    :param check: if True, check the solution of the linear system (see solve) (default: False)
+    :param iterative: if True, solve large systems with the iterative solver (see solve) (default: False)
+    :param tol: relative tolerance of the iterative solver (default: 1e-10)
+    :param loads: loads of the sinks (in [kg/s]), as a dict or an array in the order of the sinks, from the loads
+    and the results of the stations of the network if None (default: None)
+    :param p_ops: operating pressures of the sources (in [Pa]), as a dict or an array in the order of the sources,
+    from the feeders and the stations of the network if None (default: None)
+    :param stats: profiling.Stats recording the phases times, the factorization count and the A matrix size
+    (default: disabled)
+    :return: nodes pressures, pipes mass flows, nodes mass flows and the fluid
+    """
+    if topology is None:
+        with stats.timer("topology", level):
+            topology = top.create_topology(net)[level]
+    tp = topology
+
+    with stats.timer("fluid", level):
+        gas = level_fluid(net, level)
 
-    gas = Chemical("natural gas", T=net.T_GRND, P=net.LEVELS[level])
-    loads = _scaled_loads_as_dict(net)
-    p_ops = _operating_pressures_as_dict(net)
+    with stats.timer("assembly", level):
+        loads = _scaled_loads_as_dict(net) if loads is None else loads
+        p_ops = _operating_pressures_as_dict(net) if p_ops is None else p_ops
 
-    a = create_a(g, gas)
-    b = create_b(g, loads, p_ops)
+        a = create_a(tp, gas)
+        b = create_b(tp, loads, p_ops)
+    stats.matrix("A", a, level)
 
-    x = solve(a, b)
+    with stats.timer("solve", level):
+        x = solve(a, b, check=check, iterative=iterative, tol=tol)
+    stats.count("factorizations", level)
 
-    p_nodes = x[: len(g.nodes)]
-    m_dot_pipes = x[len(g.nodes) : len(g.nodes) + len(g.edges)]
-    m_dot_nodes = x[len(g.nodes) + len(g.edges) :]
+    p_nodes, m_dot_pipes, m_dot_nodes = split(x, tp)
 
     return p_nodes, m_dot_pipes, m_dot_nodes, gas
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reduced nodal simulation module.
+
+The full formulations (simu_linear, simu_nonlinear) solve for the pressures, the pipes mass flows and the nodes mass
+flows at once, with explicit equations for the known injections (m_i = 0 for passive nodes, m_i = -c for sinks) and
+the known pressures (P_i = P_nom for sources). Here these are substituted out: the unknowns are the pressures of the
+passive nodes and the sinks only, the pipes mass flows are given by the pipe law m(P_i - P_j) and the equations are
+the mass balances of the unknown nodes. The system is about a third of the size of the full one and its Jacobian
+-I.diag(dm/dP).I^T is a symmetric (weighted Laplacian) matrix.
+"""
+
+import warnings
+import numpy as np
+import scipy.sparse as sp
+
+import pandangas.topology as top
+import pandangas.friction as fric
+import pandangas.simu_linear as sim_ln
+import pandangas.simu_nonlinear as sim_nl
+from pandangas.fluid import check_eos, level_fluid
+from pandangas.profiling import NULL_STATS
+from pandangas.simu_linear import solve as solve_linear
+from pandangas.friction import RE_LAMINAR, RE_TURBULENT
+from pandangas.simu_nonlinear import M_DOT_REF
+
+MAX_BISECTIONS = 30  # maximum number of residual evaluations of the line search
+INVERSE_TOL = 1e-13  # relative tolerance of the inversion of the pipe law above the laminar regime
+INVERSE_MAX_ITER = 100
+
+
+def _m_dot_from_dp(dp, l, d, e, fluid, model="colebrook"):
+    """
+    Mass flow along pipes (in [kg/s]) from their pressure drop (in [Pa]), and its derivative with respect to the
+    pressure drop (in [kg/(s.Pa)]): inverse of simu_nonlinear._dp_and_ddp_from_m_dot
+
+    The law is inverted exactly in laminar regime. Above it, f.m² is known from the pressure drop, which makes the
+    Colebrook equation explicit in 1/sqrt(f): this is exact in turbulent regime (Colebrook model), and the initial
+    guess of a safeguarded Newton-Raphson on ln(m) elsewhere (transition regime, other models). The friction factor
+    being above 64/Re, the solution lies between the transition mass flow and the laminar inverse, a bracket kept
+    by bisection. The pressure drop being continuous and increasing in the mass flow (see friction.friction_factor),
+    so is its inverse.
+    """
+    dp = np.asarray(dp, dtype=float)
+    a = np.pi * (d / 2) ** 2
+    m_lam = RE_LAMINAR * a * fluid.mu / d
+    m_turb = RE_TURBULENT * a * fluid.mu / d
+
+    # Laminar (Hagen-Poiseuille): m = dP*D⁴*pi*rho/(2⁷*L*mu)
+    k_lam = 2 ** 7 * l * fluid.mu / (d ** 4 * np.pi * fluid.rho)
+    m_abs = np.abs(dp) / k_lam
+
+    above = m_abs > m_lam
+    if model != "laminar" and np.any(above):
+        lo, hi = m_lam.copy(), m_abs.copy()
+
+        # Colebrook: f.m² = c, 1/sqrt(f) = -2*log10(eD/3.7 + 2.51*A*mu/(D*sqrt(c)))
+        sqrt_c = np.sqrt(2 * fluid.rho * a[above] ** 2 * d[above] * np.abs(dp[above]) / l[above])
+        x = -2 * np.log10(e[above] / d[above] / 3.7 + 2.51 * a[above] * fluid.mu / (d[above] * sqrt_c))
+        m_abs[above] = np.clip(sqrt_c * x, lo[above], hi[above])
+
+        todo = np.flatnonzero(above & ((m_abs < m_turb) | (model != "colebrook")))
+        for _ in range(INVERSE_MAX_ITER):
+            if not len(todo):
+                break
+            m = m_abs[todo]
+            p, dpp = fric.pressure_drop(m, l[todo], d[todo], e[todo], fluid.rho, fluid.mu, model)
+            target = np.abs(dp[todo])
+            lo[todo] = np.where(p < target, m, lo[todo])
+            hi[todo] = np.where(p > target, m, hi[todo])
+            m_new = m * np.exp(-np.log(p / target) * p / (dpp * m))
+            outside = ~((m_new > lo[todo]) & (m_new < hi[todo]))
+            m_new[outside] = np.sqrt(lo[todo] * hi[todo])[outside]
+            m_abs[todo] = m_new
+            todo = todo[np.abs(m_new / m - 1) > INVERSE_TOL]
+
+    m_dot = np.sign(dp) * m_abs
+    _, ddp = fric.pressure_drop(m_dot, l, d, e, fluid.rho, fluid.mu, model)
+    return m_dot, 1 / ddp
+
+
+def _m_dot_from_dp_linear(dp, k):
+    """
+    Mass flow along pipes from their pressure drop with the linear law of simu_linear (P_i - P_j = k * m_ij)
+    """
+    return dp / k, 1 / k
+
+
+class NodalSystem:
+    """
+    Reduced nodal system of a level: unknown pressures of the passive nodes and the sinks, in scaled variables
+    (pressures / fluid.P)
+
+    :param tp: the LevelTopology of the level
+    :param fluid: the fluid of the level
+    :param eps: the roughness of the pipes
+    :param loads: dict mapping sinks to their load (in [kg/s]), or array in the order of the sinks
+    :param p_ops: dict mapping sources to their operating pressure (in [Pa]), or array in the order of the sources
+    :param linear: if True, use the linear pipe law of simu_linear (default: False)
+    :param friction: friction model of the pipes (see friction.friction_factor), unused by the linear law
+    (default: "colebrook")
+    """
+
+    def __init__(self, tp, fluid, eps, loads, p_ops, linear=False, friction="colebrook"):
+        fric._check_model(friction)
+        self.tp = tp
+        self.fluid = fluid
+        self.eps = eps
+        self.friction = friction
+        self.k = sim_ln.create_k(tp, fluid) if linear else None
+
+        self.unknown = ~tp.is_srce
+        self.p_srce = sim_ln._srce_pressures(tp, p_ops)
+        demand = np.zeros(tp.nbr_nodes)
+        demand[tp.is_sink] = sim_ln._sink_loads(tp, loads)
+        self.demand = demand[self.unknown]
+        self.i_unknown = tp.incidence[self.unknown]
+
+        # The unknowns are the deviations from a reference pressure: pressure drops are then computed from small
+        # numbers, without the round-off of the differences of absolute pressures
+        self.p_ref = self.p_srce.max() if len(self.p_srce) else fluid.P
+
+    def scale(self, p_nodes):
+        """
+        Unknowns of the system from the pressures (in [Pa]) of all the nodes of the level
+        """
+        return (p_nodes[self.unknown] - self.p_ref) / self.fluid.P
+
+    def pressures(self, x):
+        """
+        Pressures (in [Pa]) of all the nodes of the level
+        """
+        p_nodes = np.empty(self.tp.nbr_nodes)
+        p_nodes[self.unknown] = x * self.fluid.P
+        p_nodes[self.tp.is_srce] = self.p_srce - self.p_ref
+        return p_nodes + self.p_ref
+
+    def pipe_flows(self, x):
+        """
+        Mass flows of the pipes (in [kg/s]) and their derivatives with respect to the pressure drops
+        """
+        dp = -self.tp.incidence.T.dot(self.pressures(x) - self.p_ref)
+        if self.k is not None:
+            return _m_dot_from_dp_linear(dp, self.k)
+        return _m_dot_from_dp(dp, self.tp.lengths, self.tp.diameters, self.eps, self.fluid, self.friction)
+
+    def residual(self, x):
+        """
+        Mass balances of the unknown nodes (inflows - loads), scaled by M_DOT_REF
+        """
+        m_dot_pipes, _ = self.pipe_flows(x)
+        return (self.i_unknown.dot(m_dot_pipes) - self.demand) / M_DOT_REF
+
+    def jacobian(self, x):
+        """
+        Jacobian of the residual: -I.diag(dm/dP).I^T restricted to the unknown nodes (scaled)
+        """
+        _, dm_dot = self.pipe_flows(x)
+        i_mat = self.i_unknown
+        return -(i_mat.dot(sp.diags(dm_dot * self.fluid.P / M_DOT_REF)).dot(i_mat.T)).tocsr()
+
+    def solution(self, x):
+        """
+        Nodes pressures, pipes mass flows and nodes mass flows of the level
+        """
+        m_dot_pipes, _ = self.pipe_flows(x)
+        return self.pressures(x), m_dot_pipes, self.tp.incidence.dot(m_dot_pipes)
+
+
+def newton(system, x0, tol=1e-9, max_iter=50):
+    """
+    Newton-Raphson solver of a nodal system with an exact line search
+
+    The mass balances are the gradient of a convex function of the pressures (the pipe laws are increasing), so the
+    step along each Newton direction is the one cancelling the derivative of this function (bisection on the
+    projection of the residual on the direction): no backtracking on the residual norm, which stalls at the
+    laminar-turbulent transition.
+
+    :param system: the NodalSystem
+    :param x0: the initial guess
+    :param tol: convergence tolerance on the max norm of the residual or of the (undamped) Newton correction
+    (default: 1e-9)
+    :param max_iter: maximum number of iterations (default: 50)
+    :return: the solution, the number of iterations, a convergence flag, the final residual norm and the numbers of
+    residual evaluations and Jacobian factorizations
+    """
+    x = np.array(x0, dtype=float)
+    r = system.residual(x)
+    counts = {"residuals": 1, "factorizations": 0}
+    nit = 0
+    converged = np.max(np.abs(r), initial=0) <= tol
+    while not converged and nit < max_iter:
+        dx = solve_linear(system.jacobian(x), -r)
+        counts["factorizations"] += 1
+
+        # Derivative of the convex function along the direction: -r.dx < 0 at t = 0
+        slope = -r.dot(dx)
+        t, low, high = 1.0, 0.0, None
+        for _ in range(MAX_BISECTIONS):
+            r_new = system.residual(x + t * dx)
+            counts["residuals"] += 1
+            d = -r_new.dot(dx)
+            if abs(d) <= 0.5 * abs(slope) or (d < 0 and high is None):
+                break
+            low, high = (t, high) if d < 0 else (low, t)
+            t = (low + high) / 2
+        x, r = x + t * dx, r_new
+        nit += 1
+        # A full Newton correction below the tolerance (the residual has a round-off floor), not a damped step
+        converged = np.max(np.abs(r)) <= tol or np.max(np.abs(dx)) <= tol
+    return x, nit, bool(converged), np.max(np.abs(r), initial=0), counts
+
+
+def solve_level(system, x0, tol=1e-9, max_iter=50):
+    """
+    Solve the reduced nodal system of a level from an initial guess with the Newton-Raphson solver
+
+    :param system: the NodalSystem of the level
+    :param x0: the initial guess of the unknowns (see NodalSystem.scale)
+    :param tol: convergence tolerance on the scaled mass balances or pressure corrections (default: 1e-9)
+    :param max_iter: maximum number of Newton-Raphson iterations (default: 50)
+    :return: the solution and a dict of convergence information (as simu_nonlinear.solve_level)
+    """
+    res, nit, converged, residual, counts = newton(system, x0, tol=tol, max_iter=max_iter)
+    return res, dict({"solver": "nodal", "iterations": nit, "converged": converged, "residual": residual}, **counts)
+
+
+def run_one_level(net, level, topology=None, linear=False, tol=1e-9, max_iter=50, init="linear", seed=None,
+                  perturbation=0.0, friction="colebrook", eos="constant", loads=None, p_ops=None, stats=NULL_STATS):
+    """
+    Solve the reduced nodal system of one pressure level (see the module documentation)
+
+    :param net: the given network
+    :param level: the pressure level to solve
+    :param topology: the LevelTopology of the level, built from the network if None (default: None)
+    :param linear: if True, use the linear pipe law of simu_linear instead of Colebrook (default: False)
+    :param tol: convergence tolerance of the Newton-Raphson solver (default: 1e-9)
+    :param max_iter: maximum number of Newton-Raphson iterations (default: 50)
+    :param init: initial guess strategy, "linear", "tree" or "previous" (see simu_nonlinear.initial_guess)
+    (default: "linear")
+    :param seed: seed of the random perturbation of the initial guess (default: None)
+    :param perturbation: standard deviation of the random perturbation of the initial guess (default: 0.0)
+    :param friction: friction model of the pipes, "colebrook", "swamee-jain", "haaland" or "laminar" (see
+    friction.friction_factor) (default: "colebrook")
+    :param eos: equation of state of the fluid, "constant" only: with pressure-dependent densities, the mass balances
+    are no longer the gradient of a convex function, which the line search relies on (default: "constant")
+    :param loads: loads of the sinks (in [kg/s]), as a dict or an array in the order of the sinks, from the loads
+    and the results of the stations of the network if None (default: None)
+    :param p_ops: operating pressures of the sources (in [Pa]), as a dict or an array in the order of the sources,
+    from the feeders and the stations of the network if None (default: None)
+    :param stats: profiling.Stats recording the phases times, the solver counts and the Jacobian size
+    (default: disabled)
+    :return: nodes pressures, pipes mass flows, nodes mass flows and the fluid
+    """
+    check_eos(eos)
+    try:
+        assert eos == "constant"
+    except AssertionError:
+        msg = "The nodal formulation only supports the constant equation of state (use the NON-LINEAR method) !"
+        raise ValueError(msg)
+
+    if topology is None:
+        with stats.timer("topology", level):
+            topology = top.create_topology(net)[level]
+    tp = topology
+
+    with stats.timer("fluid", level):
+        gas = level_fluid(net, level)
+
+    with stats.timer("assembly", level):
+        loads = sim_ln._scaled_loads_as_dict(net) if loads is None else loads
+        p_ops = sim_ln._operating_pressures_as_dict(net) if p_ops is None else p_ops
+        eps = tp.roughness
+        system = NodalSystem(tp, gas, eps, loads, p_ops, linear=linear, friction=friction)
+
+        x0 = sim_nl.initial_guess(
+            tp, gas, eps, loads, p_ops, init=init, previous=net.last_solution, seed=seed, perturbation=perturbation
+        )
+        x0 = system.scale(x0[: tp.nbr_nodes] * gas.P)
+
+    with stats.timer("solve", level):
+        res, info = solve_level(system, x0, tol=tol, max_iter=max_iter)
+    if stats.enabled:
+        stats.count("residuals", level, info["residuals"])
+        stats.count("factorizations", level, info["factorizations"])
+        stats.count("iterations", level, info["iterations"])
+        stats.matrix("jacobian", system.jacobian(res), level)
+    if not info["converged"]:
+        msg = "The Newton-Raphson solver did not converge on level {} (residual: {:.3g}) !".format(
+            level, info["residual"]
+        )
+        warnings.warn(msg, RuntimeWarning)
+    net.solver_info[level] = info
+
+    p_nodes, m_dot_pipes, m_dot_nodes = system.solution(res)
+    sim_nl.store_solution(net, tp, p_nodes, m_dot_pipes, m_dot_nodes)
+
+    return p_nodes, m_dot_pipes, m_dot_nodes, gas
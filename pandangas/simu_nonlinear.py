@@ -2,18 +2,20 @@
 
 """Non-linear simulation module."""
 
-from math import pi
+import warnings
 import numpy as np
-import networkx as nx
+import pandas as pd
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from scipy.sparse import csgraph
 from scipy.optimize import fsolve
 
-import fluids
-import fluids.vectorized as fvec
-from thermo.chemical import Chemical
-
 import pandangas.topology as top
-from pandangas.utilities import get_index
-from pandangas.simu_linear import run_one_level as run_linear
+import pandangas.friction as fric
+from pandangas.fluid import check_eos, fluid_properties, level_fluid
+from pandangas.profiling import NULL_STATS
+import pandangas.simu_linear as sim_ln
+from pandangas.simu_linear import solve as solve_linear
 
 M_DOT_REF = 1e-3
 
@@ -22,12 +24,12 @@ def _scaled_loads_as_dict(net):
     """
     Maps sinks (loads and lower pressure stations) name to scaled load
     """
-    loads = {row[1]: round(row[2] * row[4] / net.LHV, 6) for _, row in net.load.iterrows()}  # kW to kg/s
-    stations = {}
-    for _, row in net.res_station.iterrows():
-        idx_stat = get_index(row[0], net.station)
-        stations[net.station.at[idx_stat, "bus_high"]] = round(row[1], 6)
-    loads.update(stations)
+    m_dot = (net.load["p_kW"].values * net.load["scaling"].values / net.LHV).tolist()  # kW to kg/s
+    loads = dict(zip(net.load["bus"].values.tolist(), [round(v, 6) for v in m_dot]))
+    lookup = net.lookup("station")
+    rows = [lookup[name] for name in net.res_station["name"].values]
+    stations = net.station.loc[rows, "bus_high"].values.tolist()
+    loads.update(zip(stations, [round(v, 6) for v in net.res_station["m_dot_kg/s"].values.tolist()]))
     return loads
 
 
@@ -35,9 +37,8 @@ def _operating_pressures_as_dict(net):
     """
     Map sources (feeders and higher pressure stations) name to operating pressure
     """
-    feed = {row[1]: row[3] for _, row in net.feeder.iterrows()}
-    stat = {row[2]: row[4] for _, row in net.station.iterrows()}
-    feed.update(stat)
+    feed = dict(zip(net.feeder["bus"].values.tolist(), net.feeder["p_Pa"].values.tolist()))
+    feed.update(zip(net.station["bus_low"].values.tolist(), net.station["p_Pa"].values.tolist()))
     return feed
 
 
@@ -45,95 +46,448 @@ def create_incidence(graph):
     """
     Create oriented incidence matrix of the given graph
     """
-    return nx.incidence_matrix(graph, oriented=True).toarray()
+    return top.as_level_topology(graph).incidence.toarray()
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 
-def _dp_from_m_dot_vec(m_dot_ad, l, d, e, fluid):
-    m_dot = m_dot_ad * M_DOT_REF
-    a = np.pi * (d / 2) ** 2
-    v = m_dot / a / fluid.rho
-    re = fvec.core.Reynolds(v, d, fluid.rho, fluid.mu)
-    fd = fvec.friction_factor(re, eD=e / d)
-    k = fvec.K_from_f(fd=fd, L=l, D=d)
-    return fvec.dP_from_K(k, rho=fluid.rho, V=v) / fluid.P
-
+def _dp_from_m_dot_vec(m_dot_ad, l, d, e, fluid, model="colebrook"):
+    dp, _ = fric.pressure_drop(m_dot_ad * M_DOT_REF, l, d, e, fluid.rho, fluid.mu, model)
+    return dp / fluid.P
 
-def _eq_m_dot_sum(m_dot_pipes, m_dot_nodes, i_mat):
-    return np.matmul(i_mat, m_dot_pipes) - m_dot_nodes
 
+def _dp_and_ddp_from_m_dot(m_dot, l, d, e, fluid, model="colebrook"):
+    """
+    Pressure drop along pipes (in [Pa]) and its derivative with respect to the mass flow (in [Pa.s/kg]), see
+    friction.pressure_drop
+    """
+    return fric.pressure_drop(m_dot, l, d, e, fluid.rho, fluid.mu, model)
 
-def _eq_pressure(p_nodes, m_dot_pipes, i_mat, l, d, e, fluid):
-    return np.matmul(p_nodes, i_mat) + _dp_from_m_dot_vec(m_dot_pipes, l, d, e, fluid)
 
+def _selection(mask):
+    """
+    Sparse matrix with one row per True element of mask, selecting it
+    """
+    cols = np.flatnonzero(mask)
+    return sp.csr_matrix((np.ones(len(cols)), (np.arange(len(cols)), cols)), shape=(len(cols), len(mask)))
 
-def _eq_m_dot_node(m_dot_nodes, gr, loads):
-    bus_load = np.array(
-        [
-            m_dot_nodes[i] - loads[node] / M_DOT_REF
-            for i, (node, data) in enumerate(gr.nodes(data=True))
-            if data["type"] == "SINK"
-        ]
-    )
-    bus_node = np.array([m_dot_nodes[i] for i, (node, data) in enumerate(gr.nodes(data=True)) if data["type"] == "NODE"])
-    return np.concatenate((bus_load, bus_node))
 
+class Model:
+    """
+    Residual and analytic sparse Jacobian of the non-linear system of a level, compiled once for the whole solve
+
+    The positions of the sinks, passive nodes and sources, the load and pressure targets (dense vectors) and the
+    constant blocks of the Jacobian are computed at setup: each residual evaluation is then a few sparse
+    matrix-vector products and fancy-index operations written into a preallocated buffer, and each Jacobian only
+    updates the pressure drop derivatives on the diagonal of a prebuilt CSR matrix.
+
+    With a pressure-dependent equation of state, the density (and viscosity) of each pipe is evaluated at its mean
+    pressure at each evaluation (see fluid.fluid_properties), and the Jacobian also updates the derivatives of the
+    pressure drops with respect to the pressures of the ends of the pipes.
+
+    :param tp: the LevelTopology of the level
+    :param roughness: the roughness of the pipes
+    :param fluid: the fluid of the level
+    :param loads: dict mapping sinks to their load (in [kg/s]), or array in the order of the sinks
+    :param p_nom: dict mapping sources to their operating pressure (in [Pa]), or array in the order of the sources
+    :param p_ref: the reference pressure of the scaled pressures (in [Pa])
+    :param friction: friction model of the pipes (see friction.friction_factor) (default: "colebrook")
+    :param eos: equation of state of the fluid, "constant" (properties of the nominal pressure of the level),
+    "ideal" or "table" (see fluid.fluid_properties) (default: "constant")
+    """
 
-def _eq_p_feed(p_nodes, gr, p_nom, p_ref):
-    p_feed = np.array(
-        [
-            p_nodes[i] - p_nom[node] / p_ref
-            for i, (node, data) in enumerate(gr.nodes(data=True))
-            if data["type"] == "SRCE"
-        ]
-    )
-    return p_feed
+    def __init__(self, tp, roughness, fluid, loads, p_nom, p_ref, friction="colebrook", eos="constant"):
+        check_eos(eos)
+        self.tp = tp
+        self.roughness = roughness
+        self.fluid = fluid
+        self.friction = friction
+        self.eos = eos
+        self._p_ref = p_ref
+        n, m = tp.nbr_nodes, tp.nbr_pipes
+        self._p, self._m_pipes, self._m_nodes = slice(0, n), slice(n, n + m), slice(n + m, None)
+
+        sink, pas, srce = np.flatnonzero(tp.is_sink), np.flatnonzero(tp.is_pass), np.flatnonzero(tp.is_srce)
+        self._sink = sink
+        self._pass = pas
+        self._srce = srce
+        self.set_targets(loads, p_nom)
+
+        # Rows of the equations in the residual: mass balances, pressure drops, sinks, passive nodes, sources
+        bounds = np.cumsum([0, n, m, len(sink), len(pas), len(srce)])
+        self._rows = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+        self._out = np.empty(bounds[-1])
+
+        self._i_mat = tp.incidence.tocsr()
+        self._i_mat_t = tp.incidence.T.tocsr()
+        self._last = None  # (variables, dp, ddp, dp/dp_mean) of the last evaluation of the pipe law
+
+        self._jac = sp.bmat(
+            [
+                [None, self._i_mat, -sp.identity(n)],
+                [self._i_mat_t, sp.identity(m), None],
+                [None, None, _selection(tp.is_sink)],
+                [None, None, _selection(tp.is_pass)],
+                [_selection(tp.is_srce), None, None],
+            ],
+            format="csr",
+        )
+        self._jac.sort_indices()
+        coo = self._jac.tocoo()
+        self._jac_diag = np.flatnonzero((coo.row == coo.col) & (coo.row >= n) & (coo.row < n + m))
+
+        # Positions of the pressures of the ends of the pipes in the pressure drop equations (loops excluded)
+        self._ends = np.flatnonzero(tp.from_pos != tp.to_pos)
+        keys = coo.row.astype(np.int64) * coo.shape[1] + coo.col
+        self._jac_from = np.searchsorted(keys, (n + self._ends) * coo.shape[1] + tp.from_pos[self._ends])
+        self._jac_to = np.searchsorted(keys, (n + self._ends) * coo.shape[1] + tp.to_pos[self._ends])
+
+    def set_targets(self, loads, p_nom):
+        """
+        Update the loads of the sinks and the operating pressures of the sources (the rest of the setup is kept)
+
+        :param loads: dict mapping sinks to their load (in [kg/s]), or array in the order of the sinks
+        :param p_nom: dict mapping sources to their operating pressure (in [Pa]), or array in the order of the sources
+        """
+        self._load = sim_ln._sink_loads(self.tp, loads) / M_DOT_REF
+        self._p_nom = sim_ln._srce_pressures(self.tp, p_nom) / self._p_ref
+
+    def _pipe_law(self, x):
+        """
+        Pressure drops, their derivatives with respect to the mass flows and to the mean pressures of the pipes, for
+        the scaled variables x (the last evaluation is reused)
+        """
+        key = x[self._m_pipes] if self.eos == "constant" else x[: self._m_nodes.start]
+        if self._last is None or not np.array_equal(self._last[0], key):
+            tp, m_dot = self.tp, x[self._m_pipes] * M_DOT_REF
+            if self.eos == "constant":
+                dp, ddp = _dp_and_ddp_from_m_dot(
+                    m_dot, tp.lengths, tp.diameters, self.roughness, self.fluid, self.friction
+                )
+                dp_dp = None
+            else:
+                p_nodes = x[self._p] * self._p_ref
+                p_mean = (p_nodes[tp.from_pos] + p_nodes[tp.to_pos]) / 2
+                rho, drho, mu, dmu = fluid_properties(self.fluid, p_mean, self.eos)
+                dp, ddp, dlnf = fric._pressure_drop(
+                    m_dot, tp.lengths, tp.diameters, self.roughness, rho, mu, self.friction
+                )
+                dp_dp = fric.fluid_sensitivity(dp, dlnf, rho, mu, drho, dmu)
+            self._last = (key.copy(), dp, ddp, dp_dp)
+        return self._last[1:]
+
+    def residual(self, x):
+        """
+        Residual of the system at x, written into the preallocated buffer (returned, overwritten by the next call)
+        """
+        p_nodes, m_dot_pipes, m_dot_nodes = x[self._p], x[self._m_pipes], x[self._m_nodes]
+        out, rows = self._out, self._rows
+        dp, _, _ = self._pipe_law(x)
+
+        np.subtract(self._i_mat.dot(m_dot_pipes), m_dot_nodes, out=out[rows[0]])
+        np.divide(dp, self.fluid.P, out=out[rows[1]])
+        out[rows[1]] += self._i_mat_t.dot(p_nodes)
+        np.subtract(m_dot_nodes[self._sink], self._load, out=out[rows[2]])
+        out[rows[3]] = m_dot_nodes[self._pass]
+        np.subtract(p_nodes[self._srce], self._p_nom, out=out[rows[4]])
+        return out
+
+    def jacobian(self, x):
+        """
+        Analytic sparse (CSR) Jacobian of the system at x
+        """
+        _, ddp, dp_dp = self._pipe_law(x)
+        jac = self._jac.copy()
+        jac.data[self._jac_diag] = ddp * M_DOT_REF / self.fluid.P
+        if dp_dp is not None:
+            half = dp_dp[self._ends] * self._p_ref / (2 * self.fluid.P)
+            jac.data[self._jac_from] += half
+            jac.data[self._jac_to] += half
+        return jac
 
 
 def _eq_model(x, *args):
-    mat, gr, lengths, diameters, roughness, fluid, loads, p_nom, p_ref = args
-    p_nodes = x[: len(gr.nodes)]
-    m_dot_pipes = x[len(gr.nodes) : len(gr.nodes) + len(gr.edges)]
-    m_dot_nodes = x[len(gr.nodes) + len(gr.edges) :]
-
-    return np.concatenate(
-        (
-            _eq_m_dot_sum(m_dot_pipes, m_dot_nodes, mat),
-            _eq_pressure(p_nodes, m_dot_pipes, mat, lengths, diameters, roughness, fluid),
-            _eq_m_dot_node(m_dot_nodes, gr, loads),
-            _eq_p_feed(p_nodes, gr, p_nom, p_ref),
-        )
-    )
+    """
+    Residual of the non-linear system (compiles a Model at each call, see Model to evaluate it repeatedly)
+    """
+    return Model(*args).residual(x).copy()
 
 
-def run_one_level(net, level):
+def _jac_model(x, *args):
+    """
+    Analytic sparse Jacobian of _eq_model
     """
+    return Model(*args).jacobian(x)
+
 
+def newton(fun, jac, x0, args=(), tol=1e-9, max_iter=50):
     """
-    g = top.graphs_by_level_as_dict(net)[level]
+    Damped Newton-Raphson solver with backtracking line search
+
+    :param fun: the residual function fun(x, *args)
+    :param jac: the (sparse) Jacobian function jac(x, *args)
+    :param x0: the initial guess
+    :param args: extra arguments passed to fun and jac
+    :param tol: convergence tolerance on the max norm of the residual (default: 1e-9)
+    :param max_iter: maximum number of iterations (default: 50)
+    :return: the solution, the number of iterations, a convergence flag and the final residual norm
+    """
+    x = np.array(x0, dtype=float)
+    r = fun(x, *args)
+    norm = np.linalg.norm(r)
+    nit = 0
+    while np.max(np.abs(r)) > tol and nit < max_iter:
+        dx = solve_linear(jac(x, *args), -r)
+        t = 1.0
+        while True:
+            x_new = x + t * dx
+            r_new = fun(x_new, *args)
+            norm_new = np.linalg.norm(r_new)
+            if norm_new <= (1 - 1e-4 * t) * norm or t < 1e-4:
+                break
+            t /= 2
+        x, r, norm = x_new, r_new, norm_new
+        nit += 1
+    return x, nit, bool(np.max(np.abs(r)) <= tol), np.max(np.abs(r))
+
+
+def solve_level(tp, fluid, eps, loads, p_ops, x0, solver="newton", tol=1e-9, max_iter=50, friction="colebrook",
+                eos="constant"):
+    """
+    Solve the non-linear system of a level from an initial guess
+
+    :param tp: the LevelTopology of the level
+    :param fluid: the fluid of the level
+    :param eps: the roughness of the pipes
+    :param loads: dict mapping sinks to their load (in [kg/s]), or array in the order of the sinks
+    :param p_ops: dict mapping sources to their operating pressure (in [Pa]), or array in the order of the sources
+    :param x0: the initial guess, in scaled variables (pressures / fluid.P, mass flows / M_DOT_REF)
+    :param solver: "newton" or "fsolve" (default: "newton")
+    :param tol: convergence tolerance of the Newton-Raphson solver (default: 1e-9)
+    :param max_iter: maximum number of Newton-Raphson iterations (default: 50)
+    :param friction: friction model of the pipes (see friction.friction_factor) (default: "colebrook")
+    :param eos: equation of state of the fluid, "constant", "ideal" or "table" (see Model) (default: "constant")
+    :return: the solution in scaled variables and a dict of convergence information (solver, iterations, converged,
+    residual and the numbers of residual evaluations and Jacobian factorizations)
+    """
+    model = Model(tp, eps, fluid, loads, p_ops, fluid.P, friction, eos)
+    return solve_model(model, x0, solver, tol, max_iter)
+
+
+def solve_model(model, x0, solver="newton", tol=1e-9, max_iter=50):
+    """
+    Solve the non-linear system of a compiled Model from an initial guess (see solve_level)
+
+    :param model: the Model of the level
+    :param x0: the initial guess, in scaled variables
+    :param solver: "newton" or "fsolve" (default: "newton")
+    :param tol: convergence tolerance of the Newton-Raphson solver (default: 1e-9)
+    :param max_iter: maximum number of Newton-Raphson iterations (default: 50)
+    :return: the solution in scaled variables and a dict of convergence information
+    """
+    if solver == "newton":
+        counts = {"residuals": 0, "factorizations": 0}
 
-    gas = Chemical("natural gas", T=net.T_GRND, P=net.LEVELS[level])
-    loads = _scaled_loads_as_dict(net)
-    p_ops = _operating_pressures_as_dict(net)
+        def fun(x):
+            counts["residuals"] += 1
+            return model.residual(x)
 
-    p_nodes_i, m_dot_pipes_i, m_dot_nodes_i, gas = run_linear(net, level)
-    x0 = np.concatenate((p_nodes_i, m_dot_pipes_i, m_dot_nodes_i))
-    x0 = np.clip(x0, a_min=1e-1, a_max=None)
-    x0 *= np.random.normal(loc=1, scale=0.1, size=len(x0))
+        def jac(x):
+            counts["factorizations"] += 1
+            return model.jacobian(x)
 
-    i_mat = create_incidence(g)
+        res, nit, converged, residual = newton(fun, jac, x0, tol=tol, max_iter=max_iter)
+    else:
+        # MINPACK keeps the returned residuals: they must not share the buffer of the model
+        res, info, ier, _ = fsolve(lambda x: model.residual(x).copy(), x0, full_output=True)
+        nit, converged, residual = info["nfev"], ier == 1, np.max(np.abs(info["fvec"]))
+        counts = {"residuals": info["nfev"], "factorizations": info.get("njev", 0)}
+    return res, dict({"solver": solver, "iterations": nit, "converged": converged, "residual": residual}, **counts)
 
-    leng = np.array([data["L_m"] for _, _, data in g.edges(data=True)])
-    diam = np.array([data["D_m"] for _, _, data in g.edges(data=True)])
 
-    materials = np.array([data["mat"] for _, _, data in g.edges(data=True)])
-    eps = np.array([fluids.material_roughness(m) for m in materials])
+def scale(p_nodes, m_dot_pipes, m_dot_nodes, fluid):
+    """
+    Convert a solution of a level into the scaled variables of the non-linear system
+    """
+    return np.concatenate((p_nodes / fluid.P, m_dot_pipes / M_DOT_REF, m_dot_nodes / M_DOT_REF))
+
+
+def unscale(res, tp, fluid):
+    """
+    Convert a solution of the non-linear system into nodes pressures, pipes mass flows and nodes mass flows
+    """
+    p_nodes = res[: tp.nbr_nodes] * fluid.P
+    m_dot_pipes = res[tp.nbr_nodes : tp.nbr_nodes + tp.nbr_pipes] * M_DOT_REF
+    m_dot_nodes = res[tp.nbr_nodes + tp.nbr_pipes :] * M_DOT_REF
+    return p_nodes, m_dot_pipes, m_dot_nodes
 
-    res = fsolve(_eq_model, x0, args=(i_mat, g, leng, diam, eps, gas, loads, p_ops, gas.P))
 
-    p_nodes = res[: len(g.nodes)] * gas.P
-    m_dot_pipes = res[len(g.nodes) : len(g.nodes) + len(g.edges)] * M_DOT_REF
-    m_dot_nodes = res[len(g.nodes) + len(g.edges) :] * M_DOT_REF
+def _linear_guess(tp, fluid, loads, p_ops):
+    """
+    Initial guess from the linear (laminar) model of the level
+    """
+    x = sim_ln.solve(sim_ln.create_a(tp, fluid), sim_ln.create_b(tp, loads, p_ops))
+    return scale(*sim_ln.split(x, tp), fluid)
+
+
+def _tree_guess(tp, fluid, eps, loads, p_ops):
+    """
+    Initial guess from a spanning forest rooted at the sources: each tree pipe carries the demand of the subtree
+    below it (exact on radial parts), chords carry no flow, and pressures follow the pressure drops down the tree
+    """
+    n = tp.nbr_nodes
+    srce = np.flatnonzero(tp.is_srce)
+
+    # Undirected adjacency of the level plus a virtual root (n) linked to every source
+    rows = np.concatenate((tp.from_pos, srce))
+    cols = np.concatenate((tp.to_pos, np.full(len(srce), n)))
+    adj = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n + 1, n + 1))
+    order, pred = csgraph.breadth_first_order(adj, n, directed=False, return_predecessors=True)
+    child = order[1:]
+    parent = pred[child]
+    child, parent = child[parent != n], parent[parent != n]
+
+    # Pipe linking each child to its parent, and its orientation (+1 if it points towards the child)
+    key_pipes = np.minimum(tp.from_pos, tp.to_pos) * (n + 1) + np.maximum(tp.from_pos, tp.to_pos)
+    pipe_of = pd.Series(np.arange(tp.nbr_pipes), index=key_pipes)
+    pipe_of = pipe_of[~pipe_of.index.duplicated()]
+    pipe = pipe_of.reindex(np.minimum(child, parent) * (n + 1) + np.maximum(child, parent)).values.astype(int)
+    sign = np.where(tp.to_pos[pipe] == child, 1.0, -1.0)
+
+    # Flows: (I - C).s = d with s the demand of the subtrees and C[parent, child] = 1
+    demand = np.zeros(n)
+    demand[tp.is_sink] = sim_ln._sink_loads(tp, loads)
+    c = sp.csr_matrix((np.ones(len(child)), (parent, child)), shape=(n, n))
+    sub = spla.spsolve((sp.identity(n) - c).tocsc(), demand)
+
+    m_dot_pipes = np.zeros(tp.nbr_pipes)
+    m_dot_pipes[pipe] = sign * sub[child]
+    m_dot_nodes = tp.incidence.dot(m_dot_pipes)
+
+    # Pressures: (I - P).p = delta with P[child, parent] = 1, sources at their operating pressure
+    dp, _ = _dp_and_ddp_from_m_dot(m_dot_pipes, tp.lengths, tp.diameters, eps, fluid)
+    delta = np.full(n, float(fluid.P))
+    delta[srce] = sim_ln._srce_pressures(tp, p_ops)
+    delta[child] = -sign * dp[pipe]
+    p = sp.csr_matrix((np.ones(len(child)), (child, parent)), shape=(n, n))
+    p_nodes = spla.spsolve((sp.identity(n) - p).tocsc(), delta)
+
+    return scale(p_nodes, m_dot_pipes, m_dot_nodes, fluid)
+
+
+def _previous_guess(tp, fluid, previous):
+    """
+    Initial guess from a previous solution (see store_solution), NaN where the previous solution has no value
+    """
+    p_nodes = pd.Series(previous.get("p_Pa", {}), dtype=float).reindex(tp.nodes).values
+    m_dot_pipes = pd.Series(previous.get("m_dot_pipe", {}), dtype=float).reindex(tp.pipes).values
+    m_dot_nodes = pd.Series(previous.get("m_dot_node", {}), dtype=float).reindex(tp.nodes).values
+    return scale(p_nodes, m_dot_pipes, m_dot_nodes, fluid)
+
+
+def initial_guess(tp, fluid, eps, loads, p_ops, init="linear", previous=None, seed=None, perturbation=0.0):
+    """
+    Deterministic initial guess of the non-linear system of a level, in scaled variables
+
+    :param tp: the LevelTopology of the level
+    :param fluid: the fluid of the level
+    :param eps: the roughness of the pipes
+    :param loads: dict mapping sinks to their load (in [kg/s]), or array in the order of the sinks
+    :param p_ops: dict mapping sources to their operating pressure (in [Pa]), or array in the order of the sources
+    :param init: "linear" (linear model), "tree" (flow allocation on a spanning forest) or "previous" (previous
+    solution, completed with the linear model where missing) (default: "linear")
+    :param previous: the previous solution, for init="previous" (see store_solution) (default: None)
+    :param seed: seed of the random perturbation (default: None)
+    :param perturbation: standard deviation of a multiplicative random perturbation (default: 0.0, no perturbation)
+    :return: the initial guess
+    """
+    if init == "tree":
+        x = _tree_guess(tp, fluid, eps, loads, p_ops)
+    elif init == "previous" and previous:
+        x = _previous_guess(tp, fluid, previous)
+        missing = np.isnan(x)
+        if missing.any():
+            x[missing] = _linear_guess(tp, fluid, loads, p_ops)[missing]
+    else:
+        x = _linear_guess(tp, fluid, loads, p_ops)
+
+    if perturbation:
+        x = x * np.random.RandomState(seed).normal(loc=1, scale=perturbation, size=len(x))
+    return x
+
+
+def store_solution(net, tp, p_nodes, m_dot_pipes, m_dot_nodes):
+    """
+    Store the solution of a level on the network (net.last_solution), by bus and pipe name, for later warm starts
+    """
+    sol = net.last_solution
+    sol.setdefault("p_Pa", {}).update(zip(tp.nodes, p_nodes))
+    sol.setdefault("m_dot_pipe", {}).update(zip(tp.pipes, m_dot_pipes))
+    sol.setdefault("m_dot_node", {}).update(zip(tp.nodes, m_dot_nodes))
+
+
+def run_one_level(net, level, topology=None, solver="newton", tol=1e-9, max_iter=50, init="linear", seed=None,
+                  perturbation=0.0, friction="colebrook", eos="constant", loads=None, p_ops=None, stats=NULL_STATS):
+    """
+    Solve the non-linear pressure drop / mass balance system of one pressure level
+
+    :param net: the given network
+    :param level: the pressure level to solve
+    :param topology: the LevelTopology of the level, built from the network if None (default: None)
+    :param solver: "newton" (analytic sparse Jacobian) or "fsolve" (MINPACK, finite differences) (default: "newton")
+    :param tol: convergence tolerance of the Newton-Raphson solver (default: 1e-9)
+    :param max_iter: maximum number of Newton-Raphson iterations (default: 50)
+    :param init: initial guess strategy, "linear", "tree" or "previous" (see initial_guess) (default: "linear")
+    :param seed: seed of the random perturbation of the initial guess (default: None)
+    :param perturbation: standard deviation of the random perturbation of the initial guess (default: 0.0)
+    :param friction: friction model of the pipes, "colebrook", "swamee-jain", "haaland" or "laminar" (see
+    friction.friction_factor) (default: "colebrook")
+    :param eos: equation of state of the fluid: "constant" (properties at the nominal pressure of the level), "ideal"
+    (density of each pipe proportional to its mean pressure) or "table" (density and viscosity of each pipe
+    interpolated at its mean pressure in a table precomputed with thermo), see fluid.fluid_properties
+    (default: "constant")
+    :param loads: loads of the sinks (in [kg/s]), as a dict or an array in the order of the sinks, from the loads
+    and the results of the stations of the network if None (default: None)
+    :param p_ops: operating pressures of the sources (in [Pa]), as a dict or an array in the order of the sources,
+    from the feeders and the stations of the network if None (default: None)
+    :param stats: profiling.Stats recording the phases times, the solver counts and the Jacobian size
+    (default: disabled)
+    :return: nodes pressures, pipes mass flows, nodes mass flows and the fluid
+    """
+    if topology is None:
+        with stats.timer("topology", level):
+            topology = top.create_topology(net)[level]
+    tp = topology
+
+    with stats.timer("fluid", level):
+        gas = level_fluid(net, level)
+
+    with stats.timer("assembly", level):
+        loads = _scaled_loads_as_dict(net) if loads is None else loads
+        p_ops = _operating_pressures_as_dict(net) if p_ops is None else p_ops
+        eps = tp.roughness
+
+        x0 = initial_guess(
+            tp, gas, eps, loads, p_ops, init=init, previous=net.last_solution, seed=seed, perturbation=perturbation
+        )
+
+    with stats.timer("solve", level):
+        res, info = solve_level(
+            tp, gas, eps, loads, p_ops, x0, solver=solver, tol=tol, max_iter=max_iter, friction=friction, eos=eos
+        )
+    if stats.enabled:
+        stats.count("residuals", level, info["residuals"])
+        stats.count("factorizations", level, info["factorizations"])
+        stats.count("iterations", level, info["iterations"])
+        stats.matrix("jacobian", Model(tp, eps, gas, loads, p_ops, gas.P, friction, eos).jacobian(res), level)
+    if solver == "newton" and not info["converged"]:
+        msg = "The Newton-Raphson solver did not converge on level {} (residual: {:.3g}) !".format(
+            level, info["residual"]
+        )
+        warnings.warn(msg, RuntimeWarning)
+    net.solver_info[level] = info
+
+    p_nodes, m_dot_pipes, m_dot_nodes = unscale(res, tp, gas)
+    store_solution(net, tp, p_nodes, m_dot_pipes, m_dot_nodes)
 
     return p_nodes, m_dot_pipes, m_dot_nodes, gas
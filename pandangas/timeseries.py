@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    Quasi-static time-series simulation.
+
+    Usage:
+
+    >>> import pandangas as pg
+
+    >>> out = pg.run_timeseries(net, profiles, method="LINEAR")
+
+"""
+
+import os
+import operator
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import pandangas.topology as top
+import pandangas.simu_linear as sim_ln
+import pandangas.simu_nonlinear as sim_nl
+from pandangas.fluid import level_fluid
+
+METHODS = ["LINEAR", "NON-LINEAR"]
+
+
+def _profiles_as_array(net, profiles, col="scaling"):
+    """
+    Return the load profiles of a column of net.load (scaling factors by default) as a (steps x loads) array in the
+    order of net.load
+
+    Profiles given as a DataFrame map load names (columns) to values; loads without a profile keep their value in
+    net.load. Profiles given as an array must have one column per load.
+    """
+    if not isinstance(profiles, pd.DataFrame):
+        profiles = np.asarray(profiles, dtype=float)
+        if profiles.ndim != 2 or profiles.shape[1] != len(net.load):
+            msg = "The profiles must have one column per load ({}) !".format(len(net.load))
+            raise ValueError(msg)
+        return profiles
+
+    loads = net.lookup("load")
+    missing = [name for name in profiles.columns if name not in loads]
+    if missing:
+        msg = "The loads {} do not exist !".format(missing)
+        raise ValueError(msg)
+
+    values = np.tile(net.load[col].values.astype(float), (len(profiles), 1))
+    rows = net.load.index.get_indexer([loads[name] for name in profiles.columns])
+    values[:, rows] = profiles.values
+    return values
+
+
+def _allocate(shape, output, name, dtype=float):
+    """
+    Preallocate a results array, in memory or as a .npy file memory-mapped in the output directory
+    """
+    if output is None:
+        return np.zeros(shape, dtype=dtype)
+    return np.lib.format.open_memmap(os.path.join(output, name + ".npy"), mode="w+", dtype=dtype, shape=shape)
+
+
+class _LevelStep:
+    """
+    Per level data reused at each step: positions of loads and stations in the level equations, fluid and factorized
+    matrix (LINEAR) or compiled Model and warm-start (NON-LINEAR) solver state
+    """
+
+    def __init__(self, net, level, tp, method, init="linear", friction="colebrook", eos="constant"):
+        self.level = level
+        self.tp = tp
+        self.fluid = level_fluid(net, level)
+        self.method = method
+
+        self.bus_rows = net.bus.index.get_indexer(tp.node_index)
+        self.pipe_rows = net.pipe.index.get_indexer(tp.pipe_index)
+
+        self.load_sink = tp.positions(net.load["bus"], tp.is_sink)
+        self.stat_sink = tp.positions(net.station["bus_high"], tp.is_sink)
+        self.stat_node = tp.positions(net.station["bus_low"])
+        self.feed_node = tp.positions(net.feeder["bus"])
+
+        p_ops = sim_ln._operating_pressures_as_dict(net)
+        self.p_srce = np.array([p_ops[n] for n, is_srce in zip(tp.nodes, tp.is_srce) if is_srce])
+
+        if method == "LINEAR":
+            self.solve = sim_ln.factorize(sim_ln.create_a(tp, self.fluid))
+        else:
+            sinks = np.zeros(int(tp.is_sink.sum()))
+            self.model = sim_nl.Model(tp, tp.roughness, self.fluid, sinks, self.p_srce, self.fluid.P, friction, eos)
+            self.init = {"init": init, "previous": net.last_solution}
+            self.x = None
+
+    def sinks(self, loads, stations):
+        """
+        Build the vector of the sinks loads (in [kg/s]) from the loads and the stations flows of lower levels (or,
+        given (scenarios x loads) and (scenarios x stations) arrays, one row of sinks loads per scenario)
+        """
+        sinks = np.zeros(loads.shape[:-1] + (int(self.tp.is_sink.sum()),))
+        found = self.load_sink >= 0
+        np.add.at(sinks, (Ellipsis, self.load_sink[found]), loads[..., found])
+        found = self.stat_sink >= 0
+        np.add.at(sinks, (Ellipsis, self.stat_sink[found]), stations[..., found])
+        return sinks
+
+    def run(self, sinks, **kwargs):
+        """
+        Solve the level for the given sinks loads, return nodes pressures, pipes and nodes mass flows
+        """
+        if self.method == "LINEAR":
+            return sim_ln.split(self.solve(sim_ln._b_from_arrays(self.tp, sinks, self.p_srce)), self.tp)
+
+        self.model.set_targets(sinks, self.p_srce)
+        if self.x is None:
+            x = sim_nl.initial_guess(self.tp, self.fluid, self.tp.roughness, sinks, self.p_srce, **self.init)
+        else:
+            x = self.x
+        self.x, self.info = sim_nl.solve_model(self.model, x, **kwargs)
+        return sim_nl.unscale(self.x, self.tp, self.fluid)
+
+
+def run_timeseries(net, profiles, method="LINEAR", output=None, init="linear", friction="colebrook", eos="constant",
+                   **kwargs):
+    """
+    Run a quasi-static time-series simulation over load scaling profiles
+
+    The topology, the fluid properties and (LINEAR) the factorization of each level are set up once; each step only
+    updates the loads and solves the levels from lower to higher pressure, passing the stations flows in memory.
+    NON-LINEAR levels are compiled once (see simu_nonlinear.Model) and each step is warm-started from the solution of
+    the previous one.
+
+    :param net: the given network
+    :param profiles: load scaling factors, as a DataFrame (steps x load names) or an array (steps x loads)
+    :param method: "LINEAR" or "NON-LINEAR" (default: "LINEAR")
+    :param output: if given, a directory where the results are streamed as memory-mapped .npy files (default: None)
+    :param init: initial guess strategy of the first NON-LINEAR step (see simu_nonlinear.initial_guess)
+    (default: "linear")
+    :param friction: friction model of the pipes (NON-LINEAR, see friction.friction_factor) (default: "colebrook")
+    :param eos: equation of state of the fluid (NON-LINEAR, see fluid.fluid_properties) (default: "constant")
+    :param kwargs: extra arguments passed to the non-linear solver (solver, tol, max_iter)
+    :return: dict of (steps x elements) arrays: "p_Pa" (net.bus order), "m_dot_pipe" (net.pipe order),
+    "m_dot_station" (net.station order), "m_dot_feeder" (net.feeder order) and, NON-LINEAR only, "iterations",
+    "converged" and "residual" (one column per pressure level, from lower to higher; a RuntimeWarning is emitted for
+    each step of a level that did not converge)
+    """
+    try:
+        assert method in METHODS
+    except AssertionError:
+        msg = "The method {} is not supported (choose among {}) !".format(method, METHODS)
+        raise ValueError(msg)
+
+    scaling = _profiles_as_array(net, profiles)
+    nbr_steps = scaling.shape[0]
+    base = net.load["p_kW"].values.astype(float) / net.LHV  # kW to kg/s
+
+    if output is not None and not os.path.isdir(output):
+        os.makedirs(output)
+
+    out = {
+        "p_Pa": _allocate((nbr_steps, len(net.bus)), output, "p_Pa"),
+        "m_dot_pipe": _allocate((nbr_steps, len(net.pipe)), output, "m_dot_pipe"),
+        "m_dot_station": _allocate((nbr_steps, len(net.station)), output, "m_dot_station"),
+        "m_dot_feeder": _allocate((nbr_steps, len(net.feeder)), output, "m_dot_feeder"),
+    }
+
+    topology = top.create_topology(net)
+    sorted_levels = [level for level, _ in sorted(net.LEVELS.items(), key=operator.itemgetter(1)) if level in topology]
+    steps = [_LevelStep(net, level, topology[level], method, init, friction, eos) for level in sorted_levels]
+
+    if method == "NON-LINEAR":
+        out["iterations"] = _allocate((nbr_steps, len(steps)), output, "iterations")
+        out["converged"] = _allocate((nbr_steps, len(steps)), output, "converged", dtype=bool)
+        out["residual"] = _allocate((nbr_steps, len(steps)), output, "residual")
+
+    for t in range(nbr_steps):
+        loads = base * scaling[t]
+        stations = np.zeros(len(net.station))
+        for i, step in enumerate(steps):
+            p_nodes, m_dot_pipes, m_dot_nodes = step.run(step.sinks(loads, stations), **kwargs)
+
+            out["p_Pa"][t, step.bus_rows] = p_nodes
+            out["m_dot_pipe"][t, step.pipe_rows] = m_dot_pipes
+
+            found = step.stat_node >= 0
+            stations[found] = -m_dot_nodes[step.stat_node[found]]
+            out["m_dot_station"][t, found] = stations[found]
+            found = step.feed_node >= 0
+            out["m_dot_feeder"][t, found] = m_dot_nodes[step.feed_node[found]]
+            if method == "NON-LINEAR":
+                out["iterations"][t, i] = step.info["iterations"]
+                out["converged"][t, i] = step.info["converged"]
+                out["residual"][t, i] = step.info["residual"]
+                if not step.info["converged"]:
+                    msg = "The solver did not converge on level {} at step {} (residual: {:.3g}) !".format(
+                        step.level, t, step.info["residual"]
+                    )
+                    warnings.warn(msg, RuntimeWarning)
+
+    if output is not None:
+        for arr in out.values():
+            arr.flush()
+    return out
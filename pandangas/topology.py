@@ -1,9 +1,17 @@
+import operator
+
+import numpy as np
+import pandas as pd
 import networkx as nx
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+from pandangas.arrays import BUS_TYPES, NODE, SINK, SRCE, codes, compile_network, material_roughness
 
 
 def create_nxgraph(net, only_in_service=True):
     """
-    Convert a given network into a NetworkX MultiGraph
+    Convert a given network into a NetworkX MultiGraph (export for analysis, the solvers use LevelTopology)
 
     :param net: the given network
     :param only_in_service: if True, convert only the pipes that are in service (default: True)
@@ -12,18 +20,32 @@ def create_nxgraph(net, only_in_service=True):
 
     g = nx.OrderedDiGraph()
 
-    for idx, row in net.bus.iterrows():
-        g.add_node(row[0], index=idx, level=row[1], zone=row[2], type=row[3])
+    bus = net.bus
+    g.add_nodes_from(
+        (name, {"index": idx, "level": level, "zone": zone, "type": t})
+        for name, idx, level, zone, t in zip(bus["name"], bus.index, bus["level"], bus["zone"], bus["type"])
+    )
 
     pipes = net.pipe
     if only_in_service:
         pipes = pipes.loc[pipes["in_service"] != False]
 
-    for idx, row in pipes.iterrows():
-        g.add_edge(row[1], row[2], name=row[0], index=idx, L_m=row[3], D_m=row[4], mat=row[5], type="PIPE")
+    g.add_edges_from(
+        (u, v, {"name": name, "index": idx, "L_m": l, "D_m": d, "mat": mat, "type": "PIPE"})
+        for name, idx, u, v, l, d, mat in zip(
+            pipes["name"], pipes.index, pipes["from_bus"], pipes["to_bus"], pipes["length_m"], pipes["diameter_m"],
+            pipes["material"],
+        )
+    )
 
-    for idx, row in net.station.iterrows():
-        g.add_edge(row[1], row[2], name=row[0], index=idx, p_lim_kw=row[3], p_bar=row[4], type="STATION")
+    station = net.station
+    g.add_edges_from(
+        (u, v, {"name": name, "index": idx, "p_lim_kw": p_lim, "p_bar": p, "type": "STATION"})
+        for name, idx, u, v, p_lim, p in zip(
+            station["name"], station.index, station["bus_high"], station["bus_low"], station["p_lim_kW"],
+            station["p_Pa"],
+        )
+    )
 
     return g
 
@@ -36,3 +58,267 @@ def graphs_by_level_as_dict(net):
         nodes = [n for n, data in g.nodes(data=True) if data["level"] == l]
         g_dict[l] = g.subgraph(nodes)
     return g_dict
+
+
+class LevelTopology:
+    """
+    Topology and pipe parameters of one pressure level, shared by the solvers
+
+    :param graph: the (sub)graph of the pressure level (see LevelTopology.from_arrays to build it from the array model
+    of a network)
+    """
+
+    def __init__(self, graph):
+        nodes = list(graph.nodes(data=True))
+        position = {n: i for i, (n, _) in enumerate(nodes)}
+        edges = list(graph.edges(data=True))
+        self._set(
+            nodes=[n for n, _ in nodes],
+            node_index=[d["index"] for _, d in nodes],
+            types=codes([d["type"] for _, d in nodes], BUS_TYPES),
+            zones=[d.get("zone") for _, d in nodes],
+            levels=[d.get("level") for _, d in nodes],
+            pipes=[d["name"] for _, _, d in edges],
+            pipe_index=[d["index"] for _, _, d in edges],
+            from_pos=[position[u] for u, _, _ in edges],
+            to_pos=[position[v] for _, v, _ in edges],
+            lengths=[d["L_m"] for _, _, d in edges],
+            diameters=[d["D_m"] for _, _, d in edges],
+            materials=[d["mat"] for _, _, d in edges],
+        )
+        self._graph = graph
+
+    @classmethod
+    def from_arrays(cls, arrays, level):
+        """
+        Build the topology of a pressure level from the array model of a network (see arrays.compile_network), with
+        the nodes in the order of the buses and the pipes grouped by from node
+
+        :param arrays: the NetworkArrays of the network
+        :param level: the pressure level
+        :return: a LevelTopology
+        """
+        buses = arrays.level_buses(level)
+        pipes = arrays.level_pipes(level)
+        position = np.full(arrays.nbr_buses, -1, dtype=np.int32)
+        position[buses] = np.arange(len(buses))
+
+        tp = cls.__new__(cls)
+        tp._set(
+            nodes=arrays.bus_names[buses].tolist(),
+            node_index=arrays.bus_index[buses],
+            types=arrays.bus_type[buses],
+            zones=arrays.bus_zone[buses],
+            levels=[level] * len(buses),
+            pipes=arrays.pipe_names[pipes].tolist(),
+            pipe_index=arrays.pipe_index[pipes],
+            from_pos=position[arrays.pipe_from[pipes]],
+            to_pos=position[arrays.pipe_to[pipes]],
+            lengths=arrays.pipe_length[pipes],
+            diameters=arrays.pipe_diameter[pipes],
+            materials=arrays.pipe_material[pipes].tolist(),
+            roughness=arrays.pipe_roughness[pipes],
+        )
+        tp._graph = None
+        return tp
+
+    def _set(self, nodes, node_index, types, zones, levels, pipes, pipe_index, from_pos, to_pos, lengths, diameters,
+             materials, roughness=None):
+        self.nodes = nodes
+        self.node_index = np.asarray(node_index, dtype=int)
+        self.types = np.asarray(types, dtype=np.int8)
+        self.is_pass = self.types == NODE
+        self.is_sink = self.types == SINK
+        self.is_srce = self.types == SRCE
+        self._zones = zones
+        self._levels = levels
+
+        self.pipes = pipes
+        self.pipe_index = np.asarray(pipe_index, dtype=int)
+        self.from_pos = np.asarray(from_pos, dtype=int)
+        self.to_pos = np.asarray(to_pos, dtype=int)
+        self.lengths = np.asarray(lengths, dtype=float)
+        self.diameters = np.asarray(diameters, dtype=float)
+        self.materials = materials
+        self._roughness = roughness
+        self._laminar_factor = None
+
+        # Oriented incidence matrix: -1 at the from node and +1 at the to node of each pipe (as nx.incidence_matrix)
+        nbr_pipes = len(pipes)
+        self.incidence = sp.csr_matrix(
+            (
+                np.concatenate((-np.ones(nbr_pipes), np.ones(nbr_pipes))),
+                (np.concatenate((self.from_pos, self.to_pos)), np.tile(np.arange(nbr_pipes), 2)),
+            ),
+            shape=(len(nodes), nbr_pipes),
+        )
+        self._node_pos = pd.Index(self.nodes)
+
+    @property
+    def graph(self):
+        """
+        The level as a NetworkX graph (built on first access for topologies built from arrays)
+        """
+        if self._graph is None:
+            g = nx.OrderedDiGraph()
+            for n, idx, zone, level, t in zip(self.nodes, self.node_index, self._zones, self._levels, self.types):
+                g.add_node(n, index=idx, level=level, zone=zone, type=BUS_TYPES[t])
+            for i, (u, v) in enumerate(zip(self.from_pos, self.to_pos)):
+                g.add_edge(
+                    self.nodes[u],
+                    self.nodes[v],
+                    name=self.pipes[i],
+                    index=self.pipe_index[i],
+                    L_m=self.lengths[i],
+                    D_m=self.diameters[i],
+                    mat=self.materials[i],
+                    type="PIPE",
+                )
+            self._graph = g
+        return self._graph
+
+    @property
+    def roughness(self):
+        """
+        Absolute roughness (in [m]) of the pipes, from their materials
+        """
+        if self._roughness is None:
+            self._roughness = material_roughness(self.materials)
+        return self._roughness
+
+    @property
+    def laminar_factor(self):
+        """
+        Geometric factor 2⁷*L/(pi*D⁴) (in [m⁻³]) of the laminar pressure drop of the pipes, computed once: the
+        pressure drop is laminar_factor * mu/rho * m_dot
+        """
+        if self._laminar_factor is None:
+            self._laminar_factor = 2 ** 7 * self.lengths / (np.pi * self.diameters ** 4)
+        return self._laminar_factor
+
+    @property
+    def nbr_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def nbr_pipes(self):
+        return len(self.pipes)
+
+    def components(self, without=None):
+        """
+        Split the level into its weakly connected components (independent systems), from the sparse adjacency of its
+        pipes (scipy.sparse.csgraph)
+
+        :param without: positions of pipes to leave out before splitting (ex: outages) (default: None)
+        :return: a list of LevelTopology ordered by first node, [self] if the level is connected
+        """
+        pipes = np.arange(self.nbr_pipes)
+        if without is not None:
+            pipes = np.setdiff1d(pipes, without)
+        n = self.nbr_nodes
+        adj = sp.csr_matrix((np.ones(len(pipes)), (self.from_pos[pipes], self.to_pos[pipes])), shape=(n, n))
+        nbr, labels = csgraph.connected_components(adj, directed=False)
+        if nbr <= 1 and without is None:
+            return [self]
+
+        # Nodes of each component in the order of the level, components ordered by their first node
+        order = np.argsort(labels, kind="stable")
+        groups = np.split(order, np.cumsum(np.bincount(labels, minlength=nbr))[:-1])
+        groups = sorted(groups, key=operator.itemgetter(0))
+        pipe_labels = labels[self.from_pos[pipes]]
+        return [self.subset(nodes, pipes[pipe_labels == labels[nodes[0]]]) for nodes in groups]
+
+    def subset(self, nodes, pipes):
+        """
+        Topology of a part of the level
+
+        :param nodes: positions of the nodes of the part (ascending)
+        :param pipes: positions of the pipes of the part (ascending), both ends among nodes
+        :return: a LevelTopology
+        """
+        position = np.full(self.nbr_nodes, -1, dtype=int)
+        position[nodes] = np.arange(len(nodes))
+
+        tp = LevelTopology.__new__(LevelTopology)
+        tp._set(
+            nodes=[self.nodes[i] for i in nodes],
+            node_index=self.node_index[nodes],
+            types=self.types[nodes],
+            zones=[self._zones[i] for i in nodes],
+            levels=[self._levels[i] for i in nodes],
+            pipes=[self.pipes[i] for i in pipes],
+            pipe_index=self.pipe_index[pipes],
+            from_pos=position[self.from_pos[pipes]],
+            to_pos=position[self.to_pos[pipes]],
+            lengths=self.lengths[pipes],
+            diameters=self.diameters[pipes],
+            materials=[self.materials[i] for i in pipes],
+            roughness=None if self._roughness is None else self._roughness[pipes],
+        )
+        tp._graph = None
+        return tp
+
+    def replicate(self, nbr):
+        """
+        Topology of nbr disconnected copies of the level, with nodes and pipes named (copy, name): several scenarios
+        of the level are then solved as one (block diagonal) system
+
+        :param nbr: number of copies
+        :return: a LevelTopology
+        """
+        offsets = np.repeat(np.arange(nbr) * self.nbr_nodes, self.nbr_pipes)
+        tp = LevelTopology.__new__(LevelTopology)
+        tp._set(
+            nodes=[(i, n) for i in range(nbr) for n in self.nodes],
+            node_index=np.tile(self.node_index, nbr),
+            types=np.tile(self.types, nbr),
+            zones=list(self._zones) * nbr,
+            levels=list(self._levels) * nbr,
+            pipes=[(i, p) for i in range(nbr) for p in self.pipes],
+            pipe_index=np.tile(self.pipe_index, nbr),
+            from_pos=np.tile(self.from_pos, nbr) + offsets,
+            to_pos=np.tile(self.to_pos, nbr) + offsets,
+            lengths=np.tile(self.lengths, nbr),
+            diameters=np.tile(self.diameters, nbr),
+            materials=list(self.materials) * nbr,
+            roughness=np.tile(self.roughness, nbr),
+        )
+        tp._graph = None
+        return tp
+
+    def positions(self, buses, mask=None):
+        """
+        Return the positions of the given buses among the nodes of the level, or among the nodes selected by mask
+        (ex: is_sink gives positions in the sink equations), -1 for buses that are not there
+
+        :param buses: array-like of bus names
+        :param mask: boolean mask over the nodes of the level (default: None)
+        :return: array of positions
+        """
+        pos = self._node_pos.get_indexer(buses)
+        if mask is None:
+            return pos
+        rank = np.cumsum(mask) - 1
+        return np.where((pos >= 0) & mask[pos], rank[pos], -1)
+
+
+def create_topology(net, arrays=None):
+    """
+    Build the topology of every pressure level of a given network at once, from its array model
+
+    :param net: the given network
+    :param arrays: the NetworkArrays of the network, compiled from it if None (default: None)
+    :return: a dict mapping each pressure level to its LevelTopology
+    """
+    arrays = arrays if arrays is not None else compile_network(net)
+    levels = [level for level, _ in sorted(net.LEVELS.items(), key=operator.itemgetter(1))]
+    return {level: LevelTopology.from_arrays(arrays, level) for level in levels if len(arrays.level_buses(level))}
+
+
+def as_level_topology(graph):
+    """
+    Return the given level graph as a LevelTopology (unchanged if it already is one)
+    """
+    if isinstance(graph, LevelTopology):
+        return graph
+    return LevelTopology(graph)
@@ -63,3 +63,25 @@ def simple_network():
     pg.create_feeder(net, "BUSMPF", p_lim_kW=50, p_Pa=0.9e5, name="FEEDER")
 
     return net
+
+
+@pytest.fixture()
+def two_districts():
+    net = pg.create_empty_network()
+
+    pg.create_bus(net, level="MP", name="BUSF")
+    pg.create_feeder(net, "BUSF", p_lim_kW=100, p_Pa=2.0e5, name="FEEDER")
+
+    for d, p_kw in [("A", 10.0), ("B", 20.0)]:
+        bus_mp, bus0, bus1, bus2 = ["BUS{}{}".format(d, i) for i in ["MP", 0, 1, 2]]
+        pg.create_bus(net, level="MP", name=bus_mp)
+        pg.create_pipe(net, "BUSF", bus_mp, length_m=500, diameter_m=0.05, name="PIPEMP{}".format(d))
+        for bus in [bus0, bus1, bus2]:
+            pg.create_bus(net, level="BP", name=bus)
+        pg.create_station(net, bus_mp, bus0, p_lim_kW=50, p_Pa=1.022e5, name="STATION{}".format(d))
+        pg.create_pipe(net, bus0, bus1, length_m=400, diameter_m=0.05, name="PIPE{}01".format(d))
+        pg.create_pipe(net, bus1, bus2, length_m=300, diameter_m=0.05, name="PIPE{}12".format(d))
+        pg.create_pipe(net, bus0, bus2, length_m=600, diameter_m=0.05, name="PIPE{}02".format(d))
+        pg.create_load(net, bus2, p_kW=p_kw, name="LOAD{}".format(d))
+
+    return net
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `arrays` package."""
+
+import pytest
+
+import numpy as np
+
+from pandangas import arrays
+from pandangas import topology as top
+
+from fixtures import simple_network
+
+
+def test_compile_network(simple_network):
+    net = simple_network
+    net.pipe.loc[net.pipe["name"] == "PIPE1-2", "in_service"] = False
+    a = arrays.compile_network(net)
+    assert a.nbr_buses == 9
+    assert a.nbr_pipes == 10
+    assert a.pipe_from.dtype == np.int32
+    assert a.pipe_length.dtype == np.float64
+    assert a.bus_type.dtype == np.int8
+    assert a.levels == ["BP", "BP+", "MP", "HP"]
+    assert a.bus_names[a.pipe_from].tolist() == net.pipe["from_bus"].tolist()
+    assert a.bus_type[a.station_low].tolist() == [arrays.SRCE, arrays.SRCE]
+    assert a.bus_type[a.station_high].tolist() == [arrays.SINK, arrays.SINK]
+    assert np.all(a.pipe_roughness > 0)
+    assert a.pipe_in_service.sum() == 9
+    assert len(a.level_pipes("BP")) == 7
+    assert a.level_buses("MP").tolist() == [6, 7, 8]
+
+
+def test_material_roughness():
+    eps = arrays.material_roughness(["steel", "PVC", "steel"])
+    assert eps[0] == eps[2]
+    assert eps[0] != eps[1]
+    hits = arrays.roughness_of.cache_info().hits
+    arrays.material_roughness(["PVC"] * 10)
+    assert arrays.roughness_of.cache_info().hits == hits + 1
+
+
+def test_topology_from_arrays_same_as_graph(simple_network):
+    net = simple_network
+    tp = top.create_topology(net)["BP"]
+    ref = top.LevelTopology(top.graphs_by_level_as_dict(net)["BP"])
+    assert tp.nodes == ref.nodes
+    assert tp.pipes == ref.pipes
+    assert np.array_equal(tp.node_index, ref.node_index)
+    assert np.array_equal(tp.is_sink, ref.is_sink)
+    assert np.array_equal(tp.lengths, ref.lengths)
+    assert np.array_equal(tp.roughness, ref.roughness)
+    assert (tp.incidence != ref.incidence).nnz == 0
+    assert list(tp.graph.nodes) == ref.nodes
+    assert [d["name"] for _, _, d in tp.graph.edges(data=True)] == ref.pipes
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `contingency` package."""
+
+import pytest
+
+import numpy as np
+
+import pandangas as pg
+from pandangas import contingency as ct
+from pandangas.fluid import level_fluid
+
+from fixtures import simple_network
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+def test_run_contingencies_same_as_runpp(simple_network, method):
+    net = simple_network
+    net.load["min_p_Pa"] = 1.0225e5  # every load is in violation
+    pg.runpp(net, method=method)
+
+    outage = ["PIPE0-4", "PIPE2-3"]
+    violations = ct.run_contingencies(net, [outage], method=method)
+    assert set(violations["contingency"]) == {"PIPE0-4+PIPE2-3"}
+    assert set(violations["violation"]) == {"p_min"}
+    p_min = violations.set_index("name")["value"]
+
+    net.pipe.loc[net.pipe["name"].isin(outage), "in_service"] = False
+    pg.runpp(net, method=method)
+    p_ref = net.res_bus.set_index("name")["p_Pa"]
+    assert p_min.values == pytest.approx(p_ref.loc[p_min.index].values, abs=1)
+
+
+def test_run_contingencies_islanded(simple_network):
+    net = simple_network
+    pg.runpp(net, method="LINEAR")
+    violations = ct.run_contingencies(net, ["PIPE0-4", "PIPEMPF-0"], method="LINEAR")
+    assert violations[["contingency", "name", "violation"]].values.tolist() == [
+        ["PIPEMPF-0", "BUSMP0", "islanded"],
+        ["PIPEMPF-0", "BUSMP3", "islanded"],
+    ]
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+def test_run_contingencies_passive_dead_end(simple_network, method):
+    net = simple_network
+    pg.create_bus(net, level="BP", name="BUSDEAD")
+    pg.create_pipe(net, "BUS2", "BUSDEAD", length_m=100, diameter_m=0.05, name="PIPEDEAD")
+    net.load["min_p_Pa"] = 1.0225e5
+    pg.runpp(net, method=method)
+    violations = ct.run_contingencies(net, ["PIPEDEAD"], method=method)
+    assert "islanded" not in set(violations["violation"])
+    assert violations["name"].tolist() == sorted(net.load["bus"])
+
+
+def test_run_contingencies_velocity(simple_network):
+    net = simple_network
+    pg.runpp(net, method="LINEAR")
+    net.V_MAX = 0.1
+    violations = ct.run_contingencies(net, ["PIPE1-2"], method="LINEAR")
+    assert set(violations["violation"]) == {"v_max"}
+    assert (np.abs(violations["value"]) > 0.1).all()
+
+
+def test_run_contingencies_velocity_with_eos(simple_network):
+    net = simple_network
+    net.load["p_kW"] *= 10
+    net.V_MAX = 0.1
+    pg.runpp(net, eos="ideal")
+    violations = ct.run_contingencies(net, ["PIPE1-2"], eos="ideal")
+    v_max = violations.loc[violations["violation"] == "v_max"].set_index("name")["value"]
+    assert len(v_max)
+
+    net.pipe.loc[net.pipe["name"] == "PIPE1-2", "in_service"] = False
+    pg.runpp(net, eos="ideal")
+    p = net.res_bus.set_index("name")["p_Pa"].astype(float)
+    pipes = net.pipe.set_index("name").loc[v_max.index]
+    gas = level_fluid(net, "BP")
+    rho = gas.rho * (p.loc[pipes["from_bus"]].values + p.loc[pipes["to_bus"]].values) / (2 * gas.P)
+    m_dot = net.res_pipe.set_index("name").loc[v_max.index, "m_dot_kg/s"].values.astype(float)
+    assert v_max.values == pytest.approx(m_dot / (rho * np.pi * pipes["diameter_m"].values ** 2 / 4), rel=1e-3)
+
+
+def test_run_contingencies_raise_exception(simple_network):
+    net = simple_network
+    with pytest.raises(ValueError, match="run runpp first"):
+        ct.run_contingencies(net, ["PIPE0-4"])
+    pg.runpp(net, method="LINEAR")
+    with pytest.raises(ValueError, match="do not exist"):
+        ct.run_contingencies(net, ["PIPE0-4", ["PIPE1-2", "PIPE9-9"]], method="LINEAR")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `coupling` package."""
+
+import copy
+
+import pytest
+
+import numpy as np
+
+from pandangas import results as res
+
+from fixtures import simple_network, two_districts
+
+
+def _results(net, **kwargs):
+    net = copy.deepcopy(net)
+    res.runpp(net, **kwargs)
+    return net.res_bus.set_index("name")["p_Pa"], net.res_pipe.set_index("name")["m_dot_kg/s"], net.res_station
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+@pytest.mark.parametrize("coupling", ["arrays", "block"])
+def test_coupling_same_results(simple_network, method, coupling):
+    # The tables coupling rounds the loads and the stations flows to 6 decimals
+    p_ref, m_ref, stat_ref = _results(simple_network, method=method)
+    p, m, stat = _results(simple_network, method=method, coupling=coupling)
+    assert np.allclose(p.reindex(p_ref.index).values.astype(float), p_ref.values.astype(float), atol=1)
+    assert np.allclose(m.reindex(m_ref.index).values.astype(float), m_ref.values.astype(float), rtol=1e-2)
+    assert np.allclose(stat["m_dot_kg/s"].values.astype(float), stat_ref["m_dot_kg/s"].values.astype(float), rtol=1e-2)
+
+
+def test_coupling_components(two_districts):
+    p_ref, m_ref, _ = _results(two_districts, method="NON-LINEAR")
+    p, m, _ = _results(two_districts, method="NON-LINEAR", coupling="block", reduce=True)
+    assert np.allclose(p.reindex(p_ref.index).values.astype(float), p_ref.values.astype(float), atol=1)
+    assert np.allclose(m.reindex(m_ref.index).values.astype(float), m_ref.values.astype(float), rtol=1e-2)
+
+
+def test_coupling_errors(simple_network):
+    with pytest.raises(ValueError):
+        res.runpp(simple_network, coupling="shared")
+    with pytest.raises(ValueError):
+        res.runpp(simple_network, method="NODAL", coupling="block")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `fluid` package."""
+
+import pytest
+
+import numpy as np
+
+from thermo.chemical import Chemical
+
+from pandangas import fluid as fl
+from fixtures import simple_network
+
+
+def test_get_fluid_same_as_chemical():
+    gas = Chemical("natural gas", T=10 + 273.15, P=1.022e5)
+    fluid = fl.get_fluid("natural gas", 10 + 273.15, 1.022e5)
+    assert fluid.rho == gas.rho
+    assert fluid.mu == gas.mu
+    assert fluid.P == 1.022e5
+
+
+def test_get_fluid_is_cached():
+    fl.clear_cache()
+    fl.get_fluid("natural gas", 10 + 273.15, 1.022e5)
+    fl.get_fluid("natural gas", 10 + 273.15, 1.022e5)
+    assert fl.get_fluid.cache_info().hits == 1
+    assert fl.get_fluid.cache_info().misses == 1
+
+
+def test_create_fluid_table(simple_network):
+    net = simple_network
+    table = fl.create_fluid_table(net)
+    assert set(table) == set(net.LEVELS)
+    assert fl.level_fluid(net, "BP") is table["BP"]
+    assert table["HP"].rho > table["BP"].rho
+
+
+@pytest.mark.parametrize("eos", fl.EOS)
+def test_fluid_properties(eos):
+    fluid = fl.get_fluid("natural gas", 10 + 273.15, 1.025e5)
+    p = np.array([0.9e5, 1.025e5, 1.2e5])
+    rho, drho, mu, dmu = fl.fluid_properties(fluid, p, eos)
+    assert rho[1] == pytest.approx(fluid.rho)
+    assert mu[1] == pytest.approx(fluid.mu)
+    if eos != "constant":
+        gas = Chemical("natural gas", T=10 + 273.15, P=1.2e5)
+        assert rho[2] == pytest.approx(gas.rho, rel=1e-3)
+        h = 1.0
+        rho_h, _, mu_h, _ = fl.fluid_properties(fluid, p + h, eos)
+        assert np.allclose(drho, (rho_h - rho) / h)
+        assert np.allclose(dmu, (mu_h - mu) / h)
+    with pytest.raises(ValueError):
+        fl.fluid_properties(fluid, p, "van der waals")
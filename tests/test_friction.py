@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `friction` package."""
+
+import pytest
+
+import numpy as np
+import fluids
+
+from pandangas import friction
+
+
+def test_colebrook_same_as_fluids():
+    re = np.array([5e3, 1e4, 1e5, 1e6, 1e7])
+    ed = np.array([1e-5, 1e-4, 1e-3, 1e-2, 1e-6])
+    f, _ = friction.friction_factor(re, ed)
+    expected = [fluids.friction_factor(r, eD=e) for r, e in zip(re, ed)]
+    assert f.tolist() == pytest.approx(expected, rel=1e-12)
+
+
+@pytest.mark.parametrize("model, rel", [("swamee-jain", 0.02), ("haaland", 0.02), ("laminar", 1e-12)])
+def test_explicit_models(model, rel):
+    re = np.array([1e3, 1e4, 1e5, 1e6])
+    ed = np.full(4, 1e-4)
+    f, _ = friction.friction_factor(re, ed, model)
+    if model == "laminar":
+        assert f.tolist() == pytest.approx((64 / re).tolist(), rel=rel)
+    else:
+        expected = [fluids.friction_factor(r, eD=e) for r, e in zip(re, ed)]
+        assert f.tolist() == pytest.approx(expected, rel=rel)
+
+
+@pytest.mark.parametrize("model", friction.MODELS)
+def test_pressure_drop_derivative(model):
+    m_dot = np.array([0.5, -2.0, 1e-6, -1e-5])
+    l = np.array([100.0, 200.0, 300.0, 400.0])
+    d = np.array([0.05, 0.1, 0.2, 0.1])
+    e = np.full(4, 4.5e-5)
+    dp, ddp = friction.pressure_drop(m_dot, l, d, e, rho=0.8, mu=1.1e-5, model=model)
+    assert np.array_equal(np.sign(dp), np.sign(m_dot))
+    assert friction.pressure_drop(-m_dot, l, d, e, 0.8, 1.1e-5, model)[0].tolist() == (-dp).tolist()
+    h = 1e-7 * np.abs(m_dot)
+    dp_p, _ = friction.pressure_drop(m_dot + h, l, d, e, 0.8, 1.1e-5, model)
+    dp_m, _ = friction.pressure_drop(m_dot - h, l, d, e, 0.8, 1.1e-5, model)
+    assert np.allclose(ddp, (dp_p - dp_m) / (2 * h), rtol=1e-5)
+
+
+@pytest.mark.parametrize("model", friction.MODELS)
+def test_fluid_sensitivity(model):
+    m_dot = np.array([0.5, -2.0, 1e-6, -1e-5])
+    l, d, e = np.full(4, 100.0), np.array([0.05, 0.1, 0.2, 0.1]), np.full(4, 4.5e-5)
+    rho, mu = np.array([0.8, 0.9, 1.0, 1.1]), np.array([1.1e-5, 1.0e-5, 1.2e-5, 1.1e-5])
+    drho, dmu = np.full(4, 7e-6), np.full(4, 1e-11)
+    dp, _, dlnf = friction._pressure_drop(m_dot, l, d, e, rho, mu, model)
+    h = 1e-2
+    dp_h, _, _ = friction._pressure_drop(m_dot, l, d, e, rho + h * drho, mu + h * dmu, model)
+    assert np.allclose(friction.fluid_sensitivity(dp, dlnf, rho, mu, drho, dmu), (dp_h - dp) / h, rtol=1e-5)
+
+
+@pytest.mark.parametrize("model", ["colebrook", "swamee-jain", "haaland"])
+def test_transition_is_smooth(model):
+    ed = 1e-4
+    for re in [friction.RE_LAMINAR, friction.RE_TURBULENT]:
+        f_below, dlnf_below = friction.friction_factor([re * (1 - 1e-9)], [ed], model)
+        f_above, dlnf_above = friction.friction_factor([re * (1 + 1e-9)], [ed], model)
+        assert f_below[0] == pytest.approx(f_above[0], rel=1e-7)
+        assert dlnf_below[0] == pytest.approx(dlnf_above[0], rel=1e-6)
+    re = np.linspace(friction.RE_LAMINAR, friction.RE_TURBULENT, 7)
+    f, dlnf = friction.friction_factor(re, np.full(7, ed), model)
+    f_h, _ = friction.friction_factor(re * (1 + 1e-7), np.full(7, ed), model)
+    assert np.allclose(dlnf, np.log(f_h / f) / np.log(1 + 1e-7), rtol=1e-5)
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        friction.pressure_drop(np.ones(2), np.ones(2), np.ones(2), np.zeros(2), 0.8, 1.1e-5, model="moody")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `importer` package."""
+
+import io
+
+import pytest
+
+import pandangas as pg
+from pandangas import importer as imp
+
+BUSES = """id,lvl,zone
+A,BP,z1
+B,BP,
+C,BP,z1
+D,MP,z2
+"""
+
+PIPES = """id,from,to,len,diam,in_service
+P1,A,B,100,0.05,1
+P2,B,C,200,0.05,true
+P3,C,A,300,0.05,False
+"""
+COLUMNS = {
+    "bus_columns": {"name": "id", "level": "lvl"},
+    "pipe_columns": {"name": "id", "from_bus": "from", "to_bus": "to", "length_m": "len", "diameter_m": "diam"},
+}
+
+
+def test_import_network():
+    net = pg.create_empty_network()
+    pg.create_bus(net, "BP", "E")
+    nbr = imp.import_network(
+        net,
+        buses=io.StringIO(BUSES),
+        pipes=io.StringIO(PIPES),
+        chunksize=2,
+        **COLUMNS
+    )
+    assert nbr == (4, 3)
+    assert net.bus["name"].tolist() == ["E", "A", "B", "C", "D"]
+    assert net.bus["zone"].tolist() == [None, "z1", None, "z1", "z2"]
+    assert net.pipe["in_service"].tolist() == [True, True, False]
+    assert net.pipe["material"].tolist() == ["steel"] * 3
+    assert net.pipe["length_m"].tolist() == [100, 200, 300]
+    assert net.lookup("bus")["D"] == 4
+
+
+def test_import_network_records():
+    net = pg.create_empty_network()
+    buses = {"features": [{"properties": {"name": n, "level": "BP"}} for n in ["A", "B"]]}
+    pipes = [{"name": "P", "from_bus": "A", "to_bus": "B", "length_m": 10.0, "diameter_m": 0.1}]
+    assert imp.import_network(net, buses=buses, pipes=pipes) == (2, 1)
+    assert net.pipe["to_bus"].tolist() == ["B"]
+
+
+def test_import_network_invalid_rows():
+    net = pg.create_empty_network()
+    pg.create_bus(net, "BP", "A")
+    buses = [{"name": "A", "level": "BP"}, {"name": "B", "level": "XX"}, {"name": "C", "level": "MP"}]
+    pipes = [
+        {"name": "P1", "from_bus": "A", "to_bus": "Z", "length_m": 10, "diameter_m": 0.1},
+        {"name": "P1", "from_bus": "A", "to_bus": "C", "length_m": -1, "diameter_m": "x"},
+    ]
+    with pytest.raises(imp.InvalidRowsError) as e:
+        imp.import_network(net, buses=buses, pipes=pipes, chunksize=1)
+    assert e.value.rows[["table", "row", "reason"]].values.tolist() == [
+        ["bus", 0, "duplicated name"],
+        ["bus", 1, "unknown level"],
+        ["pipe", 0, "unknown to_bus"],
+        ["pipe", 1, "duplicated name"],
+        ["pipe", 1, "different pressure levels"],
+        ["pipe", 1, "invalid length_m"],
+        ["pipe", 1, "invalid diameter_m"],
+    ]
+    assert len(net.bus) == 1
+
+    with pytest.raises(ValueError, match="missing"):
+        imp.import_network(net, buses=[{"id": "A", "level": "BP"}])
+
+
+def test_import_network_rollback():
+    net = pg.create_empty_network()
+    pg.create_bus(net, "BP", "E")
+    pipes = io.StringIO(PIPES + "P4,A,X,10,0.05,1\n")
+    with pytest.raises(imp.InvalidRowsError) as e:
+        imp.import_network(net, buses=io.StringIO(BUSES), pipes=pipes, chunksize=2, **COLUMNS)
+    assert e.value.rows[["table", "row", "reason"]].values.tolist() == [["pipe", 3, "unknown to_bus"]]
+    assert net.bus["name"].tolist() == ["E"]
+    assert len(net.pipe) == 0
+    assert "A" not in net.lookup("bus")
+
+
+def test_import_network_missing_column_rollback():
+    net = pg.create_empty_network()
+    pg.create_bus(net, "BP", "E")
+    pipes = io.StringIO(PIPES.replace(",diam", ",width"))
+    with pytest.raises(ValueError, match="missing"):
+        imp.import_network(net, buses=io.StringIO(BUSES), pipes=pipes, chunksize=2, **COLUMNS)
+    assert net.bus["name"].tolist() == ["E"]
+    assert len(net.pipe) == 0
+    assert "A" not in net.lookup("bus")
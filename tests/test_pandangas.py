@@ -68,3 +68,50 @@ def test_network_repr(fix_create):
     assert "This pandangas network includes the following parameter tables:" in repr(net)
     assert "- bus (5 elements)" in repr(net)
     assert "and the following results tables:" not in repr(net)
+
+
+def test_bulk_creation(fix_create):
+    net = fix_create
+    names = pg.create_buses(net, level="BP", name=["BUS4", "BUS5", "BUS6"])
+    assert list(names) == ["BUS4", "BUS5", "BUS6"]
+    pg.create_pipes(
+        net, ["BUS3", "BUS4", "BUS5"], ["BUS4", "BUS5", "BUS6"], length_m=[100, 200, 300], diameter_m=0.05,
+        name=["PIPE4", "PIPE5", "PIPE6"]
+    )
+    pg.create_loads(net, ["BUS5", "BUS6"], p_kW=[1.0, 2.0], name=["LOAD5", "LOAD6"])
+    assert len(net.bus.index) == 8
+    assert len(net.pipe.index) == 7
+    assert net.pipe["length_m"].tolist()[-3:] == [100, 200, 300]
+    assert len(net.load.index) == 4
+    assert net.bus.loc[net.bus["name"].isin(["BUS5", "BUS6"]), "type"].tolist() == ["SINK", "SINK"]
+
+
+def test_bulk_creation_raise_exception(fix_create):
+    net = fix_create
+    with pytest.raises(ValueError):
+        pg.create_buses(net, level=["BP", "XX"], name=["BUS4", "BUSX"])
+    assert len(net.bus.index) == 5
+    with pytest.raises(ValueError):
+        pg.create_pipes(net, ["BUS1", "BUS2"], ["BUSX", "BUS3"], length_m=100, diameter_m=0.05, name=["PX", "PY"])
+    with pytest.raises(ValueError):
+        pg.create_pipes(net, ["BUS0", "BUS2"], ["BUS1", "BUS3"], length_m=100, diameter_m=0.05, name=["PX", "PY"])
+    assert len(net.pipe.index) == 4
+    with pytest.raises(ValueError, match="already a SINK"):
+        pg.create_loads(net, ["BUS2", "BUS1"], p_kW=1.0, name=["LX", "LY"])
+    pg.create_bus(net, level="BP", name="BUS4")
+    with pytest.raises(ValueError, match=r"\['BUS4'\] have several loads"):
+        pg.create_loads(net, ["BUS4", "BUS1", "BUS4"], p_kW=1.0, name=["LX", "LY", "LZ"])
+    assert len(net.load.index) == 2
+
+
+def test_lookup_stays_in_sync(fix_create):
+    net = fix_create
+    assert net.lookup("bus")["BUS2"] == 3
+    assert net.lookup("station", col="bus_low") == {"BUS1": 0}
+    pg.create_bus(net, level="BP", name="BUS4")
+    assert net.lookup("bus")["BUS4"] == 5
+    pg.create_buses(net, level="BP", name=["BUS5", "BUS6"])
+    assert net.lookup("bus")["BUS6"] == 7
+    net.bus.drop(net.bus.index[-1], inplace=True)
+    assert "BUS6" not in net.lookup("bus")
+    assert net.get_index("bus", "BUSX") == len(net.bus)
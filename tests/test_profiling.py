@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `profiling` package."""
+
+import pytest
+
+import numpy as np
+import scipy.sparse as sp
+
+from pandangas import profiling
+from pandangas import results as res
+
+from fixtures import simple_network, two_districts
+
+
+def test_stats():
+    stats = profiling.Stats()
+    with stats.timer("solve", "BP"):
+        pass
+    with stats.timer("solve", "BP"):
+        pass
+    stats.count("residuals", "BP", 3)
+    stats.count("residuals", "BP")
+    stats.matrix("A", sp.eye(4, format="csr"), "BP")
+    assert list(stats.times) == [("solve", "BP")]
+    assert stats.counts[("residuals", "BP")] == 4
+    assert stats.matrices == [{"name": "A", "level": "BP", "shape": (4, 4), "nnz": 4, "density": 0.25}]
+
+    other = profiling.Stats()
+    other.count("residuals", "BP", 2)
+    stats.merge(other)
+    assert stats.counts[("residuals", "BP")] == 6
+    assert set(stats.as_dataframe()["kind"]) == {"time_s", "count"}
+
+
+def test_disabled_stats(simple_network):
+    net = simple_network
+    assert profiling.as_stats(False) is profiling.NULL_STATS
+    res.runpp(net, method="LINEAR")
+    assert net.stats is None
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+def test_runpp_stats(simple_network, method):
+    net = simple_network
+    # The flows of simple_network are laminar: the linear initial guess would already be the non-linear solution
+    kwargs = {"init": "tree"} if method == "NON-LINEAR" else {}
+    res.runpp(net, method=method, stats=True, **kwargs)
+    phases = net.stats.by_phase()
+    assert set(phases) == {"topology", "fluid", "assembly", "solve", "results"}
+    assert {level for (_, level) in net.stats.times} == {None, "BP", "MP"}
+    assert net.stats.counts[("factorizations", "BP")] >= 1
+    if method == "NON-LINEAR":
+        assert net.stats.counts[("residuals", "BP")] > net.stats.counts[("iterations", "BP")]
+    assert {m["level"] for m in net.stats.matrices} == {"BP", "MP"}
+    assert all(0 < m["density"] < 1 for m in net.stats.matrices)
+
+
+def test_runpp_resets_stats_and_solver_info(simple_network):
+    net = simple_network
+    res.runpp(net, method="NON-LINEAR", stats=True)
+    assert net.stats is not None
+    assert set(net.solver_info) == {"BP", "MP"}
+    res.runpp(net, method="LINEAR")
+    assert net.stats is None
+    assert net.solver_info == {}
+
+
+def test_runpp_stats_callback(two_districts):
+    net = two_districts
+    received = []
+    res.runpp(net, stats=received.append, workers=2, executor="thread")
+    assert received == [net.stats]
+    assert len([m for m in net.stats.matrices if m["level"] == "BP"]) == 2
+    assert np.isclose(sum(net.stats.by_phase().values()), sum(net.stats.times.values()))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `reduction` package."""
+
+import pytest
+
+from pandangas import pandangas as pg
+from pandangas import topology as top
+from pandangas.reduction import reduce_topology
+from pandangas.results import runpp
+
+from fixtures import simple_network
+
+
+@pytest.fixture()
+def chained_network(simple_network):
+    net = simple_network
+    for name in ["BUSA", "BUSB", "BUS6", "BUSD1", "BUSD2"]:
+        pg.create_bus(net, level="BP", name=name)
+    # Series chain (one pipe against the flow) to a new load, and a load-free dead end
+    pg.create_pipe(net, "BUS5", "BUSA", length_m=1000, diameter_m=0.02, name="PIPE5-A")
+    pg.create_pipe(net, "BUSB", "BUSA", length_m=2000, diameter_m=0.02, name="PIPEB-A")
+    pg.create_pipe(net, "BUSB", "BUS6", length_m=3000, diameter_m=0.02, name="PIPEB-6")
+    pg.create_pipe(net, "BUS1", "BUSD1", length_m=500, diameter_m=0.05, name="PIPE1-D1")
+    pg.create_pipe(net, "BUSD1", "BUSD2", length_m=500, diameter_m=0.05, name="PIPED1-D2")
+    pg.create_load(net, "BUS6", p_kW=20.0, name="LOAD6")
+    return net
+
+
+def test_reduce_topology(chained_network):
+    tp = top.create_topology(chained_network)["BP"]
+    red = reduce_topology(tp)
+    assert red.topology.nbr_nodes == tp.nbr_nodes - 4
+    assert red.topology.nbr_pipes == tp.nbr_pipes - 4
+    assert "PIPE5-A" in red.topology.pipes and "BUSD1" not in red.topology.nodes
+    assert red.topology.lengths[red.topology.pipes.index("PIPE5-A")] == 6000
+    assert red.ratio < 1
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+def test_runpp_reduced(chained_network, method):
+    net = chained_network
+    runpp(net, method=method)
+    res_bus, res_pipe = net.res_bus.sort_index(), net.res_pipe.sort_index()
+    runpp(net, method=method, reduce=True)
+    assert net.res_bus.sort_index()["p_Pa"].tolist() == pytest.approx(res_bus["p_Pa"].tolist(), abs=1)
+    assert net.res_pipe.sort_index()["m_dot_kg/s"].tolist() == pytest.approx(
+        res_pipe["m_dot_kg/s"].tolist(), abs=1e-9
+    )
+    p = net.res_bus.set_index("name")["p_Pa"]
+    assert p["BUSD2"] == p["BUS1"]
+    assert p["BUS5"] > p["BUSA"] > p["BUSB"] > p["BUS6"]
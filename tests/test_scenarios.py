@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `scenarios` package."""
+
+import pytest
+
+import numpy as np
+import pandas as pd
+
+import pandangas as pg
+from pandangas import scenarios as sc
+
+from fixtures import two_districts
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+def test_run_scenarios_same_as_runpp(two_districts, method):
+    net = two_districts
+    load_matrix = np.array([[10.0, 20.0], [5.0, 40.0], [30.0, 1.0]])
+    out = sc.run_scenarios(net, load_matrix, method=method)
+    assert out["res_bus"].shape == (3, len(net.bus), 2)
+    assert out["res_pipe"].shape == (3, len(net.pipe), 4)
+    assert out["res_station"].shape == (3, 2, 3)
+
+    for i, p_kw in enumerate(load_matrix):
+        net.load["p_kW"] = p_kw
+        pg.runpp(net, method=method)
+        p_ref = net.res_bus.sort_index()["p_Pa"].values.astype(float)
+        m_ref = net.res_pipe.sort_index()["m_dot_kg/s"].values.astype(float)
+        assert out["res_bus"][i, :, 0] == pytest.approx(p_ref, abs=1)
+        assert out["res_pipe"][i, :, 0] == pytest.approx(m_ref, abs=1e-6)
+        assert out["res_feeder"][i, 0, 1] == pytest.approx(net.res_feeder["p_kW"].values[0], rel=1e-3)
+
+
+def test_run_scenarios_dataframe(two_districts):
+    net = two_districts
+    out = sc.run_scenarios(net, pd.DataFrame({"LOADB": [20.0, 0.0]}))
+    assert out["res_station"][:, :, 1] == pytest.approx(np.array([[10.0, 20.0], [10.0, 0.0]]))
+    with pytest.raises(ValueError):
+        sc.run_scenarios(net, np.ones((2, 3)))
+
+
+def test_run_scenarios_unknown_method_raise_exception(two_districts):
+    with pytest.raises(ValueError):
+        sc.run_scenarios(two_districts, np.ones((2, 2)), method="NODAL")
+
+
+def test_run_scenarios_not_converged_warning(two_districts):
+    net = two_districts
+    out = sc.run_scenarios(net, np.ones((2, 2)), method="NON-LINEAR")
+    assert all(info["converged"] for info in out["solver_info"].values())
+    with pytest.warns(RuntimeWarning, match="did not converge"):
+        out = sc.run_scenarios(net, np.array([[10.0, 20.0], [50.0, 90.0]]), method="NON-LINEAR", max_iter=1)
+    assert not all(info["converged"] for info in out["solver_info"].values())
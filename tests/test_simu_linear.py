@@ -6,6 +6,7 @@
 import pytest
 
 import numpy as np
+import scipy.sparse as sp
 from thermo.chemical import Chemical
 
 from pandangas import simu_linear as sim
@@ -42,8 +43,9 @@ def test_create_k(simple_network):
     graph = g["BP"]
     k = sim.create_k(graph, gas)
     assert k.shape == (len(graph.edges),)
-    for ik in k:
-        assert int(ik) == 49975
+    # 2⁷*L*mu/(D⁴*pi*rho) with L = 1e4 m and D = 0.05 m
+    assert k.tolist() == pytest.approx([2 ** 7 * 1e4 * gas.mu / (0.05 ** 4 * np.pi * gas.rho)] * len(k))
+    assert k.tolist() == pytest.approx([990968] * len(k), rel=1e-2)
 
 
 def test_create_b(simple_network):
@@ -72,6 +74,55 @@ def test_run_one_level_BP_values(simple_network):
     graph = g["BP"]
     p_nodes, m_dot_pipes, m_dot_nodes, gas = sim.run_one_level(net, "BP")
 
-    assert p_nodes.round().tolist() == [102200.0, 102190.0, 102188.0, 102193.0, 102190.0, 102200.0]
+    assert p_nodes.tolist() == pytest.approx([102200.0, 101993.0, 101967.0, 102064.0, 101999.0, 102200.0], abs=3)
     assert m_dot_pipes.round(5).tolist() == [2.1e-04, 2.4e-04, 3.0e-05, 7.0e-05, -1.4e-04, 7.0e-05, -2.0e-04, 1.0e-05]
     assert m_dot_nodes.round(5).tolist() == [-0.00045, 0.00026, 0.00026, 0.0, 0.00026, -0.00034]
+
+
+def test_solve_sparse(monkeypatch):
+    monkeypatch.setattr(sim, "SPARSE_THRESHOLD", 1)
+    a = sp.csr_matrix(np.array([[3.0, 1.0], [1.0, 2.0]]))
+    b = np.array([9.0, 8.0])
+    assert np.allclose(sim.solve(a, b, check=True), np.array([2.0, 3.0]))
+    assert np.allclose(sim.solve(a, b, check=True, iterative=True), np.array([2.0, 3.0]))
+
+
+def test_solve_iterative_meshed():
+    from benchmarks.networks import create_meshed
+
+    net = create_meshed(2000)
+    tp = top.create_topology(net)["MP"]
+    gas = sim.level_fluid(net, "MP")
+    a = sim.create_a(tp, gas)
+    b = sim.create_b(tp, sim._scaled_loads_as_dict(net), sim._operating_pressures_as_dict(net))
+    x = sim.solve(a, b, check=True, iterative=True, tol=1e-10)
+    assert np.linalg.norm(a.dot(x) - b) <= 1e-10 * np.linalg.norm(b)
+    assert np.allclose(x, sim.solve(a, b), rtol=1e-8)
+
+
+def test_run_one_level_iterative(simple_network, monkeypatch):
+    monkeypatch.setattr(sim, "SPARSE_THRESHOLD", 1)
+    net = simple_network
+    p_ref, m_dot_ref, _, _ = sim.run_one_level(net, "BP")
+    p_nodes, m_dot_pipes, _, _ = sim.run_one_level(net, "BP", check=True, iterative=True)
+    assert np.allclose(p_nodes, p_ref)
+    assert np.allclose(m_dot_pipes, m_dot_ref, atol=1e-12)
+
+
+def test_create_a_is_sparse(simple_network):
+    gas = Chemical("natural gas", T=10 + 273.15, P=1.022e5)
+    net = simple_network
+    graph = top.graphs_by_level_as_dict(net)["BP"]
+    a = sim.create_a(graph, gas)
+    assert sp.issparse(a)
+    assert a.nnz < 20 * 20
+
+
+def test_run_one_level_with_topology(simple_network):
+    net = simple_network
+    topology = top.create_topology(net)
+    assert set(topology) == {"BP", "MP"}
+    p_nodes, m_dot_pipes, _, _ = sim.run_one_level(net, "BP", topology=topology["BP"])
+    p_nodes_ref, m_dot_pipes_ref, _, _ = sim.run_one_level(net, "BP")
+    assert np.allclose(p_nodes, p_nodes_ref)
+    assert np.allclose(m_dot_pipes, m_dot_pipes_ref)
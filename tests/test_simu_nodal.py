@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `simu_nodal` package."""
+
+import pytest
+
+import numpy as np
+
+from pandangas import simu_nodal as sim
+from pandangas import simu_nonlinear as sim_nl
+from pandangas.fluid import get_fluid
+from pandangas.friction import MODELS
+from pandangas.results import runpp
+from fixtures import simple_network
+
+
+@pytest.mark.parametrize("model", MODELS)
+def test_m_dot_from_dp_inverse(model):
+    gas = get_fluid("natural gas", 10 + 273.15, 1.022e5)
+    m_dot = np.array([-0.5, -1e-3, 0.0, 1e-4, 1.3e-3, -1.6e-3, 2e-3, 0.05, 2.0])
+    l = np.full(len(m_dot), 500.0)
+    d = np.array([0.05, 0.05, 0.1, 0.2, 0.05, 0.05, 0.05, 0.2, 1.0])
+    e = np.full(len(m_dot), 4.5e-5)
+    dp, ddp = sim_nl._dp_and_ddp_from_m_dot(m_dot, l, d, e, gas, model)
+    res, dres = sim._m_dot_from_dp(dp, l, d, e, gas, model)
+    assert res.tolist() == pytest.approx(m_dot.tolist(), rel=1e-9, abs=1e-15)
+    assert (dres * ddp).tolist() == pytest.approx([1.0] * len(m_dot))
+
+
+@pytest.mark.parametrize("method, reference", [("NODAL", "NON-LINEAR"), ("NODAL-LINEAR", "LINEAR")])
+def test_runpp_nodal_same_as_full(simple_network, method, reference):
+    net = simple_network
+    runpp(net, method=reference)
+    res_bus, res_pipe, res_station = net.res_bus.copy(), net.res_pipe.copy(), net.res_station.copy()
+    runpp(net, method=method)
+    assert all(info["converged"] for info in net.solver_info.values())
+    assert net.res_bus["p_Pa"].tolist() == pytest.approx(res_bus["p_Pa"].tolist(), abs=1)
+    assert net.res_pipe["m_dot_kg/s"].tolist() == pytest.approx(res_pipe["m_dot_kg/s"].tolist(), abs=1e-9)
+    assert net.res_station["p_kW"].tolist() == pytest.approx(res_station["p_kW"].tolist(), abs=1e-3)
+
+
+def test_nodal_system_size(simple_network):
+    net = simple_network
+    runpp(net, method="NODAL", stats=True)
+    sizes = {m["level"]: m["shape"][0] for m in net.stats.matrices}
+    assert sizes == {"BP": 6 - 2, "MP": 3 - 1}
+
+
+def test_run_one_level_eos_raise_exception(simple_network):
+    with pytest.raises(ValueError):
+        sim.run_one_level(simple_network, "BP", eos="ideal")
+
+
+@pytest.mark.parametrize("friction", ["colebrook", "haaland"])
+@pytest.mark.parametrize("nbr_pipes", [500, 2000])
+def test_run_one_level_meshed_converges(nbr_pipes, friction):
+    # Many pipes of the meshed benchmark network are in the laminar-turbulent transition
+    from benchmarks.networks import create_meshed
+
+    net = create_meshed(nbr_pipes)
+    sim.run_one_level(net, "MP", friction=friction)
+    assert net.solver_info["MP"]["converged"]
@@ -11,6 +11,7 @@ from thermo.chemical import Chemical
 
 from pandangas import simu_nonlinear as sim
 from pandangas import topology as top
+from pandangas.fluid import level_fluid
 from fixtures import simple_network
 
 
@@ -46,6 +47,102 @@ def test_run_one_level_BP_values(simple_network):
     assert m_dot_pipes.round(5).tolist() == [2.1e-04, 2.4e-04, 3.0e-05, 7.0e-05, -1.4e-04, 7.0e-05, -2.0e-04, 1.0e-05]
     assert m_dot_nodes.round(5).tolist() == [-0.00045, 0.00026, 0.00026, 0.0, 0.00026, -0.00034]
 
+
+def test_dp_and_ddp_from_m_dot():
+    gas = Chemical("natural gas", T=10 + 273.15, P=1.022e5)
+    eps = fluids.material_roughness(fluids.nearest_material_roughness("steel", clean=True))
+    m_dot = np.array([0.5, -2.0, 1e-6])
+    l = np.array([100.0, 200.0, 300.0])
+    d = np.array([0.05, 0.1, 0.2])
+    e = np.full(3, eps)
+    dp, ddp = sim._dp_and_ddp_from_m_dot(m_dot, l, d, e, gas)
+    assert dp[0] > 0 and dp[1] < 0
+    h = 1e-7 * np.abs(m_dot)
+    dp_p, _ = sim._dp_and_ddp_from_m_dot(m_dot + h, l, d, e, gas)
+    dp_m, _ = sim._dp_and_ddp_from_m_dot(m_dot - h, l, d, e, gas)
+    assert np.allclose(ddp, (dp_p - dp_m) / (2 * h), rtol=1e-5)
+
+
+def test_newton_same_as_fsolve(simple_network):
+    net = simple_network
+    p_newton, m_dot_newton, _, _ = sim.run_one_level(net, "BP", solver="newton")
+    assert net.solver_info["BP"]["converged"]
+    assert net.solver_info["BP"]["iterations"] <= 5
+    p_fsolve, m_dot_fsolve, _, _ = sim.run_one_level(net, "BP", solver="fsolve")
+    assert np.allclose(p_newton, p_fsolve, atol=1e-2)
+    assert np.allclose(m_dot_newton, m_dot_fsolve, atol=1e-9)
+
+
+def test_run_one_level_deterministic(simple_network):
+    net = simple_network
+    p_first, m_dot_first, _, _ = sim.run_one_level(net, "BP")
+    p_second, m_dot_second, _, _ = sim.run_one_level(net, "BP")
+    assert np.array_equal(p_first, p_second)
+    assert np.array_equal(m_dot_first, m_dot_second)
+
+
+@pytest.mark.parametrize("init", ["tree", "previous"])
+def test_run_one_level_init(simple_network, init):
+    net = simple_network
+    p_ref, m_dot_ref, _, _ = sim.run_one_level(net, "BP", init="linear")
+    p_nodes, m_dot_pipes, _, _ = sim.run_one_level(net, "BP", init=init)
+    assert net.solver_info["BP"]["converged"]
+    assert np.allclose(p_nodes, p_ref, atol=1e-2)
+    assert np.allclose(m_dot_pipes, m_dot_ref, atol=1e-9)
+    if init == "previous":
+        assert net.solver_info["BP"]["iterations"] == 0
+
+
+def test_initial_guess_seeded_perturbation(simple_network):
+    net = simple_network
+    tp = top.create_topology(net)["BP"]
+    gas = Chemical("natural gas", T=10 + 273.15, P=1.025e5)
+    loads = sim._scaled_loads_as_dict(net)
+    p_ops = sim._operating_pressures_as_dict(net)
+    eps = tp.roughness
+    x_a = sim.initial_guess(tp, gas, eps, loads, p_ops, seed=42, perturbation=0.1)
+    x_b = sim.initial_guess(tp, gas, eps, loads, p_ops, seed=42, perturbation=0.1)
+    assert np.array_equal(x_a, x_b)
+
+
 # TODO: non-linear method do not like (ZeroDivisionError) null mass flows (in dead-end pipes)?
 def test_run_with_dead_end_pipes():
     pass
+
+
+@pytest.mark.parametrize("eos", ["constant", "ideal", "table"])
+def test_model_jacobian_finite_differences(simple_network, eos):
+    net = simple_network
+    tp = top.create_topology(net)["BP"]
+    gas = level_fluid(net, "BP")
+    loads, p_ops = sim._scaled_loads_as_dict(net), sim._operating_pressures_as_dict(net)
+    if eos != "constant":
+        loads = {bus: 20 * load for bus, load in loads.items()}  # turbulent flows, large pressure drops
+    model = sim.Model(tp, tp.roughness, gas, loads, p_ops, gas.P, eos=eos)
+    x = sim.initial_guess(tp, gas, tp.roughness, loads, p_ops, init="tree")
+    r = model.residual(x).copy()
+    assert r.tolist() == sim._eq_model(x, tp, tp.roughness, gas, loads, p_ops, gas.P, "colebrook", eos).tolist()
+    h = 1e-6
+    fd = np.column_stack([(model.residual(x + h * e) - r) / h for e in np.identity(len(x))])
+    assert np.allclose(model.jacobian(x).toarray(), fd, atol=1e-4)
+
+
+def test_run_one_level_pressure_dependent_density(simple_network):
+    net = simple_network
+    net.load["p_kW"] *= 10
+    p_cst, _, _, gas = sim.run_one_level(net, "BP")
+    p_ideal, _, _, _ = sim.run_one_level(net, "BP", eos="ideal")
+    assert net.solver_info["BP"]["converged"]
+    # Below the nominal pressure, the gas is lighter and the pressure drops larger
+    assert np.all(p_ideal <= p_cst + 1e-6)
+    assert np.min(p_ideal) < np.min(p_cst) - 100
+
+
+@pytest.mark.parametrize("nbr_pipes", [500, 2000])
+def test_run_one_level_meshed_converges(nbr_pipes):
+    # Many pipes of the meshed benchmark network are in the laminar-turbulent transition
+    from benchmarks.networks import create_meshed
+
+    net = create_meshed(nbr_pipes)
+    sim.run_one_level(net, "MP")
+    assert net.solver_info["MP"]["converged"]
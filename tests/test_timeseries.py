@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `timeseries` package."""
+
+import pytest
+
+import numpy as np
+import pandas as pd
+
+from pandangas import results as res
+from pandangas import timeseries as ts
+
+from fixtures import simple_network
+
+
+@pytest.mark.parametrize("method", ["LINEAR", "NON-LINEAR"])
+def test_run_timeseries_same_as_runpp(simple_network, method):
+    net = simple_network
+    profiles = pd.DataFrame({"LOAD2": [1.0, 0.5, 2.0]})
+    out = ts.run_timeseries(net, profiles, method=method)
+    assert out["p_Pa"].shape == (3, len(net.bus))
+    assert out["m_dot_pipe"].shape == (3, len(net.pipe))
+
+    net.load.at[0, "scaling"] = 2.0
+    res.runpp(net, method=method)
+    assert np.allclose(out["p_Pa"][2], net.res_bus.sort_index()["p_Pa"].values, atol=1)
+    assert np.allclose(out["m_dot_pipe"][2], net.res_pipe.sort_index()["m_dot_kg/s"].values, atol=1e-6)
+    assert np.allclose(out["m_dot_station"][2], net.res_station["m_dot_kg/s"].values, atol=1e-6)
+
+
+def test_run_timeseries_to_disk(simple_network, tmpdir):
+    net = simple_network
+    profiles = np.ones((4, len(net.load)))
+    out = ts.run_timeseries(net, profiles, method="NON-LINEAR", output=str(tmpdir))
+    p = np.load(str(tmpdir.join("p_Pa.npy")), mmap_mode="r")
+    assert p.shape == (4, len(net.bus))
+    assert np.allclose(p, out["p_Pa"])
+    assert np.all(out["iterations"][1:] <= out["iterations"][0])
+    assert out["converged"].all()
+    assert np.load(str(tmpdir.join("converged.npy"))).dtype == bool
+
+
+def test_run_timeseries_not_converged_warning(simple_network):
+    net = simple_network
+    profiles = np.array([[1.0] * len(net.load), [3.0] * len(net.load)])
+    with pytest.warns(RuntimeWarning, match="did not converge"):
+        out = ts.run_timeseries(net, profiles, method="NON-LINEAR", max_iter=1)
+    assert out["converged"].shape == (2, 2)
+    assert not out["converged"].all()
+    assert (out["residual"][~out["converged"]] > 1e-9).all()
+
+
+def test_run_timeseries_unknown_load_raise_exception(simple_network):
+    with pytest.raises(ValueError):
+        ts.run_timeseries(simple_network, pd.DataFrame({"LOADX": [1.0]}))
+
+
+def test_run_timeseries_unknown_method_raise_exception(simple_network):
+    with pytest.raises(ValueError):
+        ts.run_timeseries(simple_network, np.ones((2, len(simple_network.load))), method="linear")
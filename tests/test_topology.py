@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `topology` package."""
+
+import pytest
+
+from pandangas import topology as top
+
+from fixtures import simple_network
+
+
+def test_create_nxgraph(simple_network):
+    net = simple_network
+    net.pipe.loc[net.pipe["name"] == "PIPE1-2", "in_service"] = False
+    g = top.create_nxgraph(net)
+    assert list(g.nodes) == net.bus["name"].tolist()
+    assert g.nodes["BUS2"] == {"index": 4, "level": "BP", "zone": None, "type": "SINK"}
+    assert len(g.edges) == 9 + 2
+    assert g.edges["BUSMP0", "BUS0"]["type"] == "STATION"
+    assert len(top.create_nxgraph(net, only_in_service=False).edges) == 10 + 2
+
+
+def test_components_without_pipes(simple_network):
+    net = simple_network
+    tp = top.create_topology(net)["MP"]
+    assert tp.components() == [tp]
+    parts = tp.components(without=[tp.pipes.index("PIPEMPF-0")])
+    assert [part.nodes for part in parts] == [["BUSMP0", "BUSMP3"], ["BUSMPF"]]
+    assert [part.pipes for part in parts] == [["PIPEMP0-3"], []]
+    assert parts[0].incidence.toarray().tolist() == [[-1.0], [1.0]]